@@ -0,0 +1,41 @@
+import asyncio
+import contextvars
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# Asyncio execution mode
+# pymongo and yfinance are blocking libraries, so instead of an async driver
+# the blocking calls of one request are offloaded to a shared thread pool and
+# awaited together. Independent round trips (e.g. current prices and
+# previous closes) then overlap instead of running one after the other.
+#
+# Enabled with ASYNC_VIEWS=true; views stay plain Flask functions and run
+# their coroutine to completion with run().
+
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', 'false').lower() in ('1', 'true', 'yes')
+IO_WORKERS = int(os.getenv('ASYNC_IO_WORKERS', '32'))
+
+_io_pool = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix='aio')
+
+
+async def to_thread(fn, *args, **kwargs):
+    """
+    Run a blocking function on the I/O pool and await its result.
+
+    Args:
+        fn (callable): Blocking function (Mongo query, market data fetch, ...)
+        *args, **kwargs: Passed to fn
+
+    Returns:
+        Whatever fn returns; exceptions are re-raised in the caller
+    """
+    loop = asyncio.get_running_loop()
+    # Like asyncio.to_thread, run in a copy of the caller's context (keeps the request trace)
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(_io_pool, functools.partial(context.run, fn, *args, **kwargs))
+
+
+def run(coro):
+    """Run a coroutine to completion from synchronous code (e.g. a Flask view)."""
+    return asyncio.run(coro)
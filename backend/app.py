@@ -1,23 +1,13 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-from pymongo import MongoClient
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
-try:
-    # Initialize MongoDB connection
-    uri = os.getenv('DB_URI')
-    if uri is None:
-        raise Exception('DB_URI is not set')
-
-    client = MongoClient(uri)
-    db = client['stock_trading']
-    collection = db['users']
-
-except Exception as e:
-    raise e
+# MongoDB is reached through the shared, lazily created client in database.py
+if os.getenv('DB_URI') is None:
+    raise Exception('DB_URI is not set')
 
 def init_app():
     """Initialize and configure Flask application"""
@@ -27,10 +17,56 @@ def init_app():
     CORS(app, resources={r"/*": {"origins": "*"}})
 
 
+    # Request latency metrics and the /metrics endpoint (see metrics.py)
+    import metrics
+    if metrics.METRICS_ENABLED:
+        metrics.instrument_app(app)
+
+    # Opt-in per-request profiling (PROFILE_SAMPLE_RATE / PROFILE_TOKEN, see profiling.py)
+    import profiling
+    if profiling.is_enabled():
+        profiling.instrument_app(app)
+
+    # Per-request span tree, sent as Server-Timing and logged when slow (see tracing.py)
+    import tracing
+    if tracing.TRACING_ENABLED:
+        tracing.instrument_app(app)
+
     # Import blueprints here and register routes
     from controllers.route import index
     app.register_blueprint(index, url_prefix='/api')  # Changed to /api prefix
 
+    # Load the ticker universe and search index once, before serving requests
+    from universe import get_universe
+    get_universe()
+
+    # Database bootstrap; can be turned off (DB_BOOTSTRAP=false) when it is run
+    # once per deployment instead of by every worker. Nothing connects to
+    # MongoDB at startup then
+    if os.getenv('DB_BOOTSTRAP', 'true').lower() in ('1', 'true', 'yes'):
+        # Create missing indexes (idempotent) and report any that could not be created
+        from database import get_db
+        from trading import migrate_portfolios
+        from indexes import ensure_indexes
+        ensure_indexes(get_db())
+
+        # Convert any users still stored with a portfolio array (idempotent)
+        migrate_portfolios()
+
+        # Company names for search come from the shared company info cache when
+        # tickers.txt lists bare symbols (otherwise they are added as companies
+        # are fetched)
+        from info_cache import load_cached_names
+        try:
+            load_cached_names()
+        except Exception as e:
+            print(f"Failed to load company names for search: {e}")
+
+    # Keep held and viewed prices warm in the background
+    from trading import PRICE_REFRESHER_ENABLED, start_price_refresher
+    if PRICE_REFRESHER_ENABLED:
+        start_price_refresher()
+
     # # Test endpoints for frontend development
 
     return app
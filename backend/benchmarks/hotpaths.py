@@ -0,0 +1,182 @@
+"""
+Micro-benchmarks for the trading hot paths.
+
+Runs offline (in-memory MongoDB, synthetic market data; see offline.py) and
+times, per call:
+- get_stock_price: in-process cache hit, and a full miss (provider fetch)
+- get_portfolio: with warm caches and with both price cache tiers cold
+- buy_stock, sell_stock and update_login_streak
+
+Portfolio-dependent cases run for every portfolio size (holdings per
+user). Results are appended to benchmarks/results/hotpaths.jsonl; pass
+--compare to print the change against the previous stored run.
+
+Usage (from the backend directory):
+    python -m benchmarks.hotpaths [--sizes 1,10,50,100,250,500] [--repeat 30]
+                                  [--latency-ms 0] [--compare] [--no-save]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.offline import install_offline_backend
+
+RESULTS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results', 'hotpaths.jsonl')
+DEFAULT_SIZES = [1, 10, 50, 100, 250, 500]
+USER_ID = 1
+
+
+def measure(fn, repeat, setup=None):
+    """
+    Time fn() repeat times; setup() runs before each call, outside the timing.
+
+    Returns:
+        dict: median_ms, p95_ms, mean_ms and min_ms
+    """
+    samples = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        'median_ms': round(statistics.median(samples), 4),
+        'p95_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 4),
+        'mean_ms': round(statistics.mean(samples), 4),
+        'min_ms': round(samples[0], 4),
+    }
+
+
+def _reset_price_caches(trading):
+    trading.price_cache.clear()
+    trading.previous_close_cache.clear()
+    trading.stocks_collection.delete_many({})
+    trading.previous_closes_collection.delete_many({})
+
+
+def _create_user(trading, symbols, size):
+    """Replace the benchmark user with one holding `size` positions."""
+    trading.users_collection.delete_many({'user_id': USER_ID})
+    trading.users_collection.insert_one({
+        'user_id': USER_ID,
+        'holdings': {
+            trading.holding_key(symbol): {'symbol': symbol, 'quantity': 10.0, 'average_price': 100.0}
+            for symbol in symbols[:size]
+        },
+        'buying_power': 1e9,  # Never the limiting factor
+        'streak': 1,
+        'last_login': datetime.utcnow(),
+        'streak_reward_claimed': None
+    })
+
+
+def run(sizes=DEFAULT_SIZES, repeat=30, latency_ms=0):
+    """
+    Run every benchmark case.
+
+    Returns:
+        dict: case -> {size (str, '-' if size-independent) -> timing stats}
+    """
+    symbols = install_offline_backend(latency_ms=latency_ms)
+    import trading
+
+    results = {}
+
+    # Size-independent: single price lookups
+    symbol = symbols[0]
+    trading.get_stock_price(symbol)
+    results['get_stock_price (hit)'] = {'-': measure(lambda: trading.get_stock_price(symbol), repeat)}
+    results['get_stock_price (miss)'] = {'-': measure(
+        lambda: trading.get_stock_price(symbol), repeat,
+        setup=lambda: _reset_price_caches(trading)
+    )}
+
+    for size in sizes:
+        _create_user(trading, symbols, size)
+        _reset_price_caches(trading)
+        held = symbols[:size]
+        key = str(size)
+
+        results.setdefault('get_portfolio (cold)', {})[key] = measure(
+            lambda: trading.get_portfolio(USER_ID), max(1, repeat // 5),
+            setup=lambda: _reset_price_caches(trading)
+        )
+        trading.get_portfolio(USER_ID)  # Warm both tiers
+        results.setdefault('get_portfolio (warm)', {})[key] = measure(
+            lambda: trading.get_portfolio(USER_ID), repeat
+        )
+        results.setdefault('buy_stock', {})[key] = measure(
+            lambda: trading.buy_stock(USER_ID, held[-1], 10), repeat
+        )
+        results.setdefault('sell_stock', {})[key] = measure(
+            lambda: trading.sell_stock(USER_ID, held[-1], 0.01), repeat
+        )
+
+        # Make every call take the reward path: last login was yesterday
+        def yesterday():
+            trading.users_collection.update_one({'user_id': USER_ID}, {'$set': {
+                'last_login': datetime.utcnow() - timedelta(days=1),
+                'streak_reward_claimed': datetime.utcnow() - timedelta(days=1)
+            }})
+        results.setdefault('update_login_streak', {})[key] = measure(
+            lambda: trading.update_login_streak(USER_ID), repeat, setup=yesterday
+        )
+
+    return results
+
+
+def _load_previous():
+    if not os.path.exists(RESULTS_FILE):
+        return None
+    with open(RESULTS_FILE) as f:
+        lines = [line for line in f if line.strip()]
+    return json.loads(lines[-1]) if lines else None
+
+
+def print_results(results, previous=None):
+    print(f"{'case':<24} {'size':>5} {'median ms':>10} {'p95 ms':>10}" + (f" {'change':>8}" if previous else ''))
+    for case, by_size in results.items():
+        for size, stats in by_size.items():
+            line = f"{case:<24} {size:>5} {stats['median_ms']:>10.3f} {stats['p95_ms']:>10.3f}"
+            before = (previous or {}).get('results', {}).get(case, {}).get(size)
+            if before and before['median_ms']:
+                line += f" {(stats['median_ms'] / before['median_ms'] - 1) * 100:>+7.1f}%"
+            print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the trading hot paths offline')
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)), help='Comma-separated portfolio sizes')
+    parser.add_argument('--repeat', type=int, default=30, help='Timed calls per case')
+    parser.add_argument('--latency-ms', type=float, default=0, help='Simulated market data latency')
+    parser.add_argument('--compare', action='store_true', help='Show the change against the previous stored run')
+    parser.add_argument('--no-save', action='store_true', help='Do not append to the results file')
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    previous = _load_previous() if args.compare else None
+    results = run(sizes, args.repeat, args.latency_ms)
+    print_results(results, previous)
+
+    if not args.no_save:
+        os.makedirs(os.path.dirname(RESULTS_FILE), exist_ok=True)
+        with open(RESULTS_FILE, 'a') as f:
+            f.write(json.dumps({
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'python': sys.version.split()[0],
+                'sizes': sizes,
+                'repeat': args.repeat,
+                'latency_ms': args.latency_ms,
+                'results': results
+            }) + '\n')
+        print(f"Saved to {os.path.relpath(RESULTS_FILE)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,307 @@
+"""
+End-to-end HTTP load test.
+
+Starts the app from app.init_app() in a child process, against the offline
+stand-ins (in-memory MongoDB, synthetic market data; see offline.py), and
+drives a mixed read/trade workload over real HTTP at a configurable
+concurrency. Prints a throughput report and a latency histogram per
+endpoint, and appends the summary to benchmarks/results/loadtest.jsonl.
+
+Workload (weights via --mix):
+- portfolio: GET /api/portfolio/details
+- buy: POST /api/buy ($10 of a held symbol)
+- sell: POST /api/sell (0.01 shares of a held symbol)
+- sp500: GET /api/sp500-data?page=<random page>
+
+Usage (from the backend directory):
+    python -m benchmarks.loadtest [--concurrency 8] [--duration 10] [--holdings 20]
+                                  [--latency-ms 0] [--mix portfolio=60,buy=15,sell=10,sp500=15]
+
+With --url the workload targets an already running server instead (user 1
+must exist and hold at least one position).
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlsplit
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_FILE = os.path.join(BACKEND_DIR, 'benchmarks', 'results', 'loadtest.jsonl')
+DEFAULT_MIX = 'portfolio=60,buy=15,sell=10,sp500=15'
+HISTOGRAM_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+USER_ID = 1
+
+
+# Server side
+
+def serve(port, holdings, latency_ms):
+    """Run the app on the offline stand-ins until killed (child process)."""
+    os.environ.setdefault('DB_URI', 'mongodb://offline')
+    from benchmarks.offline import install_offline_backend
+    symbols = install_offline_backend(latency_ms=latency_ms)
+
+    import logging
+    from werkzeug.serving import make_server
+    from app import init_app
+    import trading
+
+    app = init_app()
+    trading.users_collection.insert_one({
+        'user_id': USER_ID,
+        'holdings': {
+            trading.holding_key(symbol): {'symbol': symbol, 'quantity': 1000.0, 'average_price': 100.0}
+            for symbol in symbols[:holdings]
+        },
+        'buying_power': 1e9,  # Trades never run out of cash
+        'streak': 1,
+        'last_login': datetime.utcnow(),
+        'streak_reward_claimed': None
+    })
+
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server = make_server('127.0.0.1', port, app, threaded=True)
+    print('ready', flush=True)
+    server.serve_forever()
+
+
+def start_server(port, holdings, latency_ms):
+    """Start serve() in a child process and wait until it accepts requests."""
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'benchmarks.loadtest', '--serve', '--port', str(port),
+         '--holdings', str(holdings), '--latency-ms', str(latency_ms)],
+        cwd=BACKEND_DIR, stdout=subprocess.PIPE, text=True
+    )
+    for line in process.stdout:
+        if line.strip() == 'ready':
+            break
+    else:
+        raise Exception('Load test server exited before it was ready')
+    # Keep draining the child's output so it never blocks on a full pipe
+    threading.Thread(target=lambda: [None for _ in process.stdout], daemon=True).start()
+    return process
+
+
+# Client side
+
+class Recorder:
+    """Thread-safe collection of (endpoint, latency, ok) samples."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}
+        self.errors = {}
+
+    def record(self, name, latency_ms, ok):
+        with self._lock:
+            self.samples.setdefault(name, []).append(latency_ms)
+            if not ok:
+                self.errors[name] = self.errors.get(name, 0) + 1
+
+
+def _workload(symbols, total_pages):
+    """Build the request for each workload name: (method, path, body)."""
+    return {
+        'portfolio': lambda: ('GET', '/api/portfolio/details', None),
+        'buy': lambda: ('POST', '/api/buy', {'symbol': random.choice(symbols), 'amount': 10}),
+        'sell': lambda: ('POST', '/api/sell', {'symbol': random.choice(symbols), 'quantity': 0.01}),
+        'sp500': lambda: ('GET', f'/api/sp500-data?page={random.randint(1, total_pages)}', None),
+    }
+
+
+def _request(connection, method, path, body=None):
+    headers = {}
+    payload = None
+    if body is not None:
+        payload = json.dumps(body)
+        headers['Content-Type'] = 'application/json'
+    connection.request(method, path, body=payload, headers=headers)
+    response = connection.getresponse()
+    data = response.read()
+    return response.status, data
+
+
+def _worker(base_url, mix, requests, recorder, stop_at):
+    parts = urlsplit(base_url)
+    connection = http.client.HTTPConnection(parts.hostname, parts.port, timeout=30)
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    while time.time() < stop_at:
+        name = random.choices(names, weights)[0]
+        method, path, body = requests[name]()
+        start = time.perf_counter()
+        try:
+            status, data = _request(connection, method, path, body)
+            ok = status < 400 and b'"error"' not in data
+        except Exception:
+            connection.close()
+            ok = False
+        recorder.record(name, (time.perf_counter() - start) * 1000, ok)
+
+
+def run_load(base_url, concurrency, duration, mix, warmup=2):
+    """
+    Drive the workload against a running server.
+
+    Returns:
+        Recorder: Samples collected after the warmup period
+    """
+    parts = urlsplit(base_url)
+    connection = http.client.HTTPConnection(parts.hostname, parts.port, timeout=30)
+    _, data = _request(connection, 'GET', '/api/portfolio/details')
+    symbols = [holding['symbol'] for holding in json.loads(data)['portfolio']]
+    if not symbols:
+        raise Exception('User 1 holds no positions to trade')
+    _, data = _request(connection, 'GET', '/api/sp500-data?page=1')
+    total_pages = json.loads(data)['total_pages']
+    requests = _workload(symbols, total_pages)
+
+    if warmup:
+        _worker(base_url, mix, requests, Recorder(), time.time() + warmup)
+
+    recorder = Recorder()
+    stop_at = time.time() + duration
+    threads = [
+        threading.Thread(target=_worker, args=(base_url, mix, requests, recorder, stop_at))
+        for _ in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return recorder
+
+
+# Reporting
+
+def _percentile(samples, p):
+    return samples[min(len(samples) - 1, int(len(samples) * p))]
+
+
+def summarize(recorder, duration):
+    """Per-endpoint and overall throughput and latency percentiles."""
+    summary = {}
+    everything = []
+    for name, samples in sorted(recorder.samples.items()):
+        samples = sorted(samples)
+        everything.extend(samples)
+        summary[name] = {
+            'requests': len(samples),
+            'errors': recorder.errors.get(name, 0),
+            'rps': round(len(samples) / duration, 1),
+            'p50_ms': round(_percentile(samples, 0.50), 2),
+            'p90_ms': round(_percentile(samples, 0.90), 2),
+            'p99_ms': round(_percentile(samples, 0.99), 2),
+            'max_ms': round(samples[-1], 2),
+        }
+    everything.sort()
+    if everything:
+        summary['total'] = {
+            'requests': len(everything),
+            'errors': sum(recorder.errors.values()),
+            'rps': round(len(everything) / duration, 1),
+            'p50_ms': round(_percentile(everything, 0.50), 2),
+            'p90_ms': round(_percentile(everything, 0.90), 2),
+            'p99_ms': round(_percentile(everything, 0.99), 2),
+            'max_ms': round(everything[-1], 2),
+        }
+    return summary
+
+
+def histogram(samples):
+    """Count samples per latency bucket (upper bounds in HISTOGRAM_BUCKETS_MS, then overflow)."""
+    counts = [0] * (len(HISTOGRAM_BUCKETS_MS) + 1)
+    for latency in samples:
+        for i, bound in enumerate(HISTOGRAM_BUCKETS_MS):
+            if latency <= bound:
+                counts[i] += 1
+                break
+        else:
+            counts[-1] += 1
+    return counts
+
+
+def print_report(recorder, summary):
+    print(f"{'endpoint':<10} {'requests':>9} {'errors':>7} {'req/s':>8} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for name, stats in summary.items():
+        print(f"{name:<10} {stats['requests']:>9} {stats['errors']:>7} {stats['rps']:>8.1f} "
+              f"{stats['p50_ms']:>8.2f} {stats['p90_ms']:>8.2f} {stats['p99_ms']:>8.2f} {stats['max_ms']:>8.2f}")
+
+    for name, samples in sorted(recorder.samples.items()):
+        counts = histogram(samples)
+        peak = max(counts) or 1
+        print(f"\n{name} latency histogram")
+        labels = [f"<= {bound} ms" for bound in HISTOGRAM_BUCKETS_MS] + [f"> {HISTOGRAM_BUCKETS_MS[-1]} ms"]
+        for label, count in zip(labels, counts):
+            if count:
+                print(f"  {label:>11} {count:>7} {'#' * max(1, round(40 * count / peak))}")
+
+
+def _parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        mix[name.strip()] = float(weight)
+    unknown = set(mix) - {'portfolio', 'buy', 'sell', 'sp500'}
+    if unknown:
+        raise ValueError(f"Unknown workload: {', '.join(sorted(unknown))}")
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description='HTTP load test against a local stand-in backend')
+    parser.add_argument('--concurrency', type=int, default=8, help='Concurrent client connections')
+    parser.add_argument('--duration', type=float, default=10, help='Measured seconds')
+    parser.add_argument('--warmup', type=float, default=2, help='Unmeasured warmup seconds')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='Workload weights, e.g. portfolio=60,buy=15,sell=10,sp500=15')
+    parser.add_argument('--holdings', type=int, default=20, help='Positions held by the test user')
+    parser.add_argument('--latency-ms', type=float, default=0, help='Simulated market data latency')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--url', help='Target an already running server instead of starting one')
+    parser.add_argument('--no-save', action='store_true', help='Do not append to the results file')
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.port, args.holdings, args.latency_ms)
+        return
+
+    mix = _parse_mix(args.mix)
+    process = None if args.url else start_server(args.port, args.holdings, args.latency_ms)
+    try:
+        recorder = run_load(args.url or f'http://127.0.0.1:{args.port}', args.concurrency,
+                            args.duration, mix, args.warmup)
+    finally:
+        if process:
+            process.terminate()
+            process.wait()
+
+    summary = summarize(recorder, args.duration)
+    print_report(recorder, summary)
+
+    if not args.no_save:
+        os.makedirs(os.path.dirname(RESULTS_FILE), exist_ok=True)
+        with open(RESULTS_FILE, 'a') as f:
+            f.write(json.dumps({
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'target': args.url or 'offline',
+                'concurrency': args.concurrency,
+                'duration': args.duration,
+                'mix': mix,
+                'holdings': args.holdings,
+                'latency_ms': args.latency_ms,
+                'results': summary,
+                'histogram_buckets_ms': HISTOGRAM_BUCKETS_MS,
+                'histograms': {name: histogram(samples) for name, samples in recorder.samples.items()}
+            }) + '\n')
+        print(f"\nSaved to {os.path.relpath(RESULTS_FILE, BACKEND_DIR)}")
+
+
+if __name__ == '__main__':
+    main()
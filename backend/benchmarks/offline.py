@@ -0,0 +1,64 @@
+"""
+Offline backend for benchmarks and load tests.
+
+Swaps the two external services for local stand-ins, in this process only:
+- MongoDB: an in-memory mongomock client (see database.set_client)
+- Market data: a ReplayProvider over synthetic quotes, history and company
+  info for every symbol in tickers.txt, with optional simulated latency
+
+Must be called before any query runs.
+"""
+import json
+import os
+import tempfile
+
+import database
+import providers
+from utils import read_tickers_from_file
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def synthetic_market_data(symbols):
+    """Deterministic quotes, two daily closes and company info per symbol."""
+    quotes, history, info = {}, {}, {}
+    for i, symbol in enumerate(symbols):
+        price = round(20 + (i * 37) % 480 + (i % 100) / 100, 2)
+        quotes[symbol] = price
+        history[symbol] = [round(price * 0.99, 2), price]
+        info[symbol] = {
+            'shortName': f'{symbol} Corp',
+            'bid': round(price - 0.01, 2),
+            'ask': round(price + 0.01, 2),
+            'regularMarketOpen': round(price * 0.995, 2),
+            'regularMarketDayHigh': round(price * 1.01, 2),
+            'regularMarketDayLow': round(price * 0.98, 2),
+            'marketCap': int(price * 1e9),
+            'trailingPE': 20.0,
+        }
+    return {'quotes': quotes, 'history': history, 'info': info}
+
+
+def install_offline_backend(latency_ms=0):
+    """
+    Point this process at in-memory MongoDB and synthetic market data.
+
+    Args:
+        latency_ms (float): Simulated latency per market data call
+
+    Returns:
+        list: The symbols that have market data (the S&P 500 universe)
+    """
+    try:
+        import mongomock
+    except ImportError:
+        raise Exception('mongomock is required for offline runs (pip install mongomock)')
+
+    symbols = read_tickers_from_file(os.path.join(BACKEND_DIR, 'tickers.txt'))
+    path = os.path.join(tempfile.mkdtemp(prefix='offline-market-data-'), 'replay.json')
+    with open(path, 'w') as f:
+        json.dump(synthetic_market_data(symbols), f)
+
+    database.set_client(mongomock.MongoClient())
+    providers.set_provider(providers.ReplayProvider(path, latency_ms=latency_ms))
+    return symbols
@@ -0,0 +1,115 @@
+"""
+Cold-start benchmark.
+
+Boots the backend in fresh interpreters and records, per run:
+- import_ms: importing app and the API routes
+- init_app_ms: init_app() (blueprints, database bootstrap, ticker universe)
+- first_response_ms: the first GET /api/ through the test client
+- heavy_modules: heavy dependencies already loaded after the first response
+
+Medians over all runs are printed and appended to
+benchmarks/results/startup.jsonl, so regressions show up as a jump
+between entries.
+
+By default the database bootstrap is skipped (DB_BOOTSTRAP=false) so the
+benchmark runs without MongoDB; pass --with-db to include it against DB_URI.
+
+Usage (from the backend directory):
+    python -m benchmarks.startup [--runs 5] [--with-db]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_FILE = os.path.join(BACKEND_DIR, 'benchmarks', 'results', 'startup.jsonl')
+
+# Dependencies no route needs just to start serving
+HEAVY_MODULES = ['yfinance', 'pandas', 'numpy', 'bs4', 'requests', 'lxml']
+
+# Runs in a fresh interpreter and prints one JSON line
+_CHILD = """
+import json, sys, time
+start = time.perf_counter()
+import app
+import controllers.route
+imported = time.perf_counter()
+flask_app = app.init_app()
+initialized = time.perf_counter()
+response = flask_app.test_client().get('/api/')
+responded = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - start) * 1000,
+    'init_app_ms': (initialized - imported) * 1000,
+    'first_response_ms': (responded - initialized) * 1000,
+    'status': response.status_code,
+    'heavy_modules': [name for name in %r if name in sys.modules],
+}))
+"""
+
+
+def run_once(with_db=False):
+    """Boot the backend once in a new interpreter and return its timings."""
+    env = dict(os.environ)
+    env.setdefault('DB_URI', 'mongodb://localhost:27017')
+    env['PRICE_REFRESHER_ENABLED'] = 'false'
+    if not with_db:
+        env['DB_BOOTSTRAP'] = 'false'
+
+    start = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, '-c', _CHILD % HEAVY_MODULES],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    total_ms = (time.perf_counter() - start) * 1000
+
+    result = json.loads(output.strip().splitlines()[-1])
+    result['process_ms'] = total_ms
+    return result
+
+
+def run(runs=5, with_db=False):
+    """
+    Run the benchmark and summarize it.
+
+    Returns:
+        dict: Median timings in milliseconds, plus run metadata
+    """
+    results = [run_once(with_db) for _ in range(runs)]
+    summary = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': sys.version.split()[0],
+        'runs': runs,
+        'with_db': with_db,
+        'heavy_modules': sorted({name for result in results for name in result['heavy_modules']}),
+    }
+    for key in ('import_ms', 'init_app_ms', 'first_response_ms', 'process_ms'):
+        summary[key] = round(statistics.median(result[key] for result in results), 1)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure backend cold start')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--with-db', action='store_true', help='Include the MongoDB bootstrap (needs DB_URI)')
+    parser.add_argument('--no-save', action='store_true', help='Do not append to the results file')
+    args = parser.parse_args()
+
+    summary = run(args.runs, args.with_db)
+    for key in ('import_ms', 'init_app_ms', 'first_response_ms', 'process_ms'):
+        print(f"{key:>18}: {summary[key]:8.1f}")
+    print(f"{'heavy_modules':>18}: {', '.join(summary['heavy_modules']) or 'none'}")
+
+    if not args.no_save:
+        os.makedirs(os.path.dirname(RESULTS_FILE), exist_ok=True)
+        with open(RESULTS_FILE, 'a') as f:
+            f.write(json.dumps(summary) + '\n')
+        print(f"Saved to {os.path.relpath(RESULTS_FILE, BACKEND_DIR)}")
+
+
+if __name__ == '__main__':
+    main()
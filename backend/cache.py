@@ -0,0 +1,272 @@
+import threading
+import time
+from collections import OrderedDict
+
+# In-process caches
+# Small, thread-safe building blocks used in front of the MongoDB caches so
+# hot keys can be served without any I/O.
+
+
+class TTLCache:
+    """
+    Bounded in-memory cache with per-entry TTL and LRU eviction.
+
+    - Entries expire ttl seconds after their timestamp
+    - Expired entries are kept until stale_ttl so get_stale can serve them
+      while a refresh is in progress (stale-while-revalidate)
+    - When maxsize is reached the least recently used entry is evicted
+    - Hit/miss/stale/eviction counters are kept for monitoring
+
+    Timestamps are epoch seconds. Callers that copy entries from another
+    cache tier (e.g. MongoDB) should pass the original timestamp so the
+    entry does not outlive the source data.
+    """
+
+    def __init__(self, maxsize=1024, ttl=30, stale_ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale_ttl = max(ttl, stale_ttl or ttl)
+        self._data = OrderedDict()  # key -> (value, timestamp)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self.evictions = 0
+
+    def get(self, key, default=None, max_age=None):
+        """
+        Look up a key.
+
+        Args:
+            key: Cache key
+            default: Value returned on a miss
+            max_age (float): Optional stricter age limit in seconds for this lookup
+
+        Returns:
+            The cached value, or default if missing or expired
+        """
+        max_age = self.ttl if max_age is None else min(max_age, self.ttl)
+        now = time.time()
+
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            value, timestamp = entry
+            age = now - timestamp
+            if age >= self.stale_ttl:
+                # Too old even to serve stale, drop it
+                del self._data[key]
+                self.misses += 1
+                return default
+            if age >= max_age:
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def get_stale(self, key, default=None):
+        """
+        Look up a key, accepting entries past their TTL (up to stale_ttl).
+
+        Returns:
+            The cached value, or default if missing or older than stale_ttl
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or time.time() - entry[1] >= self.stale_ttl:
+                return default
+            self._data.move_to_end(key)
+            self.stale_hits += 1
+            return entry[0]
+
+    def age(self, key):
+        """Return the age in seconds of an entry, or None if not cached. Does not count as a lookup."""
+        with self._lock:
+            entry = self._data.get(key)
+            return None if entry is None else time.time() - entry[1]
+
+    def set(self, key, value, timestamp=None):
+        """Store a value, evicting the least recently used entry if full."""
+        timestamp = time.time() if timestamp is None else timestamp
+
+        with self._lock:
+            self._data[key] = (value, timestamp)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        """Return counters and sizing information."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'stale_ttl': self.stale_ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'stale_hits': self.stale_hits,
+                'evictions': self.evictions,
+                'hit_ratio': self.hits / lookups if lookups else 0
+            }
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+
+class _Call:
+    """An in-flight SingleFlight call shared by its leader and waiters."""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Per-key in-flight deduplication of expensive calls.
+
+    The first caller for a key (the leader) runs the function; concurrent
+    callers for the same key wait for it and receive the same result, or
+    the same exception. Once the call finishes the key is released, so the
+    next caller starts a fresh call.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        """
+        Run fn() for key, or wait for the call already in flight for key.
+
+        Args:
+            key: Deduplication key (e.g. a stock symbol)
+            fn (callable): Zero-argument function to run
+
+        Returns:
+            The result of fn()
+
+        Raises:
+            Whatever fn() raised, in the leader and in every waiter
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = _Call()
+                self._calls[key] = call
+                self.calls += 1
+                leader = True
+            else:
+                self.coalesced += 1
+                leader = False
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    def do_many(self, keys, fn, missing_error=None):
+        """
+        Run one call for the keys with no call in flight, and wait for the rest.
+
+        The caller leads every key not already in flight and runs fn once
+        for all of them; keys some other call (do or do_many) is already
+        fetching are awaited instead, so overlapping batches never fetch a
+        key twice.
+
+        Args:
+            keys (list): Deduplication keys (e.g. stock symbols)
+            fn (callable): Takes the list of led keys, returns a dict of key -> result
+                           (keys it has no result for may be omitted)
+            missing_error (callable): Builds the exception for a led key missing
+                                      from fn's result (default KeyError)
+
+        Returns:
+            tuple: (results, errors) dicts of key -> result and key -> exception
+        """
+        led = []
+        waiting = []
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                call = self._calls.get(key)
+                if call is None:
+                    call = _Call()
+                    self._calls[key] = call
+                    led.append((key, call))
+                else:
+                    self.coalesced += 1
+                    waiting.append((key, call))
+            if led:
+                self.calls += 1
+
+        if led:
+            values = {}
+            error = None
+            try:
+                values = fn([key for key, _ in led])
+            except Exception as e:
+                error = e
+            finally:
+                with self._lock:
+                    for key, _ in led:
+                        del self._calls[key]
+                for key, call in led:
+                    if error is not None:
+                        call.error = error
+                    elif key in values:
+                        call.result = values[key]
+                    else:
+                        call.error = missing_error(key) if missing_error else KeyError(key)
+                    call.event.set()
+
+        results = {}
+        errors = {}
+        for key, call in led + waiting:
+            call.event.wait()
+            if call.error is not None:
+                errors[key] = call.error
+            else:
+                results[key] = call.result
+        return results, errors
+
+    def stats(self):
+        with self._lock:
+            return {
+                'in_flight': len(self._calls),
+                'calls': self.calls,
+                'coalesced': self.coalesced
+            }
@@ -1,15 +1,53 @@
-from flask import Blueprint, request, jsonify
-import yfinance as yf
-from app import collection
-from utils import fetch_sp500_data
+import os
+from flask import Blueprint, Response, request, jsonify
+from utils import fetch_sp500_page
+from info_cache import get_company_info
+from universe import get_universe
+import aio
+from stream import sse_events
 from trading import (
-    initialize_user, buy_stock, sell_stock, get_portfolio,
-    update_login_streak, get_stock_price, get_portfolio_with_streak
+    initialize_user, buy_stock, sell_stock, place_orders, get_portfolio, get_portfolio_async,
+    update_login_streak, get_stock_price, get_portfolio_with_streak,
+    subscribe_prices, subscribe_portfolio, refresh_subscription, price_stream
 )
 
 # Create a Blueprint for all trading routes
 index = Blueprint('index', __name__)
 
+STREAM_HEARTBEAT_SECONDS = float(os.getenv('STREAM_HEARTBEAT_SECONDS', '15'))
+STREAM_MAX_SYMBOLS = 50
+
+def conditional_json(etag, max_age, build):
+    """
+    Build a cacheable JSON response with an ETag and a max-age hint.
+
+    If the client already holds this version (If-None-Match), answers 304
+    without calling build(), so nothing is serialized or sent.
+
+    Args:
+        etag (str): Validator for the current version of the resource
+        max_age (float): Seconds the response may be reused without revalidating
+        build (callable): Returns the JSON payload
+    """
+    # Weak comparison (RFC 9110): proxies that compress responses send W/"..." back
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = jsonify(build())
+    response.set_etag(etag)
+    response.cache_control.public = True
+    if max_age >= 1:
+        response.cache_control.max_age = int(max_age)
+    else:
+        response.cache_control.no_cache = True  # Reuse only after revalidating
+    return response
+
+def portfolio_view(user_id):
+    """Value a portfolio, awaiting its lookups concurrently when ASYNC_VIEWS is enabled."""
+    if aio.ASYNC_VIEWS:
+        return aio.run(get_portfolio_async(user_id))
+    return get_portfolio(user_id)
+
 @index.route('/sp500-data')
 def index_route():
     """
@@ -30,35 +68,64 @@ def index_route():
         - Total number of pages
         - Current page number
 
+    Caching:
+        The ETag and Cache-Control max-age come from the cached page's
+        fetch time, so repeat requests within the cache window can be
+        answered with 304 Not Modified (If-None-Match)
+
     Status Codes:
         200: Successful request
+        304: Page unchanged since the client's copy
     """
     page = request.args.get('page', default=1, type=int)
     per_page = 10  # Number of stocks per page
-    data, total_pages = fetch_sp500_data(page=page, per_page=per_page)
-    return jsonify({
-        'data': data,
-        'total_pages': total_pages,
+    result = fetch_sp500_page(page=page, per_page=per_page)
+    body = lambda: {
+        'data': result['data'],
+        'total_pages': result['total_pages'],
         'current_page': page
+    }
+    if result['timestamp'] is None:
+        return jsonify(body())
+    etag = f"sp500-{page}-{per_page}-{int(result['timestamp'] * 1000)}"
+    return conditional_json(etag, result['max_age'], body)
+
+@index.route('/search')
+def search():
+    """
+    Typeahead search over the S&P 500 ticker universe.
+
+    Matches symbol prefixes and company-name word prefixes from the
+    in-memory index; no database or market data calls are made.
+
+    Query Parameters:
+        q (str): Search text
+        limit (int): Maximum number of results (default: 10, max: 50)
+
+    Returns:
+        JSON response containing:
+        - query: The search text
+        - results: List of {symbol, name} matches
+
+    Status Codes:
+        200: Successful request
+    """
+    query = request.args.get('q', default='', type=str)
+    limit = min(request.args.get('limit', default=10, type=int), 50)
+    return jsonify({
+        'query': query,
+        'results': get_universe().search(query, limit=limit)
     })
 
 @index.route('/stock-data/<ticker>')
 def stock_data(ticker):
     try:
-        stock_info = yf.Ticker(ticker).info
-        data = {
-            'Name': stock_info.get('shortName'),
-            'Bid': stock_info.get('bid'),
-            'Ask': stock_info.get('ask'),
-            'Open': stock_info.get('regularMarketOpen'),
-            'High': stock_info.get('regularMarketDayHigh'),
-            'Low': stock_info.get('regularMarketDayLow'),
-            'Market Cap': stock_info.get('marketCap'),
-            'P/E Ratio': stock_info.get('trailingPE'),
-        }
-        return jsonify({ticker: data})
+        info = get_company_info(ticker)
     except Exception as e:
         return jsonify({'error': str(e)}), 404
+    # Validators follow the shared company info cache (see info_cache.py)
+    etag = f"info-{ticker}-{int(info['timestamp'] * 1000)}"
+    return conditional_json(etag, info['max_age'], lambda: {ticker: info['data']})
 
 @index.route('/initialize-user', methods=['POST'])
 def init_user():
@@ -79,9 +146,8 @@ def init_user():
     Status Codes:
         200: User initialized successfully
     """
-    print('init user')
     initialize_user(user_id=1)
-    result = get_portfolio(1)
+    result = portfolio_view(1)
     return jsonify(result)
 
 
@@ -146,7 +212,7 @@ def buy():
         }), 400
 
     # Get updated portfolio after purchase
-    portfolio = get_portfolio(1)
+    portfolio = portfolio_view(1)
 
     return jsonify({
         'success': True,
@@ -154,9 +220,103 @@ def buy():
         'portfolio': portfolio
     })
 
+@index.route('/orders/batch', methods=['POST'])
+def batch_orders():
+    """
+    Place several buy and sell orders at once.
+
+    All symbols are priced in one batch and the orders are applied in a
+    single atomic write (all or nothing); sells count towards the buying
+    power of buys in the same batch.
+
+    Request Body:
+        orders (list): [{'side': 'buy'|'sell', 'symbol': ..., 'amount' or 'shares': ...}, ...]
+
+    Returns:
+        JSON response containing:
+        - Per-order transaction details
+        - Net change in buying power
+        - Updated portfolio
+
+    Status Codes:
+        200: All orders placed
+        400: Invalid orders or the batch was rejected
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get('orders'), list):
+        return jsonify({
+            'success': False,
+            'error': 'Missing orders'
+        }), 400
+
+    result = place_orders(1, data['orders'])
+    if not result['success']:
+        return jsonify(result), 400
+
+    return jsonify({
+        'success': True,
+        'orders': result['orders'],
+        'cash_change': result['cash_change'],
+        'portfolio': portfolio_view(1)
+    })
+
+def event_stream(subscription):
+    """Serve a price stream subscription as a Server-Sent Events response."""
+    def generate():
+        try:
+            yield from sse_events(
+                subscription,
+                heartbeat=STREAM_HEARTBEAT_SECONDS,
+                on_heartbeat=lambda: refresh_subscription(subscription)
+            )
+        finally:
+            price_stream.unsubscribe(subscription)
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # Do not buffer events in a reverse proxy
+    })
+
+@index.route('/stream/prices')
+def stream_prices():
+    """
+    Live prices for a set of symbols (Server-Sent Events).
+
+    Sends the currently cached prices first, then a 'prices' event with
+    only the changed prices whenever the shared price cache is refreshed.
+
+    Query Parameters:
+        symbols (str): Comma-separated symbols (max 50)
+
+    Status Codes:
+        200: Stream opened
+        400: No symbols or too many symbols
+    """
+    symbols = [symbol.strip().upper() for symbol in request.args.get('symbols', '').split(',') if symbol.strip()]
+    if not symbols or len(symbols) > STREAM_MAX_SYMBOLS:
+        return jsonify({'error': f'Provide between 1 and {STREAM_MAX_SYMBOLS} symbols'}), 400
+    return event_stream(subscribe_prices(symbols))
+
+@index.route('/stream/portfolio')
+def stream_portfolio():
+    """
+    Live prices and values of the user's holdings (Server-Sent Events).
+
+    'portfolio' events carry changed prices, per-holding current_value and
+    the total value; a full snapshot is sent first and after every trade.
+
+    Status Codes:
+        200: Stream opened
+        404: User not found
+    """
+    subscription = subscribe_portfolio(1)
+    if subscription is None:
+        return jsonify({'error': 'User not found'}), 404
+    return event_stream(subscription)
+
 @index.route('/portfolio/details')
 def portfolio_details():
-    return jsonify(get_portfolio(1))
+    return jsonify(portfolio_view(1))
 
 
 @index.route('/sell', methods=['POST'])
@@ -190,7 +350,11 @@ def home():
             'POST /login': 'Update login streak and get daily reward',
             'POST /buy': 'Buy stocks (requires symbol and amount)',
             'POST /sell': 'Sell stocks (requires symbol and quantity)',
+            'POST /orders/batch': 'Place several buy/sell orders in one atomic transaction',
             'GET /portfolio': 'Get user portfolio',
+            'GET /stream/prices?symbols=<a,b>': 'Live price updates (Server-Sent Events)',
+            'GET /stream/portfolio': 'Live holding values (Server-Sent Events)',
+            'GET /search?q=<text>': 'Search tickers by symbol or company name',
             'GET /stock-price/<symbol>': 'Get current price for a stock'
         }
     })
@@ -0,0 +1,126 @@
+import os
+import threading
+from dotenv import load_dotenv
+from pymongo import MongoClient
+import metrics
+import tracing
+
+# Shared MongoDB connection
+# One lazily created MongoClient (and connection pool) per process, shared
+# by routes and trading logic. Nothing connects at import time, and a
+# process forked from one that already has a client (pre-fork servers such
+# as gunicorn) builds its own client on first use instead of reusing the
+# parent's sockets. Command latency is recorded by the listeners from
+# metrics.py and tracing.py.
+
+load_dotenv()
+
+DB_NAME = 'stock_trading'
+
+# Environment variable -> MongoClient option
+_INT_OPTIONS = {
+    'MONGO_MAX_POOL_SIZE': 'maxPoolSize',
+    'MONGO_MIN_POOL_SIZE': 'minPoolSize',
+    'MONGO_MAX_IDLE_TIME_MS': 'maxIdleTimeMS',
+    'MONGO_CONNECT_TIMEOUT_MS': 'connectTimeoutMS',
+    'MONGO_SERVER_SELECTION_TIMEOUT_MS': 'serverSelectionTimeoutMS',
+    'MONGO_SOCKET_TIMEOUT_MS': 'socketTimeoutMS',
+    'MONGO_WAIT_QUEUE_TIMEOUT_MS': 'waitQueueTimeoutMS',
+}
+_STRING_OPTIONS = {
+    'MONGO_READ_PREFERENCE': 'readPreference',
+}
+
+_client = None
+_client_pid = None
+_lock = threading.Lock()
+
+
+def client_options():
+    """
+    Build MongoClient options from the environment.
+
+    Only variables that are set are passed, so pymongo (and DB_URI query
+    options) keep their defaults otherwise. MONGO_WRITE_CONCERN accepts a
+    number of nodes or a tag such as 'majority'.
+    """
+    options = {}
+    for env_name, option in _INT_OPTIONS.items():
+        value = os.getenv(env_name)
+        if value:
+            options[option] = int(value)
+    for env_name, option in _STRING_OPTIONS.items():
+        value = os.getenv(env_name)
+        if value:
+            options[option] = value
+
+    write_concern = os.getenv('MONGO_WRITE_CONCERN')
+    if write_concern:
+        options['w'] = int(write_concern) if write_concern.isdigit() else write_concern
+
+    return options
+
+
+def get_client():
+    """Return this process's MongoClient, creating it on first use."""
+    global _client, _client_pid
+    pid = os.getpid()
+    if _client is None or _client_pid != pid:
+        with _lock:
+            if _client is None or _client_pid != pid:
+                uri = os.getenv('DB_URI')
+                if uri is None:
+                    raise Exception('DB_URI is not set')
+                # A client inherited through fork() is never used by the child
+                _client = MongoClient(
+                    uri, connect=False, event_listeners=metrics.event_listeners() + tracing.event_listeners(), **client_options()
+                )
+                _client_pid = pid
+    return _client
+
+
+def set_client(client):
+    """
+    Use an already created client for this process.
+
+    Lets benchmarks and load tests run against an in-memory stand-in
+    (e.g. mongomock) instead of a real server.
+    """
+    global _client, _client_pid
+    with _lock:
+        _client = client
+        _client_pid = os.getpid()
+
+
+def get_db():
+    """Return the application database."""
+    return get_client()[DB_NAME]
+
+
+def close_client():
+    """Close this process's client (e.g. at shutdown); the next use reconnects."""
+    global _client, _client_pid
+    with _lock:
+        if _client is not None and _client_pid == os.getpid():
+            _client.close()
+        _client = None
+        _client_pid = None
+
+
+class LazyCollection:
+    """
+    Module-level stand-in for a collection of the shared database.
+
+    Resolves the real collection on every attribute access, so modules can
+    define collections at import time without connecting, and always use
+    the current process's client.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def __getattr__(self, attr):
+        return getattr(get_db()[self.name], attr)
+
+    def __repr__(self):
+        return f'LazyCollection({self.name!r})'
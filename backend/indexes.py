@@ -0,0 +1,146 @@
+import os
+from pymongo import ASCENDING
+from pymongo.errors import OperationFailure
+from page_cache import PAGE_RETENTION_SECONDS
+
+# MongoDB index bootstrap
+# Every query on a hot path is backed by an index, and the price caches
+# expire on their own through TTL indexes.
+
+PRICE_CACHE_EXPIRE_SECONDS = int(os.getenv('PRICE_CACHE_EXPIRE_SECONDS', str(24 * 60 * 60)))
+PREVIOUS_CLOSE_EXPIRE_SECONDS = 7 * 24 * 60 * 60
+COMPANY_INFO_EXPIRE_SECONDS = 7 * 24 * 60 * 60
+
+INDEXES = {
+    'users': [
+        # find_one({'user_id': ...}) on every request
+        {'keys': [('user_id', ASCENDING)], 'name': 'user_id_unique', 'unique': True},
+    ],
+    'stocks': [
+        # find({'symbol': {'$in': ...}, 'timestamp': {'$gt': ...}})
+        {'keys': [('symbol', ASCENDING), ('timestamp', ASCENDING)], 'name': 'symbol_timestamp'},
+        # Drop cached prices nobody has refreshed for a day
+        {'keys': [('timestamp', ASCENDING)], 'name': 'timestamp_ttl',
+         'expireAfterSeconds': PRICE_CACHE_EXPIRE_SECONDS},
+    ],
+    'previous_closes': [
+        # find({'symbol': {'$in': ...}, 'trading_date': ...})
+        {'keys': [('symbol', ASCENDING), ('trading_date', ASCENDING)], 'name': 'symbol_trading_date_unique',
+         'unique': True},
+        {'keys': [('timestamp', ASCENDING)], 'name': 'timestamp_ttl',
+         'expireAfterSeconds': PREVIOUS_CLOSE_EXPIRE_SECONDS},
+    ],
+    'company_info': [
+        # find({'symbol': {'$in': ...}})
+        {'keys': [('symbol', ASCENDING)], 'name': 'symbol_unique', 'unique': True},
+        # Drop companies whose static fields nobody has refreshed for a week
+        {'keys': [('static_timestamp', ASCENDING)], 'name': 'static_timestamp_ttl',
+         'expireAfterSeconds': COMPANY_INFO_EXPIRE_SECONDS},
+    ],
+    'sp500_pages': [
+        # Pages are looked up by _id; expired snapshots are dropped after the retention period
+        {'keys': [('timestamp', ASCENDING)], 'name': 'timestamp_ttl',
+         'expireAfterSeconds': PAGE_RETENTION_SECONDS},
+    ],
+}
+
+
+def _existing_keys(collection):
+    """Return the key patterns of a collection's indexes as tuples."""
+    return {
+        tuple((field, direction) for field, direction in info['key']): info
+        for info in collection.index_information().values()
+    }
+
+
+def _options_match(spec, info):
+    """Whether an existing index has the spec's TTL and unique options."""
+    return (info.get('expireAfterSeconds') == spec.get('expireAfterSeconds')
+            and bool(info.get('unique')) == bool(spec.get('unique')))
+
+
+def find_missing_indexes(db):
+    """
+    Compare the expected indexes against the database.
+
+    Args:
+        db: pymongo Database
+
+    Returns:
+        list: (collection name, index name) for every expected index that
+              does not exist or exists without its expected TTL or unique option
+    """
+    missing = []
+    for collection_name, specs in INDEXES.items():
+        existing = _existing_keys(db[collection_name])
+        for spec in specs:
+            info = existing.get(tuple(spec['keys']))
+            if info is None or not _options_match(spec, info):
+                missing.append((collection_name, spec['name']))
+    return missing
+
+
+def ensure_indexes(db):
+    """
+    Idempotently create the expected indexes.
+
+    Indexes that already exist are left alone, except that a TTL index
+    whose expiry changed is updated in place with collMod. An index whose
+    unique option differs cannot be changed in place; it is reported as
+    failed (drop it to have it recreated). Failures (e.g. duplicate
+    user_ids blocking the unique index) are reported, not raised.
+
+    Args:
+        db: pymongo Database
+
+    Returns:
+        dict: Report with:
+            - created: (collection, index name) pairs created or updated
+            - failed: (collection, index name, error) for indexes that could not be created
+            - missing: indexes still missing afterwards (see find_missing_indexes)
+    """
+    created = []
+    failed = []
+
+    for collection_name, specs in INDEXES.items():
+        collection = db[collection_name]
+        existing = _existing_keys(collection)
+
+        for spec in specs:
+            info = existing.get(tuple(spec['keys']))
+            ttl = spec.get('expireAfterSeconds')
+            try:
+                if info is None:
+                    options = {key: value for key, value in spec.items() if key != 'keys'}
+                    collection.create_index(spec['keys'], **options)
+                    created.append((collection_name, spec['name']))
+                elif bool(info.get('unique')) != bool(spec.get('unique')):
+                    state = 'is not' if spec.get('unique') else 'is'
+                    failed.append((collection_name, spec['name'],
+                                   f"existing index on the same keys {state} unique; drop it to recreate"))
+                elif ttl is not None and info.get('expireAfterSeconds') != ttl:
+                    db.command('collMod', collection_name, index={
+                        'keyPattern': dict(spec['keys']),
+                        'expireAfterSeconds': ttl
+                    })
+                    created.append((collection_name, spec['name']))
+            except OperationFailure as e:
+                failed.append((collection_name, spec['name'], str(e)))
+
+    missing = find_missing_indexes(db)
+
+    for collection_name, name in created:
+        print(f"Created index {collection_name}.{name}")
+    for collection_name, name, error in failed:
+        print(f"Failed to create index {collection_name}.{name}: {error}")
+    for collection_name, name in missing:
+        print(f"Missing index {collection_name}.{name}")
+
+    return {'created': created, 'failed': failed, 'missing': missing}
+
+
+if __name__ == '__main__':
+    from database import get_db
+    report = ensure_indexes(get_db())
+    if not report['missing']:
+        print("All indexes present")
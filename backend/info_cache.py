@@ -0,0 +1,233 @@
+import os
+import time
+from datetime import datetime, timezone
+from cache import TTLCache, SingleFlight
+import metrics
+import tracing
+from database import LazyCollection
+from providers import call_provider
+from universe import get_universe
+
+# Company info cache
+# One symbol-keyed cache for the company data shown by /stock-data and the
+# S&P 500 listing, in memory (per process) and in MongoDB (shared). Fields
+# are grouped by how fast they change, and each group has its own TTL:
+# - static: name, market cap, P/E ratio (long TTL)
+# - quote: bid/ask and the day's open/high/low (short TTL)
+# The provider returns every field in one call, so when a group expires the
+# whole record is refetched; the static group still outlives it in MongoDB
+# and keeps company names available to a freshly started process.
+
+FIELD_GROUPS = {
+    'static': ('Name', 'Market Cap', 'P/E Ratio'),
+    'quote': ('Bid', 'Ask', 'Open', 'High', 'Low'),
+}
+GROUP_TTLS = {
+    'static': float(os.getenv('INFO_STATIC_TTL', str(24 * 60 * 60))),
+    'quote': float(os.getenv('INFO_QUOTE_TTL', '60')),
+}
+
+info_collection = LazyCollection('company_info')
+
+# group -> TTLCache of symbol -> (fields, timestamp)
+_caches = {
+    group: TTLCache(maxsize=int(os.getenv('INFO_CACHE_SIZE', '1024')), ttl=ttl)
+    for group, ttl in GROUP_TTLS.items()
+}
+_info_flight = SingleFlight()  # Concurrent misses on one symbol share one fetch
+
+
+def summarize_info(info):
+    """Reduce a provider info dict to the fields the frontend displays."""
+    return {
+        'Name': info.get('shortName'),
+        'Bid': info.get('bid'),
+        'Ask': info.get('ask'),
+        'Open': info.get('regularMarketOpen'),
+        'High': info.get('regularMarketDayHigh'),
+        'Low': info.get('regularMarketDayLow'),
+        'Market Cap': info.get('marketCap'),
+        'P/E Ratio': info.get('trailingPE'),
+    }
+
+
+def _to_epoch(timestamp):
+    """Convert a naive UTC datetime (as stored in MongoDB) to epoch seconds."""
+    return timestamp.replace(tzinfo=timezone.utc).timestamp()
+
+
+def _entry(groups):
+    """
+    Merge cached field groups into one result.
+
+    Returns:
+        dict: data (summarized info), timestamp (newest group fetch time,
+              a version for validators) and max_age (seconds until the
+              first group expires)
+    """
+    now = time.time()
+    merged = {}
+    for fields, _ in groups.values():
+        merged.update(fields)
+    return {
+        'data': {field: merged.get(field) for field in summarize_info({})},
+        'timestamp': max(timestamp for _, timestamp in groups.values()),
+        'max_age': max(0, min(GROUP_TTLS[group] - (now - timestamp) for group, (_, timestamp) in groups.items()))
+    }
+
+
+def _from_memory(symbol):
+    groups = {}
+    for group, cache in _caches.items():
+        cached = cache.get(symbol)
+        if cached is not None:
+            groups[group] = cached
+    return groups
+
+
+def _remember(symbol, group, fields, timestamp):
+    _caches[group].set(symbol, (fields, timestamp), timestamp)
+    if group == 'static':
+        # Make the company name searchable
+        get_universe().add_name(symbol, fields.get('Name'))
+
+
+def _fetch_info(symbol):
+    """Fetch one symbol from the provider and store it in both tiers (single-flight leader)."""
+    groups = _from_memory(symbol)
+    if len(groups) == len(FIELD_GROUPS):
+        return groups
+
+    summary = summarize_info(call_provider('get_info', symbol))
+    now = time.time()
+    groups = {}
+    update = {}
+    for group, fields in FIELD_GROUPS.items():
+        values = {field: summary[field] for field in fields}
+        _remember(symbol, group, values, now)
+        groups[group] = (values, now)
+        update[group] = values
+        update[f'{group}_timestamp'] = datetime.fromtimestamp(now, timezone.utc).replace(tzinfo=None)
+
+    info_collection.update_one({'symbol': symbol}, {'$set': update}, upsert=True)
+    return groups
+
+
+def _from_database(symbols):
+    """Load fresh groups for several symbols from MongoDB in one query into memory."""
+    now = time.time()
+    found = {}
+    for doc in info_collection.find({'symbol': {'$in': list(symbols)}}):
+        groups = {}
+        for group in FIELD_GROUPS:
+            timestamp = doc.get(f'{group}_timestamp')
+            if group in doc and timestamp is not None:
+                timestamp = _to_epoch(timestamp)
+                if now - timestamp < GROUP_TTLS[group]:
+                    _remember(doc['symbol'], group, doc[group], timestamp)
+                    groups[group] = (doc[group], timestamp)
+        found[doc['symbol']] = groups
+    return found
+
+
+@tracing.traced()
+def get_company_infos(symbols, executor=None):
+    """
+    Get company info for several symbols.
+
+    Memory first, then one MongoDB query for the remaining symbols, then
+    the provider for anything still missing or expired (concurrently on
+    executor if given).
+
+    Args:
+        symbols (list): Stock symbols
+        executor (Executor): Optional pool to fetch misses on
+
+    Returns:
+        dict: symbol -> entry (see get_company_info), or None if it could not be fetched
+    """
+    results = {}
+    missing = []
+    for symbol in symbols:
+        groups = _from_memory(symbol)
+        if len(groups) == len(FIELD_GROUPS):
+            results[symbol] = _entry(groups)
+        else:
+            missing.append(symbol)
+
+    if missing:
+        stored = _from_database(missing)
+        to_fetch = []
+        for symbol in missing:
+            groups = stored.get(symbol, {})
+            if len(groups) == len(FIELD_GROUPS):
+                results[symbol] = _entry(groups)
+            else:
+                to_fetch.append(symbol)
+
+        def fetch(symbol):
+            try:
+                return _entry(_info_flight.do(symbol, lambda: _fetch_info(symbol)))
+            except Exception as e:
+                print(f"Error fetching {symbol}: {e}")
+                return None
+
+        fetched = executor.map(tracing.bind(fetch), to_fetch) if executor else map(fetch, to_fetch)
+        results.update(zip(to_fetch, fetched))
+
+    return {symbol: results.get(symbol) for symbol in symbols}
+
+
+def load_cached_names():
+    """
+    Make the company names stored in MongoDB searchable.
+
+    tickers.txt may list bare symbols, so at startup the search index is
+    seeded from the shared company info cache instead of waiting for each
+    company to be fetched.
+
+    Returns:
+        int: Number of names loaded
+    """
+    universe = get_universe()
+    loaded = 0
+    for doc in info_collection.find({'static.Name': {'$ne': None}}, {'symbol': 1, 'static.Name': 1}):
+        universe.add_name(doc['symbol'], doc['static']['Name'])
+        loaded += 1
+    return loaded
+
+
+@tracing.traced()
+def get_company_info(symbol):
+    """
+    Get company info for one symbol.
+
+    Returns:
+        dict: Entry with:
+            - data: summarized info (see summarize_info)
+            - timestamp: when the newest field group was fetched (epoch seconds)
+            - max_age: seconds until the first field group expires
+
+    Raises:
+        Exception: The provider's error if the symbol is not cached and cannot be fetched
+    """
+    groups = _from_memory(symbol)
+    if len(groups) < len(FIELD_GROUPS):
+        groups = _from_database([symbol]).get(symbol, {})
+    if len(groups) < len(FIELD_GROUPS):
+        groups = _info_flight.do(symbol, lambda: _fetch_info(symbol))
+    return _entry(groups)
+
+
+def stats():
+    """Hit/miss counters of the in-memory tier, per field group."""
+    return {group: cache.stats() for group, cache in _caches.items()}
+
+
+@metrics.collector
+def _collect_metrics():
+    """Report the in-memory tier's lookups per field group at scrape time."""
+    lookups = []
+    for group, group_stats in stats().items():
+        lookups.extend(metrics.cache_stats_samples(f'company_info_{group}_memory', group_stats))
+    return [('cache_lookups_total', 'counter', metrics.cache_lookups.documentation, lookups)]
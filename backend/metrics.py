@@ -0,0 +1,289 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from pymongo import monitoring
+
+# Prometheus metrics
+# Counters and histograms kept in process memory and rendered in the
+# Prometheus text format (version 0.0.4) by GET /metrics. Besides metrics
+# updated on the hot path, collectors registered with collector() are called
+# at scrape time to report state that is already counted elsewhere (e.g. the
+# hit/miss counters of the in-memory caches).
+#
+# Values are per process: with several workers, scrape each one (or let the
+# scraper aggregate by instance). METRICS_ENABLED=false turns off the
+# request hooks, the MongoDB command listener and the endpoint.
+
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+
+# Seconds; covers a cached lookup (sub-millisecond) up to a slow provider call
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_metrics = []
+_collectors = []
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    type = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}  # label values -> count
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            return self._values.get(key, 0)
+
+    def samples(self):
+        """Return (name, labels, value) tuples."""
+        with self._lock:
+            return [
+                (self.name, dict(zip(self.labelnames, key)), value)
+                for key, value in sorted(self._values.items())
+            ]
+
+
+class Histogram:
+    """Cumulative-bucket histogram (Prometheus semantics) with optional labels."""
+
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}  # label values -> [per-bucket counts (+Inf last), sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the with block, also when it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            state = self._values.get(key)
+            return sum(state[0]) if state else 0
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        for key, (counts, total) in items:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                samples.append((f'{self.name}_bucket', {**labels, 'le': _format_value(float(bound))}, cumulative))
+            samples.append((f'{self.name}_sum', labels, total))
+            samples.append((f'{self.name}_count', labels, cumulative))
+        return samples
+
+
+def counter(name, documentation, labelnames=()):
+    """Create and register a counter."""
+    metric = Counter(name, documentation, labelnames)
+    _metrics.append(metric)
+    return metric
+
+
+def histogram(name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+    """Create and register a histogram."""
+    metric = Histogram(name, documentation, labelnames, buckets)
+    _metrics.append(metric)
+    return metric
+
+
+def collector(fn):
+    """
+    Register a scrape-time collector (usable as a decorator).
+
+    fn() returns an iterable of (name, type, documentation, samples), with
+    samples as (labels, value) pairs. A collector may report into the same
+    metric name as a registered metric; their samples are merged.
+    """
+    _collectors.append(fn)
+    return fn
+
+
+def render():
+    """Render every metric in the Prometheus text exposition format."""
+    families = {}  # name -> (type, documentation, [(name, labels, value)])
+
+    def family(name, kind, documentation):
+        return families.setdefault(name, (kind, documentation, []))[2]
+
+    for metric in _metrics:
+        family(metric.name, metric.type, metric.documentation).extend(metric.samples())
+    for fn in _collectors:
+        try:
+            for name, kind, documentation, samples in fn():
+                family(name, kind, documentation).extend((name, labels, value) for labels, value in samples)
+        except Exception as e:
+            print(f"Metrics collector {getattr(fn, '__name__', fn)} failed: {e}")
+
+    lines = []
+    for name, (kind, documentation, samples) in families.items():
+        lines.append(f'# HELP {name} {documentation}')
+        lines.append(f'# TYPE {name} {kind}')
+        for sample_name, labels, value in samples:
+            lines.append(f'{sample_name}{_format_labels(labels)} {_format_value(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+# Metrics shared across modules
+
+http_request_duration = histogram(
+    'http_request_duration_seconds', 'HTTP request latency by route.', ('method', 'route', 'status')
+)
+mongo_command_duration = histogram(
+    'mongo_command_duration_seconds', 'MongoDB command latency by collection and command.', ('collection', 'command')
+)
+mongo_command_errors = counter(
+    'mongo_command_errors_total', 'Failed MongoDB commands by collection and command.', ('collection', 'command')
+)
+provider_call_duration = histogram(
+    'provider_call_duration_seconds', 'Market data provider call latency.', ('provider', 'method')
+)
+provider_call_errors = counter(
+    'provider_call_errors_total', 'Market data provider calls that raised.', ('provider', 'method')
+)
+cache_lookups = counter(
+    'cache_lookups_total', 'Cache lookups by cache and result (hit, miss or stale).', ('cache', 'result')
+)
+
+
+def cache_stats_samples(cache_name, stats):
+    """Turn TTLCache.stats() into cache_lookups_total samples."""
+    return [
+        ({'cache': cache_name, 'result': 'hit'}, stats['hits']),
+        ({'cache': cache_name, 'result': 'miss'}, stats['misses']),
+        ({'cache': cache_name, 'result': 'stale'}, stats['stale_hits']),
+    ]
+
+
+# Flask
+
+def instrument_app(app):
+    """
+    Record the latency of every request and serve GET /metrics.
+
+    Routes are labelled by their URL rule (e.g. /api/stock-data/<ticker>)
+    rather than the path, so the number of label values stays bounded.
+    Streaming responses are timed up to the start of the stream.
+    """
+    from flask import Response, g, request
+
+    @app.route('/metrics')
+    def metrics_endpoint():
+        return Response(render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_start = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        start = g.pop('metrics_start', None)
+        if start is not None:
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            http_request_duration.observe(
+                time.perf_counter() - start,
+                method=request.method, route=route, status=response.status_code
+            )
+        return response
+
+    return app
+
+
+# MongoDB
+
+class MongoCommandListener(monitoring.CommandListener):
+    """
+    pymongo command listener recording per-collection command latency.
+
+    The collection is taken from the command document when the command
+    starts (completion events do not carry it) and looked up again by
+    request id when it completes.
+    """
+
+    def __init__(self):
+        self._collections = {}  # (connection id, request id) -> collection
+
+    @staticmethod
+    def _collection(command, command_name):
+        target = command.get(command_name)
+        if command_name == 'getMore':
+            target = command.get('collection')
+        return target if isinstance(target, str) else ''
+
+    def started(self, event):
+        self._collections[(event.connection_id, event.request_id)] = self._collection(
+            event.command, event.command_name
+        )
+
+    def _finish(self, event):
+        collection = self._collections.pop((event.connection_id, event.request_id), '')
+        mongo_command_duration.observe(
+            event.duration_micros / 1e6, collection=collection, command=event.command_name
+        )
+        return collection
+
+    def succeeded(self, event):
+        self._finish(event)
+
+    def failed(self, event):
+        collection = self._finish(event)
+        mongo_command_errors.inc(collection=collection, command=event.command_name)
+
+
+def event_listeners():
+    """Listeners to pass to MongoClient (none when metrics are disabled)."""
+    return [MongoCommandListener()] if METRICS_ENABLED else []
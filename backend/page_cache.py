@@ -0,0 +1,140 @@
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from pymongo.errors import DuplicateKeyError
+from cache import TTLCache
+from database import LazyCollection
+
+# S&P 500 page cache stores
+# Built listing pages are kept in a store shared by every worker (MongoDB by
+# default) so a page is fetched once per deployment rather than once per
+# worker, and all workers serve the same snapshot. Each store also provides
+# a refresh lock with an expiry (a lease), so only one worker rebuilds an
+# expired page while the others keep serving the previous snapshot.
+#
+# Stores return entries of any age up to their retention; callers decide
+# what is fresh. Selected with SP500_PAGE_CACHE: 'mongo' (default) or 'local'.
+
+PAGE_RETENTION_SECONDS = int(os.getenv('SP500_PAGE_RETENTION', str(60 * 60)))
+
+
+class LocalPageStore:
+    """
+    Per-process page store (for single-worker setups and tests).
+
+    Entries are evicted by LRU and after the retention period; the refresh
+    lock only coordinates threads of this process.
+    """
+
+    name = 'local'
+
+    def __init__(self, maxsize=64, retention=PAGE_RETENTION_SECONDS):
+        self._cache = TTLCache(maxsize=maxsize, ttl=retention)
+        self._lock = threading.Lock()
+        self._locks = {}  # key -> (token, expires)
+
+    def get(self, key):
+        """Return {'data', 'timestamp'} for a page, or None."""
+        return self._cache.get(key)
+
+    def set(self, key, data, timestamp):
+        self._cache.set(key, {'data': data, 'timestamp': timestamp}, timestamp)
+
+    def acquire(self, key, ttl):
+        """Take the refresh lock for a page; returns a token, or None if another refresh holds it."""
+        now = time.time()
+        with self._lock:
+            held = self._locks.get(key)
+            if held and held[1] > now:
+                return None
+            token = uuid.uuid4().hex
+            self._locks[key] = (token, now + ttl)
+            return token
+
+    def release(self, key, token):
+        with self._lock:
+            held = self._locks.get(key)
+            if held and held[0] == token:
+                del self._locks[key]
+
+    def stats(self):
+        return self._cache.stats()
+
+
+class MongoPageStore:
+    """
+    Page store shared by all workers through a MongoDB collection.
+
+    One document per page: {_id: key, tickers: [{symbol, info}], timestamp,
+    lock_token, lock_expires}. Symbols are stored as values rather than
+    field names because some contain dots (e.g. BRK.B). The refresh lock is
+    taken with a conditional upsert, so exactly one worker wins it; a lock
+    left by a crashed worker expires after its ttl.
+    """
+
+    name = 'mongo'
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    @staticmethod
+    def _to_datetime(timestamp):
+        return datetime.fromtimestamp(timestamp, timezone.utc).replace(tzinfo=None)
+
+    def get(self, key):
+        doc = self.collection.find_one({'_id': key, 'timestamp': {'$exists': True}})
+        if doc is None:
+            return None
+        return {
+            'data': {item['symbol']: item['info'] for item in doc['tickers']},
+            'timestamp': doc['timestamp'].replace(tzinfo=timezone.utc).timestamp()
+        }
+
+    def set(self, key, data, timestamp):
+        self.collection.update_one(
+            {'_id': key},
+            {'$set': {
+                'tickers': [{'symbol': symbol, 'info': info} for symbol, info in data.items()],
+                'timestamp': self._to_datetime(timestamp)
+            }},
+            upsert=True
+        )
+
+    def acquire(self, key, ttl):
+        now = time.time()
+        token = uuid.uuid4().hex
+        try:
+            # Matches only if the page is unlocked or its lock expired; otherwise
+            # the upsert collides with the existing document
+            self.collection.update_one(
+                {'_id': key, '$or': [
+                    {'lock_expires': {'$exists': False}},
+                    {'lock_expires': {'$lt': self._to_datetime(now)}}
+                ]},
+                {'$set': {'lock_token': token, 'lock_expires': self._to_datetime(now + ttl)}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            return None
+        return token
+
+    def release(self, key, token):
+        self.collection.update_one(
+            {'_id': key, 'lock_token': token},
+            {'$unset': {'lock_token': '', 'lock_expires': ''}}
+        )
+
+    def stats(self):
+        return {}
+
+
+def create_page_store():
+    """Create the page store selected by SP500_PAGE_CACHE."""
+    name = os.getenv('SP500_PAGE_CACHE', 'mongo').lower()
+    if name == 'local':
+        return LocalPageStore(maxsize=int(os.getenv('SP500_PAGE_CACHE_SIZE', '64')))
+    if name == 'mongo':
+        return MongoPageStore(LazyCollection('sp500_pages'))
+    raise ValueError(f"Unknown page cache store: {name}")
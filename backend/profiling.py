@@ -0,0 +1,168 @@
+import cProfile
+import fnmatch
+import json
+import os
+import pstats
+import random
+import re
+import threading
+import time
+
+# Per-request profiling
+# Opt-in cProfile capture of individual requests, to see whether a slow
+# view spent its time in MongoDB, in the market data provider or in Python.
+# A request is profiled when it is sampled (PROFILE_SAMPLE_RATE) or sends
+# X-Profile: <PROFILE_TOKEN>. Every profile is logged and written to
+# PROFILE_DIR if set (open it with pstats or snakeviz); only requests with
+# the token get the summary back in an X-Profile-Summary header (JSON),
+# since it reveals internals to the client.
+#
+# With neither setting, init_app installs no hooks, so profiling costs
+# nothing. Only the request's own thread is profiled: work handed to thread
+# pools (ASYNC_VIEWS, the S&P 500 page fetch pool) shows up as waiting.
+
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_TOKEN = os.getenv('PROFILE_TOKEN')
+PROFILE_DIR = os.getenv('PROFILE_DIR')
+PROFILE_TOP = int(os.getenv('PROFILE_TOP', '5'))
+
+# Trading functions whose cumulative time is always reported
+WATCHED_FUNCTIONS = (
+    'get_stock_price', 'get_multiple_stock_prices', 'get_previous_closes',
+    'calculate_*', 'value_portfolio'
+)
+WATCHED_MODULES = ('trading.py', 'valuation.py')
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+_DATABASE_PACKAGES = ('pymongo', 'bson', 'mongomock')  # mongomock: offline benchmarks
+
+# One profile at a time: profilers of concurrent requests would otherwise
+# conflict (Python 3.12+ allows a single active profiler), so a request
+# arriving while another is profiled is served unprofiled
+_profile_lock = threading.Lock()
+
+
+def is_enabled():
+    return PROFILE_SAMPLE_RATE > 0 or bool(PROFILE_TOKEN)
+
+
+def has_token(header_value):
+    """Whether a request's X-Profile header (or None) carries PROFILE_TOKEN."""
+    return bool(PROFILE_TOKEN) and header_value == PROFILE_TOKEN
+
+
+def should_profile(header_value):
+    """Decide whether to profile a request, given its X-Profile header (or None)."""
+    if has_token(header_value):
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+def _in_packages(filename, packages):
+    return any(f'{os.sep}{package}{os.sep}' in filename for package in packages)
+
+
+def _is_database(filename):
+    return _in_packages(filename, _DATABASE_PACKAGES)
+
+
+def _label(func):
+    filename, line, name = func
+    if filename == '~':
+        return name  # Built-in, e.g. {method 'recv_into' of '_socket.socket' objects}
+    return f'{os.path.basename(filename)}:{line}({name})'
+
+
+def summarize(stats, top=PROFILE_TOP):
+    """
+    Break a request profile down by where the time went.
+
+    Args:
+        stats (pstats.Stats): Profile of one request
+        top (int): Number of functions to list by own (self) time
+
+    Returns:
+        dict: Milliseconds of:
+            - total: the whole profiled request
+            - mongo: time inside the MongoDB driver, entered from outside it
+            - provider: market data calls (providers.call_provider)
+            - functions: cumulative time of each WATCHED_FUNCTIONS match
+            - top: [label, own ms, cumulative ms] of the slowest functions
+    """
+    raw = stats.stats  # func -> (primitive calls, calls, own time, cumulative time, callers)
+    mongo = 0.0
+    provider = 0.0
+    functions = {}
+    for func, (_, _, _, cumulative, callers) in raw.items():
+        filename, _, name = func
+        if _is_database(filename):
+            # Only count calls into the driver, not the driver's internal calls
+            mongo += sum(
+                caller_stats[3] for caller, caller_stats in callers.items()
+                if not _is_database(caller[0])
+            )
+        elif os.path.dirname(filename) == BACKEND_DIR:
+            module = os.path.basename(filename)
+            if module == 'providers.py' and name == 'call_provider':
+                provider += cumulative
+            elif module in WATCHED_MODULES and any(fnmatch.fnmatchcase(name, pattern) for pattern in WATCHED_FUNCTIONS):
+                functions[name] = functions.get(name, 0.0) + cumulative * 1000
+
+    slowest = sorted(raw.items(), key=lambda item: item[1][2], reverse=True)[:top]
+    return {
+        'total': round(stats.total_tt * 1000, 2),
+        'mongo': round(mongo * 1000, 2),
+        'provider': round(provider * 1000, 2),
+        'functions': {name: round(ms, 2) for name, ms in sorted(functions.items())},
+        'top': [[_label(func), round(own * 1000, 2), round(cumulative * 1000, 2)]
+                for func, (_, _, own, cumulative, _) in slowest]
+    }
+
+
+def _profile_path(method, route):
+    name = re.sub(r'[^A-Za-z0-9]+', '_', route).strip('_') or 'root'
+    return os.path.join(PROFILE_DIR, f'{int(time.time() * 1000)}-{method}-{name}.prof')
+
+
+def instrument_app(app):
+    """Profile selected requests of app (see the module comment)."""
+    from flask import g, request
+
+    def stop():
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            profiler.disable()
+            _profile_lock.release()
+        return profiler
+
+    @app.before_request
+    def _start_profile():
+        if should_profile(request.headers.get('X-Profile')) and _profile_lock.acquire(blocking=False):
+            g.profiler = cProfile.Profile()
+            g.profiler.enable()
+
+    @app.after_request
+    def _finish_profile(response):
+        profiler = stop()
+        if profiler is None:
+            return response
+
+        stats = pstats.Stats(profiler)
+        summary = summarize(stats)
+        route = request.url_rule.rule if request.url_rule else request.path
+        if has_token(request.headers.get('X-Profile')):
+            # Sampled requests are only profiled, never shown their profile
+            response.headers['X-Profile-Summary'] = json.dumps(summary, separators=(',', ':'))
+        if PROFILE_DIR:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            stats.dump_stats(_profile_path(request.method, route))
+        print(f"Profiled {request.method} {route}: {summary['total']} ms "
+              f"(mongo {summary['mongo']} ms, provider {summary['provider']} ms)")
+        return response
+
+    @app.teardown_request
+    def _release_profile(error=None):
+        # Requests that fail before after_request still release the profiler
+        stop()
+
+    return app
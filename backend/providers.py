@@ -0,0 +1,361 @@
+import json
+import os
+import time
+from abc import ABC, abstractmethod
+import metrics
+import tracing
+
+# Market data providers
+# Every quote, history and company-info lookup in the backend goes through the
+# provider returned by get_provider(), so the data source can be swapped
+# without touching trading logic or routes. Callers use call_provider(), which
+# also records each call's latency and errors (see metrics.py).
+
+
+class MarketDataProvider(ABC):
+    """
+    Interface for a source of market data.
+
+    Implementations must provide (instantiating one that does not raises
+    TypeError):
+    - get_price: latest trade/close price for a symbol
+    - get_history: recent daily closing prices for a symbol
+    - get_info: company information dict (Yahoo-style keys)
+
+    Batch methods (get_prices, get_histories, get_previous_closes) have
+    per-symbol default implementations and can be overridden.
+
+    Lookups that find no data raise ValueError, matching the error contract
+    of trading.get_stock_price.
+    """
+
+    name = 'base'
+
+    @abstractmethod
+    def get_price(self, symbol):
+        """Latest price for symbol; raises ValueError if there is none."""
+
+    def get_prices(self, symbols):
+        """
+        Fetch latest prices for several symbols.
+
+        The default implementation calls get_price once per symbol.
+        Providers that support multi-symbol requests should override it.
+
+        Args:
+            symbols (list): List of stock symbols
+
+        Returns:
+            dict: symbol -> price for every symbol that could be priced.
+                  Symbols with no data are omitted.
+        """
+        prices = {}
+        for symbol in symbols:
+            try:
+                prices[symbol] = self.get_price(symbol)
+            except ValueError:
+                continue
+        return prices
+
+    @abstractmethod
+    def get_history(self, symbol, period='2d'):
+        """Daily closing prices for symbol over period (oldest first)."""
+
+    def get_histories(self, symbols, period='2d'):
+        """
+        Fetch recent daily closes for several symbols.
+
+        The default implementation calls get_history once per symbol.
+
+        Returns:
+            dict: symbol -> list of closing prices (oldest first).
+                  Symbols with no data are omitted.
+        """
+        histories = {}
+        for symbol in symbols:
+            try:
+                histories[symbol] = self.get_history(symbol, period=period)
+            except ValueError:
+                continue
+        return histories
+
+    def get_previous_closes(self, symbols, trading_date):
+        """
+        Fetch each symbol's closing price for the session before trading_date.
+
+        The default implementation assumes the last close in a 2-day history
+        is trading_date's session and returns the one before it.
+
+        Args:
+            symbols (list): List of stock symbols
+            trading_date (date): Trading session the previous close is relative to
+
+        Returns:
+            dict: symbol -> previous close. Symbols with no data are omitted.
+        """
+        histories = self.get_histories(symbols, period='2d')
+        return {symbol: closes[-2] for symbol, closes in histories.items() if len(closes) >= 2}
+
+    @abstractmethod
+    def get_info(self, symbol):
+        """Company information dict (Yahoo-style keys)."""
+
+
+def _yfinance():
+    """Import yfinance (and pandas with it) on first use rather than at startup."""
+    import yfinance
+    return yfinance
+
+
+class YFinanceProvider(MarketDataProvider):
+    """Live market data from Yahoo Finance via yfinance."""
+
+    name = 'yfinance'
+
+    def get_price(self, symbol):
+        closes = self.get_history(symbol, period='1d')
+        return closes[-1]
+
+    def get_prices(self, symbols):
+        histories = self.get_histories(symbols, period='1d')
+        return {symbol: closes[-1] for symbol, closes in histories.items()}
+
+    def _download_closes(self, symbols, period):
+        """
+        Download daily closes for several symbols with one yf.download call.
+
+        yfinance has no single multi-symbol quote request, so yf.download
+        fans the per-symbol chart requests out over its own thread pool;
+        the caller still issues one call instead of len(symbols) sequential ones.
+
+        Returns:
+            dict: symbol -> pandas Series of closes indexed by bar timestamp
+        """
+        symbols = list(symbols)
+        if not symbols:
+            return {}
+
+        yf = _yfinance()
+        data = yf.download(symbols, period=period, progress=False, threads=True)
+        if data.empty:
+            return {}
+
+        # Multi-symbol downloads return one Close column per symbol;
+        # a single symbol comes back as a plain Series
+        closes = data['Close']
+        if hasattr(closes, 'columns'):
+            series_by_symbol = {symbol: closes[symbol] for symbol in closes.columns}
+        else:
+            series_by_symbol = {symbols[0]: closes}
+
+        return {
+            symbol: series.dropna()
+            for symbol, series in series_by_symbol.items()
+            if not series.dropna().empty
+        }
+
+    def get_histories(self, symbols, period='2d'):
+        return {
+            symbol: [float(close) for close in series]
+            for symbol, series in self._download_closes(symbols, period).items()
+        }
+
+    def get_previous_closes(self, symbols, trading_date):
+        """Use the bar dates so the result does not depend on whether today's session has opened."""
+        previous_closes = {}
+        for symbol, series in self._download_closes(symbols, '5d').items():
+            earlier = [float(close) for timestamp, close in series.items() if timestamp.date() < trading_date]
+            if earlier:
+                previous_closes[symbol] = earlier[-1]
+        return previous_closes
+
+    def get_history(self, symbol, period='2d'):
+        """
+        Args:
+            symbol (str): Stock symbol
+            period (str): yfinance period string (e.g. '1d', '2d', '5d')
+
+        Returns:
+            list: Daily closing prices, oldest first
+        """
+        hist = _yfinance().Ticker(symbol).history(period=period)
+        if hist.empty:
+            raise ValueError(f"No price data available for {symbol}")
+        return [float(close) for close in hist['Close']]
+
+    def get_info(self, symbol):
+        return _yfinance().Ticker(symbol).info
+
+
+class ReplayProvider(MarketDataProvider):
+    """
+    Deterministic provider that replays recorded market data from disk.
+
+    Used to run the backend (and benchmarks against it) with no network.
+    Every call sleeps for latency_ms to simulate a provider round trip;
+    a multi-symbol call counts as a single round trip.
+
+    Replay file format (JSON):
+        {
+            "quotes":  {"AAPL": 189.25, ...},
+            "history": {"AAPL": [187.10, 189.25], ...},   # oldest first
+            "info":    {"AAPL": {"shortName": "Apple Inc.", ...}, ...}
+        }
+
+    A symbol with history but no quote is priced at its last close.
+    """
+
+    name = 'replay'
+
+    def __init__(self, path, latency_ms=0):
+        with open(path, 'r') as f:
+            data = json.load(f)
+        self.path = path
+        self.latency_ms = latency_ms
+        self.quotes = data.get('quotes', {})
+        self.history = data.get('history', {})
+        self.info = data.get('info', {})
+
+    def _simulate_latency(self):
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000.0)
+
+    def _lookup_price(self, symbol):
+        if symbol in self.quotes:
+            return float(self.quotes[symbol])
+        if self.history.get(symbol):
+            return float(self.history[symbol][-1])
+        raise ValueError(f"No price data available for {symbol}")
+
+    def get_price(self, symbol):
+        self._simulate_latency()
+        return self._lookup_price(symbol)
+
+    def get_prices(self, symbols):
+        self._simulate_latency()
+        prices = {}
+        for symbol in symbols:
+            try:
+                prices[symbol] = self._lookup_price(symbol)
+            except ValueError:
+                continue
+        return prices
+
+    def _lookup_history(self, symbol, period):
+        closes = self.history.get(symbol)
+        if not closes:
+            raise ValueError(f"No price data available for {symbol}")
+        # Periods are day counts ('2d' -> last two closes)
+        days = int(period[:-1]) if period.endswith('d') else len(closes)
+        return [float(close) for close in closes[-days:]]
+
+    def get_history(self, symbol, period='2d'):
+        self._simulate_latency()
+        return self._lookup_history(symbol, period)
+
+    def get_histories(self, symbols, period='2d'):
+        self._simulate_latency()
+        histories = {}
+        for symbol in symbols:
+            try:
+                histories[symbol] = self._lookup_history(symbol, period)
+            except ValueError:
+                continue
+        return histories
+
+    def get_info(self, symbol):
+        self._simulate_latency()
+        if symbol not in self.info:
+            raise ValueError(f"No info available for {symbol}")
+        return dict(self.info[symbol])
+
+
+def record_replay_file(symbols, path, source=None, history_period='5d'):
+    """
+    Record quotes, history and info for symbols into a replay file.
+
+    Args:
+        symbols (list): Symbols to record
+        path (str): Destination JSON file
+        source (MarketDataProvider): Provider to record from (default: yfinance)
+        history_period (str): History period to record per symbol
+
+    Returns:
+        dict: symbol -> error message for symbols that could not be recorded
+    """
+    source = source or YFinanceProvider()
+    data = {'quotes': {}, 'history': {}, 'info': {}}
+    errors = {}
+
+    for symbol in symbols:
+        try:
+            closes = source.get_history(symbol, period=history_period)
+            data['history'][symbol] = closes
+            data['quotes'][symbol] = closes[-1]
+            data['info'][symbol] = source.get_info(symbol)
+        except Exception as e:
+            errors[symbol] = str(e)
+
+    with open(path, 'w') as f:
+        json.dump(data, f, default=str)
+
+    return errors
+
+
+_provider = None
+
+def create_provider():
+    """
+    Build the provider selected by environment variables.
+
+    Environment:
+        MARKET_DATA_PROVIDER: 'yfinance' (default) or 'replay'
+        MARKET_DATA_REPLAY_FILE: Replay file path (required for 'replay')
+        MARKET_DATA_LATENCY_MS: Simulated latency per replay call (default 0)
+    """
+    kind = os.getenv('MARKET_DATA_PROVIDER', 'yfinance').lower()
+    if kind == 'yfinance':
+        return YFinanceProvider()
+    if kind == 'replay':
+        path = os.getenv('MARKET_DATA_REPLAY_FILE')
+        if path is None:
+            raise Exception('MARKET_DATA_REPLAY_FILE is not set')
+        latency_ms = float(os.getenv('MARKET_DATA_LATENCY_MS', '0'))
+        return ReplayProvider(path, latency_ms=latency_ms)
+    raise Exception(f'Unknown MARKET_DATA_PROVIDER: {kind}')
+
+def get_provider():
+    """Return the process-wide market data provider, creating it on first use."""
+    global _provider
+    if _provider is None:
+        _provider = create_provider()
+    return _provider
+
+def set_provider(provider):
+    """Replace the process-wide market data provider (benchmarks, tests)."""
+    global _provider
+    _provider = provider
+
+def call_provider(method, *args, **kwargs):
+    """
+    Call a method of the process-wide provider, timing it.
+
+    Records provider_call_duration_seconds and, if the call raises,
+    provider_call_errors_total, labelled by provider and method, and adds
+    a span to the current request trace.
+
+    Args:
+        method (str): Provider method name (e.g. 'get_prices')
+
+    Returns:
+        The method's result; its exceptions are re-raised
+    """
+    provider = get_provider()
+    detail = f'{provider.name} {args[0]}' if args and isinstance(args[0], str) else provider.name
+    try:
+        with metrics.provider_call_duration.time(provider=provider.name, method=method), \
+                tracing.span(f'provider.{method}', detail):
+            return getattr(provider, method)(*args, **kwargs)
+    except Exception:
+        metrics.provider_call_errors.inc(provider=provider.name, method=method)
+        raise
@@ -0,0 +1,212 @@
+import threading
+import time
+
+# Background stale-while-revalidate price refresher
+# Keeps the prices users actually hold and view warm, so request handlers are
+# served from cache instead of waiting on the market data provider.
+
+
+class PriceRefresher:
+    """
+    Background thread that refreshes tracked symbols before they expire.
+
+    Symbols are tracked from two sources:
+    - Viewed: symbols passed to track() by request handlers; dropped after
+      idle_seconds without being viewed
+    - Held: symbols returned by list_held(), re-read every held_interval seconds
+
+    On every tick, tracked symbols whose cached price is missing or within
+    lead_seconds of expiring are refreshed in batches. request() wakes the
+    thread immediately for symbols a handler just served stale. Before the
+    provider is called, load_shared gets the chance to pick up prices another
+    process has already refreshed. Symbols the provider cannot price are
+    retried with exponential backoff (retry_seconds, doubling up to
+    max_retry_seconds) instead of on every tick.
+
+    Args:
+        refresh (callable): refresh(symbols) fetches and caches prices for a batch and
+            returns the symbols it priced (e.g. a symbol -> price dict); None means all
+        get_age (callable): get_age(symbol) returns the cached price age in seconds, or None
+        load_shared (callable): Optional load_shared(symbols, max_age) loading prices no
+            older than max_age seconds from a shared cache; returns the symbols it loaded
+        list_held (callable): Optional list_held() returning symbols held by any user
+        on_tick (callable): Optional on_tick() run once per tick (e.g. daily refreshes)
+        ttl (float): Cache TTL the refresher is keeping prices within
+        lead_seconds (float): How long before expiry a price is refreshed
+        interval (float): Seconds between ticks
+        idle_seconds (float): How long a viewed symbol stays tracked
+        held_interval (float): Seconds between list_held() calls
+        batch_size (int): Maximum symbols per refresh() call
+        retry_seconds (float): Backoff after a symbol's first failed refresh
+        max_retry_seconds (float): Longest backoff between retries of one symbol
+    """
+
+    def __init__(self, refresh, get_age, load_shared=None, list_held=None, on_tick=None,
+                 ttl=30, lead_seconds=5, interval=1, idle_seconds=300, held_interval=60,
+                 batch_size=50, retry_seconds=30, max_retry_seconds=600):
+        self.refresh = refresh
+        self.get_age = get_age
+        self.load_shared = load_shared
+        self.list_held = list_held
+        self.on_tick = on_tick
+        self.ttl = ttl
+        self.lead_seconds = lead_seconds
+        self.interval = interval
+        self.idle_seconds = idle_seconds
+        self.held_interval = held_interval
+        self.batch_size = batch_size
+        self.retry_seconds = retry_seconds
+        self.max_retry_seconds = max_retry_seconds
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._viewed = {}  # symbol -> last time viewed
+        self._held = set()
+        self._held_loaded_at = 0
+        self._requested = set()
+        self._failures = {}  # symbol -> (consecutive failures, next retry time)
+
+        self.refreshes = 0
+        self.refreshed_symbols = 0
+        self.loaded_symbols = 0
+        self.errors = 0
+
+    def track(self, symbols):
+        """Record that symbols were just viewed so they are kept warm."""
+        now = time.time()
+        with self._lock:
+            for symbol in symbols:
+                self._viewed[symbol] = now
+
+    def request(self, symbols):
+        """Ask for symbols to be refreshed as soon as possible (served stale)."""
+        self.track(symbols)
+        with self._lock:
+            self._requested.update(symbols)
+        self._wake.set()
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Start the background thread (no-op if already running)."""
+        if self.is_running():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='price-refresher', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        """Stop the background thread and wait for it to exit."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+
+    def tracked_symbols(self):
+        """Return the symbols currently being kept warm."""
+        now = time.time()
+        with self._lock:
+            # Forget symbols nobody has viewed recently
+            for symbol, viewed_at in list(self._viewed.items()):
+                if now - viewed_at > self.idle_seconds:
+                    del self._viewed[symbol]
+            return set(self._viewed) | self._held
+
+    def due_symbols(self):
+        """Return tracked symbols that are missing from cache or about to expire (and not backing off)."""
+        now = time.time()
+        with self._lock:
+            requested = self._requested
+            self._requested = set()
+            backing_off = {symbol for symbol, (_, retry_at) in self._failures.items() if retry_at > now}
+
+        due = set(requested)
+        for symbol in self.tracked_symbols() - requested:
+            age = self.get_age(symbol)
+            if age is None or age >= self.ttl - self.lead_seconds:
+                due.add(symbol)
+        return sorted(due - backing_off)
+
+    def _record(self, batch, priced):
+        """Reset the backoff of priced symbols and extend it for the rest of batch."""
+        now = time.time()
+        with self._lock:
+            for symbol in batch:
+                if symbol in priced:
+                    self._failures.pop(symbol, None)
+                    continue
+                failures = self._failures.get(symbol, (0, 0))[0] + 1
+                delay = min(self.max_retry_seconds, self.retry_seconds * 2 ** (failures - 1))
+                self._failures[symbol] = (failures, now + delay)
+            # Forget failures of symbols no longer tracked
+            tracked = set(self._viewed) | self._held
+            for symbol in list(self._failures):
+                if symbol not in tracked:
+                    del self._failures[symbol]
+
+    def tick(self):
+        """Run one refresh cycle. Called by the background thread."""
+        if self.list_held and time.time() - self._held_loaded_at >= self.held_interval:
+            try:
+                held = set(self.list_held())
+                with self._lock:
+                    self._held = held
+            except Exception as e:
+                self.errors += 1
+                print(f"Price refresher failed to load held symbols: {e}")
+            self._held_loaded_at = time.time()
+
+        if self.on_tick:
+            try:
+                self.on_tick()
+            except Exception as e:
+                self.errors += 1
+                print(f"Price refresher tick hook failed: {e}")
+
+        due = self.due_symbols()
+        if due and self.load_shared:
+            # Another process may have refreshed them already
+            try:
+                loaded = set(self.load_shared(due, self.ttl - self.lead_seconds))
+                self.loaded_symbols += len(loaded)
+                due = [symbol for symbol in due if symbol not in loaded]
+            except Exception as e:
+                self.errors += 1
+                print(f"Price refresher failed to read shared prices: {e}")
+
+        for start in range(0, len(due), self.batch_size):
+            batch = due[start:start + self.batch_size]
+            try:
+                priced = self.refresh(batch)
+                priced = set(batch) if priced is None else set(priced)
+                self.refreshes += 1
+                self.refreshed_symbols += len(priced)
+            except Exception as e:
+                priced = set()
+                self.errors += 1
+                print(f"Price refresher failed for {batch}: {e}")
+            self._record(batch, priced)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.tick()
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def stats(self):
+        with self._lock:
+            tracked = len(set(self._viewed) | self._held)
+            backing_off = len(self._failures)
+        return {
+            'running': self.is_running(),
+            'tracked': tracked,
+            'backing_off': backing_off,
+            'refreshes': self.refreshes,
+            'refreshed_symbols': self.refreshed_symbols,
+            'loaded_symbols': self.loaded_symbols,
+            'errors': self.errors
+        }
@@ -0,0 +1,192 @@
+import json
+import threading
+
+# Live price stream
+# Every time the shared price cache is refreshed, the new prices are
+# published once and fanned out to all subscribers (Server-Sent Events
+# connections) interested in those symbols. Subscribers receive only what
+# changed since their last event; a slow client gets one merged delta
+# instead of a growing backlog.
+
+
+class Subscription:
+    """
+    One client's view of the stream: a set of symbols, optionally a portfolio.
+
+    Changes are merged into pending state under a condition variable and
+    handed out by next_event(), so memory per subscriber is bounded by the
+    number of symbols it watches.
+
+    Args:
+        symbols (iterable): Symbols to receive prices for
+        user_id (int): For portfolio subscriptions, the user being watched
+        holdings (dict): symbol -> quantity held (portfolio subscriptions)
+        buying_power (float): User's cash (portfolio subscriptions)
+        prices (dict): symbol -> last known price, sent as the first event
+    """
+
+    def __init__(self, symbols, user_id=None, holdings=None, buying_power=None, prices=None):
+        self.user_id = user_id
+        self.holdings = dict(holdings or {})
+        self.buying_power = buying_power
+        self.symbols = set(symbols) | set(self.holdings)
+        self.closed = False
+
+        self._cond = threading.Condition()
+        self._prices = {symbol: price for symbol, price in (prices or {}).items() if symbol in self.symbols}
+        self._changed = set()
+        self._snapshot = True  # First event carries everything known
+
+    def offer(self, prices):
+        """Merge published prices; returns True if anything changed for this subscriber."""
+        with self._cond:
+            changed = False
+            for symbol, price in prices.items():
+                if symbol in self.symbols and self._prices.get(symbol) != price:
+                    self._prices[symbol] = price
+                    self._changed.add(symbol)
+                    changed = True
+            if changed:
+                self._cond.notify()
+            return changed
+
+    def set_portfolio(self, holdings, buying_power, prices=None):
+        """Replace the watched holdings (after a trade); the next event is a full snapshot."""
+        with self._cond:
+            self.holdings = dict(holdings)
+            self.buying_power = buying_power
+            self.symbols |= set(self.holdings)
+            self._prices.update({symbol: price for symbol, price in (prices or {}).items() if symbol in self.symbols})
+            self._snapshot = True
+            self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify()
+
+    def _build_event(self):
+        symbols = set(self._prices) if self._snapshot else self._changed
+        event = {'prices': {symbol: self._prices[symbol] for symbol in symbols if symbol in self._prices}}
+
+        if self.user_id is not None:
+            holdings = {}
+            for symbol, quantity in self.holdings.items():
+                if symbol in symbols and symbol in self._prices:
+                    holdings[symbol] = {
+                        'quantity': quantity,
+                        'current_price': self._prices[symbol],
+                        'current_value': self._prices[symbol] * quantity
+                    }
+            event['holdings'] = holdings
+            # Only report a total once every holding has a price
+            if all(symbol in self._prices for symbol in self.holdings):
+                event['total_value'] = self.buying_power + sum(
+                    self._prices[symbol] * quantity for symbol, quantity in self.holdings.items()
+                )
+            if self._snapshot:
+                event['buying_power'] = self.buying_power
+
+        if self._snapshot:
+            event['snapshot'] = True
+        self._snapshot = False
+        self._changed = set()
+        return event
+
+    def next_event(self, timeout=None):
+        """
+        Wait for the next delta.
+
+        Returns:
+            dict: The event, {} if the timeout passed with no change (send a
+                  heartbeat), or None once the subscription is closed
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self.closed or self._snapshot or self._changed, timeout)
+            if self.closed:
+                return None
+            if not (self._snapshot or self._changed):
+                return {}
+            return self._build_event()
+
+
+class PriceStream:
+    """Registry of subscriptions; publish() fans one price update out to all of them."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = set()
+        self.published = 0
+        self.delivered = 0
+
+    def subscribe(self, symbols=(), user_id=None, holdings=None, buying_power=None, prices=None):
+        subscription = Subscription(symbols, user_id, holdings, buying_power, prices)
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        subscription.close()
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def _snapshot(self):
+        with self._lock:
+            return list(self._subscriptions)
+
+    def publish(self, prices):
+        """Offer freshly cached prices to every subscriber."""
+        if not prices:
+            return
+        self.published += 1
+        for subscription in self._snapshot():
+            if subscription.offer(prices):
+                self.delivered += 1
+
+    def watches_user(self, user_id):
+        return any(subscription.user_id == user_id for subscription in self._snapshot())
+
+    def update_portfolio(self, user_id, holdings, buying_power, prices=None):
+        """Push a user's new holdings to their portfolio subscriptions."""
+        for subscription in self._snapshot():
+            if subscription.user_id == user_id:
+                subscription.set_portfolio(holdings, buying_power, prices)
+
+    def symbols(self):
+        """Return every symbol some subscriber is watching."""
+        symbols = set()
+        for subscription in self._snapshot():
+            symbols |= subscription.symbols
+        return symbols
+
+    def stats(self):
+        with self._lock:
+            subscribers = len(self._subscriptions)
+        return {
+            'subscribers': subscribers,
+            'published': self.published,
+            'delivered': self.delivered
+        }
+
+
+def sse_events(subscription, heartbeat=15, on_heartbeat=None):
+    """
+    Yield a subscription's events as Server-Sent Events text.
+
+    Args:
+        subscription (Subscription): Subscription to stream
+        heartbeat (float): Seconds of silence before a keep-alive comment
+        on_heartbeat (callable): Optional callback run on every heartbeat
+                                 (e.g. to keep the symbols warm)
+    """
+    while True:
+        event = subscription.next_event(timeout=heartbeat)
+        if event is None:
+            return
+        if not event:
+            if on_heartbeat:
+                on_heartbeat()
+            yield ': keep-alive\n\n'
+            continue
+        name = 'portfolio' if subscription.user_id is not None else 'prices'
+        yield f'event: {name}\ndata: {json.dumps(event)}\n\n'
@@ -0,0 +1,25 @@
+import asyncio
+import time
+import unittest
+import aio
+
+class TestAio(unittest.TestCase):
+    def test_offloaded_calls_overlap(self):
+        """Test blocking calls awaited together run concurrently"""
+        async def both():
+            return await asyncio.gather(
+                aio.to_thread(time.sleep, 0.1),
+                aio.to_thread(time.sleep, 0.1)
+            )
+        start = time.time()
+        aio.run(both())
+        self.assertLess(time.time() - start, 0.18)
+
+    def test_result_and_errors(self):
+        """Test results are returned and exceptions re-raised in the caller"""
+        self.assertEqual(aio.run(aio.to_thread(divmod, 7, 2)), (3, 1))
+        with self.assertRaises(ZeroDivisionError):
+            aio.run(aio.to_thread(divmod, 1, 0))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+import unittest
+import threading
+import time
+from cache import TTLCache, SingleFlight
+
+class TestTTLCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = TTLCache(maxsize=3, ttl=30)
+
+    def test_hit_and_miss(self):
+        """Test hits and misses are counted"""
+        self.assertIsNone(self.cache.get('AAPL'))
+        self.cache.set('AAPL', 190.5)
+        self.assertEqual(self.cache.get('AAPL'), 190.5)
+
+        stats = self.cache.stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+
+    def test_ttl_expiry(self):
+        """Test entries older than the TTL are dropped"""
+        self.cache.set('AAPL', 190.5, timestamp=time.time() - 31)
+        self.assertIsNone(self.cache.get('AAPL'))
+        self.assertNotIn('AAPL', self.cache)
+
+    def test_max_age(self):
+        """Test a stricter per-lookup max age misses without dropping the entry"""
+        self.cache.set('AAPL', 190.5, timestamp=time.time() - 10)
+        self.assertIsNone(self.cache.get('AAPL', max_age=5))
+        self.assertEqual(self.cache.get('AAPL', max_age=20), 190.5)
+
+    def test_lru_eviction(self):
+        """Test the least recently used entry is evicted at maxsize"""
+        for symbol in ['AAPL', 'MSFT', 'GOOGL']:
+            self.cache.set(symbol, 1.0)
+        self.cache.get('AAPL')  # AAPL is now most recently used
+        self.cache.set('AMZN', 1.0)
+
+        self.assertIn('AAPL', self.cache)
+        self.assertNotIn('MSFT', self.cache)
+        self.assertEqual(len(self.cache), 3)
+        self.assertEqual(self.cache.stats()['evictions'], 1)
+
+class TestSingleFlight(unittest.TestCase):
+    def test_concurrent_calls_coalesce(self):
+        """Test concurrent callers for one key share a single call"""
+        flight = SingleFlight()
+        calls = []
+        results = []
+
+        def fetch():
+            calls.append(1)
+            time.sleep(0.05)
+            return 190.5
+
+        threads = [
+            threading.Thread(target=lambda: results.append(flight.do('AAPL', fetch)))
+            for _ in range(10)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [190.5] * 10)
+        self.assertEqual(flight.stats()['coalesced'], 9)
+
+    def test_error_propagates_and_key_is_released(self):
+        """Test a failed call raises and the next call runs again"""
+        flight = SingleFlight()
+
+        def fail():
+            raise ValueError('No price data available for INVALID')
+
+        with self.assertRaises(ValueError):
+            flight.do('INVALID', fail)
+        self.assertEqual(flight.do('INVALID', lambda: 1.0), 1.0)
+
+    def test_overlapping_batches_fetch_each_key_once(self):
+        """Test a batch only fetches keys not already in flight and waits for the rest"""
+        flight = SingleFlight()
+        fetched = []
+        started = threading.Event()
+
+        def fetch(keys):
+            fetched.append(sorted(keys))
+            started.set()
+            time.sleep(0.05)
+            return {key: key.lower() for key in keys if key != 'BAD'}
+
+        results = {}
+        first = threading.Thread(target=lambda: results.update(first=flight.do_many(['AAPL', 'MSFT'], fetch)))
+        first.start()
+        started.wait()
+        single = threading.Thread(target=lambda: results.update(single=flight.do('AAPL', lambda: 'unused')))
+        single.start()
+        second = flight.do_many(['MSFT', 'GOOG', 'BAD'], fetch, missing_error=lambda key: ValueError(key))
+        first.join()
+        single.join()
+
+        self.assertEqual(fetched, [['AAPL', 'MSFT'], ['BAD', 'GOOG']])
+        self.assertEqual(results['first'], ({'AAPL': 'aapl', 'MSFT': 'msft'}, {}))
+        self.assertEqual(results['single'], 'aapl')
+        self.assertEqual(second[0], {'MSFT': 'msft', 'GOOG': 'goog'})
+        self.assertIsInstance(second[1]['BAD'], ValueError)
+        self.assertEqual(flight.stats()['in_flight'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+import json
+import os
+import tempfile
+import mongomock
+
+# Runs offline: market data comes from a replay file and the shared caches
+# use an in-process MongoDB stand-in (nothing connects to DB_URI)
+os.environ.setdefault('DB_URI', 'mongodb://localhost:27017')
+os.environ['DB_BOOTSTRAP'] = 'false'
+
+import database
+from app import init_app
+from providers import ReplayProvider, get_provider, set_provider
+
+class TestHttpCaching(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.TemporaryDirectory()
+        path = os.path.join(cls.tmpdir.name, 'replay.json')
+        with open(path, 'w') as f:
+            json.dump({'info': {'AAPL': {'shortName': 'Apple Inc.', 'bid': 190.0, 'ask': 190.1}}}, f)
+        cls.previous_provider = get_provider()
+        set_provider(ReplayProvider(path))
+        database.set_client(mongomock.MongoClient())
+        cls.client = init_app().test_client()
+
+    @classmethod
+    def tearDownClass(cls):
+        set_provider(cls.previous_provider)
+        database.close_client()
+        cls.tmpdir.cleanup()
+
+    def test_sp500_page_not_modified(self):
+        """Test a repeated page request with its ETag gets 304 and a max-age"""
+        first = self.client.get('/api/sp500-data?page=1')
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('max-age=', first.headers['Cache-Control'])
+
+        second = self.client.get('/api/sp500-data?page=1', headers={'If-None-Match': first.headers['ETag']})
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second.data, b'')
+        self.assertEqual(second.headers['ETag'], first.headers['ETag'])
+
+    def test_stock_data_revalidation(self):
+        """Test stock data carries a cache-derived ETag and answers If-None-Match"""
+        first = self.client.get('/api/stock-data/AAPL')
+        self.assertEqual(first.get_json()['AAPL']['Name'], 'Apple Inc.')
+        self.assertIn('max-age=', first.headers['Cache-Control'])
+
+        second = self.client.get('/api/stock-data/AAPL', headers={'If-None-Match': first.headers['ETag']})
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(self.client.get('/api/stock-data/AAPL', headers={'If-None-Match': '"other"'}).status_code, 200)
+
+    def test_weak_etag_matches(self):
+        """Test an ETag weakened by a compressing proxy still gets 304"""
+        first = self.client.get('/api/stock-data/AAPL')
+        weak = f'W/{first.headers["ETag"]}'
+        self.assertEqual(self.client.get('/api/stock-data/AAPL', headers={'If-None-Match': weak}).status_code, 304)
+        self.assertEqual(self.client.get('/api/sp500-data?page=1', headers={'If-None-Match': 'W/"other"'}).status_code, 200)
+
+if __name__ == '__main__':
+    unittest.main()
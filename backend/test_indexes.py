@@ -0,0 +1,26 @@
+import unittest
+import mongomock
+from indexes import INDEXES, ensure_indexes, find_missing_indexes
+
+class TestIndexes(unittest.TestCase):
+    def setUp(self):
+        self.db = mongomock.MongoClient().db
+
+    def test_ensure_indexes_is_idempotent(self):
+        """Test a bootstrapped database has every index and a second run creates nothing"""
+        report = ensure_indexes(self.db)
+        self.assertEqual(len(report['created']), sum(len(specs) for specs in INDEXES.values()))
+        self.assertEqual(report['missing'], [])
+        self.assertEqual(ensure_indexes(self.db)['created'], [])
+
+    def test_unique_mismatch_is_reported(self):
+        """Test an index on the right keys but without its unique option counts as missing"""
+        self.db.users.create_index([('user_id', 1)], name='user_id')
+        self.assertIn(('users', 'user_id_unique'), find_missing_indexes(self.db))
+
+        report = ensure_indexes(self.db)
+        self.assertEqual([(name, index) for name, index, _ in report['failed']], [('users', 'user_id_unique')])
+        self.assertIn(('users', 'user_id_unique'), report['missing'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import json
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+from flask import Flask
+import metrics
+from providers import ReplayProvider, call_provider, get_provider, set_provider
+
+class TestMetrics(unittest.TestCase):
+    def test_histogram_buckets_are_cumulative(self):
+        """Test histogram samples follow the Prometheus bucket semantics"""
+        histogram = metrics.Histogram('test_seconds', 'Test.', ('op',), buckets=(0.1, 1))
+        histogram.observe(0.05, op='a')
+        histogram.observe(0.1, op='a')
+        histogram.observe(5, op='a')
+        samples = {(name, labels.get('le')): value for name, labels, value in histogram.samples()}
+        self.assertEqual(samples[('test_seconds_bucket', '0.1')], 2)
+        self.assertEqual(samples[('test_seconds_bucket', '1')], 2)
+        self.assertEqual(samples[('test_seconds_bucket', '+Inf')], 3)
+        self.assertEqual(samples[('test_seconds_count', None)], 3)
+        self.assertAlmostEqual(samples[('test_seconds_sum', None)], 5.15)
+
+    def test_render_text_format(self):
+        """Test registered metrics and collectors are rendered with escaped labels"""
+        counter = metrics.counter('test_render_total', 'Rendered.', ('cache', 'result'))
+        counter.inc(cache='a"b', result='hit')
+        metrics.collector(lambda: [('test_render_total', 'counter', 'Rendered.', [({'cache': 'c', 'result': 'miss'}, 4)])])
+        text = metrics.render()
+        self.assertIn('# TYPE test_render_total counter', text)
+        self.assertIn('test_render_total{cache="a\\"b",result="hit"} 1', text)
+        self.assertIn('test_render_total{cache="c",result="miss"} 4', text)
+        self.assertEqual(text.count('# TYPE test_render_total'), 1)
+
+    def test_provider_calls_are_timed(self):
+        """Test provider calls record their latency and errors"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'replay.json')
+            with open(path, 'w') as f:
+                json.dump({'quotes': {'AAPL': 100.0}}, f)
+            previous = get_provider()
+            set_provider(ReplayProvider(path))
+            try:
+                errors = metrics.provider_call_errors.value(provider='replay', method='get_price')
+                self.assertEqual(call_provider('get_price', 'AAPL'), 100.0)
+                with self.assertRaises(ValueError):
+                    call_provider('get_price', 'MSFT')
+            finally:
+                set_provider(previous)
+        self.assertGreaterEqual(metrics.provider_call_duration.count(provider='replay', method='get_price'), 2)
+        self.assertEqual(metrics.provider_call_errors.value(provider='replay', method='get_price'), errors + 1)
+
+    def test_mongo_listener_labels_by_collection(self):
+        """Test the command listener carries the collection from start to completion"""
+        listener = metrics.MongoCommandListener()
+        before = metrics.mongo_command_duration.count(collection='users', command='find')
+        listener.started(SimpleNamespace(connection_id=1, request_id=7, command_name='find', command={'find': 'users'}))
+        listener.succeeded(SimpleNamespace(connection_id=1, request_id=7, command_name='find', duration_micros=1500))
+        listener.started(SimpleNamespace(connection_id=1, request_id=8, command_name='update', command={'update': 'users'}))
+        listener.failed(SimpleNamespace(connection_id=1, request_id=8, command_name='update', duration_micros=900))
+        self.assertEqual(metrics.mongo_command_duration.count(collection='users', command='find'), before + 1)
+        self.assertGreaterEqual(metrics.mongo_command_errors.value(collection='users', command='update'), 1)
+
+    def test_requests_labelled_by_route(self):
+        """Test request latency is recorded per URL rule and exposed on /metrics"""
+        app = metrics.instrument_app(Flask(__name__))
+        app.add_url_rule('/items/<name>', 'item', lambda name: name)
+        client = app.test_client()
+        client.get('/items/a')
+        client.get('/items/b')
+        self.assertEqual(metrics.http_request_duration.count(method='GET', route='/items/<name>', status=200), 2)
+
+        response = client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('text/plain', response.content_type)
+        self.assertIn('http_request_duration_seconds_count{method="GET",route="/items/<name>",status="200"} 2',
+                      response.get_data(as_text=True))
+
+if __name__ == '__main__':
+    unittest.main()
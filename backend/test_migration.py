@@ -0,0 +1,55 @@
+import os
+import unittest
+import mongomock
+
+os.environ.setdefault('DB_URI', 'mongodb://localhost:27017')
+
+import database
+from trading import migrate_portfolios, users_collection
+
+class TestMigratePortfolios(unittest.TestCase):
+    def setUp(self):
+        database.set_client(mongomock.MongoClient())
+        self.addCleanup(database.close_client)
+        users_collection.insert_many([
+            {
+                'user_id': 1,
+                'buying_power': 5000,
+                'total_value': 12000,
+                'daily_returns': {},
+                'portfolio': [
+                    {'symbol': 'AAPL', 'quantity': 2, 'average_price': 100, 'current_price': 150},
+                    {'symbol': 'BRK.B', 'quantity': 1, 'average_price': 400},
+                    {'symbol': 'AAPL', 'quantity': 6, 'average_price': 200}
+                ]
+            },
+            {'user_id': 2, 'buying_power': 10000, 'holdings': {}}
+        ])
+
+    def _user(self, user_id):
+        return users_collection.find_one({'user_id': user_id}, {'_id': 0})
+
+    def test_duplicate_positions_are_merged(self):
+        """Test duplicate symbols become one position with a weighted average price"""
+        self.assertEqual(migrate_portfolios(), 1)
+        user = self._user(1)
+        self.assertEqual(user['holdings']['AAPL'], {'symbol': 'AAPL', 'quantity': 8, 'average_price': 175})
+        self.assertNotIn('portfolio', user)
+        self.assertNotIn('total_value', user)
+        self.assertNotIn('daily_returns', user)
+
+    def test_dotted_symbols_are_escaped(self):
+        """Test BRK.B is keyed as BRK_B and keeps its real symbol"""
+        migrate_portfolios()
+        self.assertEqual(self._user(1)['holdings']['BRK_B'],
+                         {'symbol': 'BRK.B', 'quantity': 1, 'average_price': 400})
+
+    def test_second_run_changes_nothing(self):
+        """Test the migration is idempotent"""
+        migrate_portfolios()
+        migrated = [self._user(1), self._user(2)]
+        self.assertEqual(migrate_portfolios(), 0)
+        self.assertEqual([self._user(1), self._user(2)], migrated)
+
+if __name__ == '__main__':
+    unittest.main()
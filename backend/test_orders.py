@@ -0,0 +1,182 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+import mongomock
+
+# Runs offline: prices come from a replay file and users live in an
+# in-process MongoDB stand-in
+os.environ.setdefault('DB_URI', 'mongodb://localhost:27017')
+
+import database
+import trading
+from providers import ReplayProvider, get_provider, set_provider
+from trading import buy_stock, initialize_user, place_orders, sell_stock, users_collection
+
+QUOTES = {'AAPL': 200.0, 'MSFT': 400.0, 'GOOGL': 150.0}
+
+class OrderTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.TemporaryDirectory()
+        path = os.path.join(cls.tmpdir.name, 'replay.json')
+        with open(path, 'w') as f:
+            json.dump({'quotes': QUOTES}, f)
+        cls.previous_provider = get_provider()
+        set_provider(ReplayProvider(path))
+
+    @classmethod
+    def tearDownClass(cls):
+        set_provider(cls.previous_provider)
+        cls.tmpdir.cleanup()
+
+    def setUp(self):
+        database.set_client(mongomock.MongoClient())
+        self.addCleanup(database.close_client)
+        trading.price_cache.clear()
+        self.addCleanup(trading.price_cache.clear)
+        initialize_user(user_id=1)
+
+    def user(self):
+        return users_collection.find_one({'user_id': 1})
+
+    def hold(self, symbol, quantity, buying_power=10000):
+        users_collection.update_one({'user_id': 1}, {'$set': {
+            'buying_power': buying_power,
+            f'holdings.{trading.holding_key(symbol)}': {'symbol': symbol, 'quantity': quantity, 'average_price': 100.0}
+        }})
+
+class TestBuyAndSell(OrderTestCase):
+    def test_buy_creates_and_extends_position(self):
+        """Test buys open a position, then add to it with a weighted average price"""
+        self.assertEqual(buy_stock(1, 'AAPL', 1000)['transaction']['shares_bought'], 5)
+        self.assertEqual(self.user()['holdings']['AAPL']['average_price'], 200.0)
+        users_collection.update_one({'user_id': 1}, {'$set': {'holdings.AAPL.average_price': 100.0}})
+        self.assertTrue(buy_stock(1, 'AAPL', 1000)['success'])
+
+        user = self.user()
+        self.assertEqual(user['buying_power'], 8000)
+        self.assertEqual(user['holdings']['AAPL']['quantity'], 10)
+        self.assertEqual(user['holdings']['AAPL']['average_price'], 150.0)
+
+    def test_buy_insufficient_buying_power(self):
+        """Test a buy larger than the buying power changes nothing"""
+        result = buy_stock(1, 'AAPL', 15000)
+        self.assertFalse(result['success'])
+        self.assertEqual(result['error'], 'Insufficient buying power')
+        self.assertEqual(self.user()['buying_power'], 10000)
+        self.assertEqual(self.user()['holdings'], {})
+
+    def test_sell_insufficient_shares(self):
+        """Test selling more shares than owned is rejected with the owned quantity"""
+        self.hold('AAPL', 2)
+        self.assertEqual(sell_stock(1, 'AAPL', 3), {'error': 'Insufficient shares. You own 2 shares.'})
+        self.assertEqual(sell_stock(1, 'MSFT', 1), {'error': 'Stock not found in portfolio'})
+        self.assertEqual(self.user()['holdings']['AAPL']['quantity'], 2)
+
+    def test_full_sell_removes_position(self):
+        """Test selling every share removes the position and credits the proceeds"""
+        self.hold('AAPL', 2)
+        self.assertEqual(sell_stock(1, 'AAPL', 2)['value'], 400.0)
+        user = self.user()
+        self.assertNotIn('AAPL', user['holdings'])
+        self.assertEqual(user['buying_power'], 10400)
+
+    def test_sell_leaves_no_dust(self):
+        """Test a sell leaving less than 0.01 shares removes the position"""
+        self.hold('AAPL', 1.004)
+        self.assertTrue(sell_stock(1, 'AAPL', 1)['success'])
+        self.assertNotIn('AAPL', self.user()['holdings'])
+
+    def test_sells_keep_two_decimals(self):
+        """Test repeated sells do not accumulate floating-point drift"""
+        self.hold('GOOGL', 0.3, buying_power=10.1)
+        trading.price_cache.set('GOOGL', 0.7)
+        for _ in range(2):
+            self.assertTrue(sell_stock(1, 'GOOGL', 0.1)['success'])
+
+        user = self.user()
+        self.assertEqual(user['holdings']['GOOGL']['quantity'], 0.1)
+        self.assertEqual(user['buying_power'], 10.24)
+
+    def test_conflicting_order_is_retried(self):
+        """Test an order guarded by stale values is retried against fresh data"""
+        self.hold('AAPL', 5)
+        find_one = users_collection.find_one
+        raced = []
+
+        def racing_find_one(*args, **kwargs):
+            user = find_one(*args, **kwargs)
+            if not raced:
+                # Another order lands between this order's read and its write
+                raced.append(True)
+                users_collection.update_one({'user_id': 1}, {'$inc': {'holdings.AAPL.quantity': 1, 'buying_power': -200}})
+            return user
+
+        with mock.patch.object(users_collection, 'find_one', side_effect=racing_find_one):
+            self.assertTrue(sell_stock(1, 'AAPL', 1)['success'])
+
+        user = self.user()
+        self.assertEqual(user['holdings']['AAPL']['quantity'], 5)
+        self.assertEqual(user['buying_power'], 10000)
+
+class TestPlaceOrders(OrderTestCase):
+    def test_sells_fund_buys(self):
+        """Test a batch may spend the proceeds of its own sells"""
+        self.hold('AAPL', 40, buying_power=1000)
+        result = place_orders(1, [
+            {'side': 'sell', 'symbol': 'AAPL', 'shares': 20},
+            {'side': 'buy', 'symbol': 'MSFT', 'amount': 3000},
+            {'side': 'buy', 'symbol': 'GOOGL', 'amount': 1500}
+        ])
+        self.assertTrue(result['success'], result.get('error'))
+        self.assertEqual(result['cash_change'], -500)
+
+        user = self.user()
+        self.assertEqual(user['buying_power'], 500)
+        self.assertEqual(user['holdings']['AAPL']['quantity'], 20)
+        self.assertEqual(user['holdings']['MSFT']['quantity'], 7.5)
+        self.assertEqual(user['holdings']['GOOGL']['quantity'], 10)
+
+    def test_all_or_nothing(self):
+        """Test a batch with one failing order changes nothing"""
+        result = place_orders(1, [
+            {'side': 'buy', 'symbol': 'AAPL', 'amount': 1000},
+            {'side': 'sell', 'symbol': 'MSFT', 'shares': 1}
+        ])
+        self.assertFalse(result['success'])
+        self.assertIn('not found in portfolio', result['error'])
+
+        user = self.user()
+        self.assertEqual(user['holdings'], {})
+        self.assertEqual(user['buying_power'], 10000)
+
+    def test_net_cash_is_checked(self):
+        """Test buys beyond the buying power plus the batch's sells are rejected as a whole"""
+        self.hold('AAPL', 5, buying_power=100)
+        result = place_orders(1, [
+            {'side': 'sell', 'symbol': 'AAPL', 'shares': 5},
+            {'side': 'buy', 'symbol': 'MSFT', 'amount': 1200}
+        ])
+        self.assertEqual(result, {'success': False, 'error': 'Insufficient buying power'})
+        self.assertEqual(self.user()['holdings']['AAPL']['quantity'], 5)
+        self.assertNotIn('MSFT', self.user()['holdings'])
+
+    def test_batch_route(self):
+        """Test /orders/batch places the orders and rejects bodies that are not an object"""
+        with mock.patch.dict(os.environ, {'DB_BOOTSTRAP': 'false'}):
+            from app import init_app
+            client = init_app().test_client()
+
+        response = client.post('/api/orders/batch', json={'orders': [{'side': 'buy', 'symbol': 'AAPL', 'shares': 2}]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.user()['holdings']['AAPL']['quantity'], 2)
+
+        for body in ([{'side': 'buy', 'symbol': 'AAPL', 'shares': 1}], 'orders', None, {}):
+            response = client.post('/api/orders/batch', json=body)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.get_json()['error'], 'Missing orders')
+
+if __name__ == '__main__':
+    unittest.main()
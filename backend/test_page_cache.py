@@ -0,0 +1,83 @@
+import unittest
+import time
+from unittest import mock
+import mongomock
+from page_cache import LocalPageStore, MongoPageStore
+
+class TestLocalPageStore(unittest.TestCase):
+    def setUp(self):
+        self.store = LocalPageStore(maxsize=2, retention=60)
+
+    def test_set_and_get(self):
+        """Test pages are stored with their timestamp and evicted by LRU"""
+        self.store.set('10:1', {'AAPL': {'Name': 'Apple'}}, 100.0)
+        self.assertIsNone(self.store.get('10:1'))  # Older than the retention period
+
+        now = time.time()
+        for page in range(1, 4):
+            self.store.set(f'10:{page}', {}, now)
+        self.assertIsNone(self.store.get('10:1'))
+        self.assertEqual(self.store.get('10:3')['timestamp'], now)
+
+    def test_single_writer_lock(self):
+        """Test only one refresh holds a page's lock until it is released"""
+        token = self.store.acquire('10:1', 30)
+        self.assertIsNotNone(token)
+        self.assertIsNone(self.store.acquire('10:1', 30))
+        self.assertIsNotNone(self.store.acquire('10:2', 30))
+
+        self.store.release('10:1', 'not-the-owner')
+        self.assertIsNone(self.store.acquire('10:1', 30))
+        self.store.release('10:1', token)
+        self.assertIsNotNone(self.store.acquire('10:1', 30))
+
+    def test_lock_expires(self):
+        """Test a lock left behind by a failed refresh expires"""
+        self.assertIsNotNone(self.store.acquire('10:1', 0.05))
+        time.sleep(0.06)
+        self.assertIsNotNone(self.store.acquire('10:1', 30))
+
+class TestMongoPageStore(unittest.TestCase):
+    def setUp(self):
+        self.store = MongoPageStore(mongomock.MongoClient().db.sp500_pages)
+
+    def test_set_and_get(self):
+        """Test pages round-trip with dotted symbols and their timestamp"""
+        self.assertIsNone(self.store.get('10:1'))
+        now = time.time()
+        data = {'AAPL': {'Name': 'Apple'}, 'BRK.B': {'Name': 'Berkshire Hathaway'}}
+        self.store.set('10:1', data, now)
+        page = self.store.get('10:1')
+        self.assertEqual(page['data'], data)
+        self.assertAlmostEqual(page['timestamp'], now, places=2)
+
+    def test_single_writer_lock(self):
+        """Test only one worker holds a page's lock until it is released"""
+        token = self.store.acquire('10:1', 30)
+        self.assertIsNotNone(token)
+        self.assertIsNone(self.store.acquire('10:1', 30))
+        self.assertIsNotNone(self.store.acquire('10:2', 30))
+
+        self.store.release('10:1', 'not-the-owner')
+        self.assertIsNone(self.store.acquire('10:1', 30))
+        self.store.release('10:1', token)
+        self.assertIsNotNone(self.store.acquire('10:1', 30))
+
+    def test_lock_does_not_hide_page(self):
+        """Test a lock taken before the first write leaves no empty page behind"""
+        token = self.store.acquire('10:1', 30)
+        self.assertIsNone(self.store.get('10:1'))
+        self.store.set('10:1', {'AAPL': {}}, time.time())
+        self.store.release('10:1', token)
+        self.assertEqual(self.store.get('10:1')['data'], {'AAPL': {}})
+
+    def test_lock_expires(self):
+        """Test a lock left behind by a crashed worker expires after its ttl"""
+        self.assertIsNotNone(self.store.acquire('10:1', 30))
+        later = time.time() + 31
+        with mock.patch('page_cache.time.time', return_value=later):
+            self.assertIsNotNone(self.store.acquire('10:1', 30))
+            self.assertIsNone(self.store.acquire('10:1', 30))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+import os
+import unittest
+from datetime import date, datetime
+from unittest import mock
+from zoneinfo import ZoneInfo
+import mongomock
+
+os.environ.setdefault('DB_URI', 'mongodb://localhost:27017')
+
+import database
+import trading
+from trading import current_trading_date, get_previous_closes, market_holidays
+
+NEW_YORK = ZoneInfo('America/New_York')
+
+def eastern(*args):
+    return datetime(*args, tzinfo=NEW_YORK)
+
+class TestCurrentTradingDate(unittest.TestCase):
+    def test_session_opens_at_930_eastern(self):
+        """Test the date rolls over at the open, not at midnight"""
+        self.assertEqual(current_trading_date(eastern(2026, 10, 14, 9, 29)), date(2026, 10, 13))
+        self.assertEqual(current_trading_date(eastern(2026, 10, 14, 9, 30)), date(2026, 10, 14))
+        self.assertEqual(current_trading_date(eastern(2026, 10, 14, 23, 0)), date(2026, 10, 14))
+
+    def test_utc_input_is_converted(self):
+        """Test the open is evaluated in New York time, across daylight saving changes"""
+        # 13:45 UTC is 9:45 EDT but 8:45 EST
+        self.assertEqual(current_trading_date(datetime(2026, 3, 9, 13, 45, tzinfo=ZoneInfo('UTC'))), date(2026, 3, 9))
+        self.assertEqual(current_trading_date(datetime(2026, 3, 6, 13, 45, tzinfo=ZoneInfo('UTC'))), date(2026, 3, 5))
+
+    def test_weekend_rolls_back_to_friday(self):
+        """Test weekends and Monday before the open belong to Friday's session"""
+        self.assertEqual(current_trading_date(eastern(2026, 10, 17, 12, 0)), date(2026, 10, 16))
+        self.assertEqual(current_trading_date(eastern(2026, 10, 18, 12, 0)), date(2026, 10, 16))
+        self.assertEqual(current_trading_date(eastern(2026, 10, 19, 8, 0)), date(2026, 10, 16))
+
+    def test_holidays_roll_back(self):
+        """Test market holidays belong to the previous session"""
+        # Thanksgiving, and the morning after
+        self.assertEqual(current_trading_date(eastern(2026, 11, 26, 12, 0)), date(2026, 11, 25))
+        self.assertEqual(current_trading_date(eastern(2026, 11, 27, 9, 0)), date(2026, 11, 25))
+        # Good Friday, then a weekend
+        self.assertEqual(current_trading_date(eastern(2026, 4, 6, 9, 0)), date(2026, 4, 2))
+        # July 4th on a Saturday is observed on Friday the 3rd
+        self.assertEqual(current_trading_date(eastern(2026, 7, 6, 9, 0)), date(2026, 7, 2))
+
+    def test_market_holidays(self):
+        """Test observed dates, including New Year's Day on a Saturday"""
+        self.assertIn(date(2021, 12, 24), market_holidays(2021))  # Christmas on a Saturday
+        self.assertIn(date(2022, 6, 20), market_holidays(2022))  # Juneteenth on a Sunday
+        self.assertNotIn(date(2021, 12, 31), market_holidays(2021))  # New Year's Day 2022 was a Saturday
+        self.assertEqual(len(market_holidays(2026)), 10)
+
+class TestPreviousCloseStore(unittest.TestCase):
+    def setUp(self):
+        database.set_client(mongomock.MongoClient())
+        self.addCleanup(database.close_client)
+        trading.previous_close_cache.clear()
+        self.addCleanup(trading.previous_close_cache.clear)
+        self.trading_date = date(2026, 10, 16)
+        patcher = mock.patch.object(trading, 'current_trading_date', side_effect=lambda: self.trading_date)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_fetched_once_per_trading_date(self):
+        """Test closes are stored per (symbol, trading date) and shared through MongoDB"""
+        with mock.patch.object(trading, 'call_provider', return_value={'AAPL': 180.0, 'MSFT': 410.0}) as provider:
+            self.assertEqual(get_previous_closes(['AAPL', 'MSFT']), {'AAPL': 180.0, 'MSFT': 410.0})
+            provider.assert_called_once_with('get_previous_closes', ['AAPL', 'MSFT'], self.trading_date)
+
+            # Another process (empty memory tier) reads them from MongoDB
+            trading.previous_close_cache.clear()
+            self.assertEqual(get_previous_closes(['MSFT']), {'MSFT': 410.0})
+            self.assertEqual(provider.call_count, 1)
+
+        doc = trading.previous_closes_collection.find_one({'symbol': 'AAPL'})
+        self.assertEqual((doc['trading_date'], doc['previous_close']), ('2026-10-16', 180.0))
+
+        # The next session needs new closes
+        self.trading_date = date(2026, 10, 19)
+        with mock.patch.object(trading, 'call_provider', return_value={'AAPL': 182.5}) as provider:
+            self.assertEqual(get_previous_closes(['AAPL']), {'AAPL': 182.5})
+            provider.assert_called_once_with('get_previous_closes', ['AAPL'], self.trading_date)
+
+    def test_provider_errors_are_logged(self):
+        """Test a failed fetch leaves the symbols out and is logged"""
+        with mock.patch.object(trading, 'call_provider', side_effect=ValueError('rate limited')), \
+                mock.patch('builtins.print') as log:
+            self.assertEqual(get_previous_closes(['AAPL']), {})
+        log.assert_called_once()
+        self.assertIn('rate limited', log.call_args[0][0])
+
+    def test_daily_refresh_uses_the_store(self):
+        """Test the daily refresh skips closes another worker stored and runs once per date"""
+        trading.previous_closes_collection.insert_one({'symbol': 'AAPL', 'trading_date': '2026-10-16', 'previous_close': 180.0})
+        self.addCleanup(setattr, trading, '_previous_closes_refreshed_for', None)
+        with mock.patch.object(trading, 'list_held_symbols', return_value=['AAPL']), \
+                mock.patch.object(trading, 'call_provider') as provider:
+            trading._refresh_previous_closes_daily()
+        provider.assert_not_called()
+
+        # A failed refresh is not retried on every tick of the same date
+        trading._previous_closes_refreshed_for = None
+        with mock.patch.object(trading, 'list_held_symbols', side_effect=RuntimeError('MongoDB unavailable')) as held:
+            for _ in range(3):
+                try:
+                    trading._refresh_previous_closes_daily()
+                except RuntimeError:
+                    pass
+        self.assertEqual(held.call_count, 1)
+
+if __name__ == '__main__':
+    unittest.main()
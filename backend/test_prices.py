@@ -0,0 +1,76 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+import mongomock
+
+# Runs offline: prices come from a replay file and the shared price cache
+# lives in an in-process MongoDB stand-in
+os.environ.setdefault('DB_URI', 'mongodb://localhost:27017')
+
+import database
+import trading
+from providers import ReplayProvider, get_provider, set_provider
+from trading import get_multiple_stock_prices, stocks_collection
+
+SYMBOLS = ['AAPL', 'MSFT', 'GOOGL', 'AMZN', 'NVDA']
+
+class CountingProvider(ReplayProvider):
+    """Replay provider recording each request it receives."""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.calls = []
+
+    def get_price(self, symbol):
+        self.calls.append(('get_price', [symbol]))
+        return super().get_price(symbol)
+
+    def get_prices(self, symbols):
+        self.calls.append(('get_prices', list(symbols)))
+        return super().get_prices(symbols)
+
+class TestBatchedPrices(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        path = os.path.join(self.tmpdir.name, 'replay.json')
+        with open(path, 'w') as f:
+            json.dump({'quotes': {symbol: 100.0 + i for i, symbol in enumerate(SYMBOLS)}}, f)
+        self.provider = CountingProvider(path)
+        previous = get_provider()
+        set_provider(self.provider)
+        self.addCleanup(set_provider, previous)
+
+        database.set_client(mongomock.MongoClient())
+        self.addCleanup(database.close_client)
+        trading.price_cache.clear()
+        self.addCleanup(trading.price_cache.clear)
+
+    def test_misses_are_fetched_and_stored_in_one_batch(self):
+        """Test N misses cost one provider request and one bulk_write"""
+        with mock.patch.object(stocks_collection, 'bulk_write', wraps=stocks_collection.bulk_write) as bulk_write:
+            quotes = get_multiple_stock_prices(SYMBOLS + ['INVALID'])
+
+        self.assertEqual(self.provider.calls, [('get_prices', SYMBOLS + ['INVALID'])])
+        bulk_write.assert_called_once()
+        self.assertEqual(len(bulk_write.call_args[0][0]), len(SYMBOLS))
+
+        self.assertEqual(quotes['prices'], {symbol: 100.0 + i for i, symbol in enumerate(SYMBOLS)})
+        self.assertEqual(list(quotes['errors']), ['INVALID'])
+        self.assertIn('No price data available for INVALID', quotes['errors']['INVALID'])
+        self.assertEqual(stocks_collection.count_documents({}), len(SYMBOLS))
+
+    def test_cached_prices_skip_the_provider(self):
+        """Test repeated lookups are served from memory, then from MongoDB"""
+        get_multiple_stock_prices(SYMBOLS)
+        self.assertEqual(get_multiple_stock_prices(SYMBOLS)['prices']['NVDA'], 104.0)
+
+        # Another process: empty memory tier, shared MongoDB tier
+        trading.price_cache.clear()
+        self.assertEqual(get_multiple_stock_prices(SYMBOLS[:2] + ['TSLA'])['prices'], {'AAPL': 100.0, 'MSFT': 101.0})
+        self.assertEqual(self.provider.calls, [('get_prices', SYMBOLS), ('get_prices', ['TSLA'])])
+
+if __name__ == '__main__':
+    unittest.main()
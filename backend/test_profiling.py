@@ -0,0 +1,72 @@
+import cProfile
+import json
+import os
+import pstats
+import tempfile
+import unittest
+from unittest import mock
+from flask import Flask
+import profiling
+from providers import ReplayProvider, call_provider, get_provider, set_provider
+
+class TestProfiling(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        path = os.path.join(self.tmp.name, 'replay.json')
+        with open(path, 'w') as f:
+            json.dump({'quotes': {'AAPL': 100.0}}, f)
+        self.previous_provider = get_provider()
+        set_provider(ReplayProvider(path, latency_ms=20))
+
+    def tearDown(self):
+        set_provider(self.previous_provider)
+        self.tmp.cleanup()
+
+    def test_summary_attributes_provider_time(self):
+        """Test time spent in market data calls is reported separately"""
+        profiler = cProfile.Profile()
+        profiler.runcall(call_provider, 'get_price', 'AAPL')
+        summary = profiling.summarize(pstats.Stats(profiler), top=3)
+        self.assertGreaterEqual(summary['provider'], 19)
+        self.assertGreaterEqual(summary['total'], summary['provider'])
+        self.assertEqual(summary['mongo'], 0)
+        self.assertEqual(len(summary['top']), 3)
+        self.assertIn('sleep', summary['top'][0][0])
+
+    def test_header_triggers_profile(self):
+        """Test only requests carrying the token are profiled"""
+        with mock.patch.object(profiling, 'PROFILE_TOKEN', 'secret'), \
+                mock.patch.object(profiling, 'PROFILE_DIR', self.tmp.name):
+            app = profiling.instrument_app(Flask(__name__))
+            app.add_url_rule('/price', 'price', lambda: str(call_provider('get_price', 'AAPL')))
+            client = app.test_client()
+
+            self.assertNotIn('X-Profile-Summary', client.get('/price').headers)
+            self.assertNotIn('X-Profile-Summary', client.get('/price', headers={'X-Profile': 'wrong'}).headers)
+
+            response = client.get('/price', headers={'X-Profile': 'secret'})
+            summary = json.loads(response.headers['X-Profile-Summary'])
+            self.assertGreaterEqual(summary['provider'], 19)
+            self.assertEqual(len([name for name in os.listdir(self.tmp.name) if name.endswith('.prof')]), 1)
+
+            # The profiler is released for the next request
+            self.assertIn('X-Profile-Summary', client.get('/price', headers={'X-Profile': 'secret'}).headers)
+
+    def test_sampled_profiles_are_not_sent(self):
+        """Test sampled requests are profiled to PROFILE_DIR without the summary header"""
+        with mock.patch.object(profiling, 'PROFILE_TOKEN', 'secret'), \
+                mock.patch.object(profiling, 'PROFILE_SAMPLE_RATE', 1), \
+                mock.patch.object(profiling, 'PROFILE_DIR', self.tmp.name):
+            app = profiling.instrument_app(Flask(__name__))
+            app.add_url_rule('/price', 'price', lambda: str(call_provider('get_price', 'AAPL')))
+            self.assertNotIn('X-Profile-Summary', app.test_client().get('/price').headers)
+            self.assertEqual(len([name for name in os.listdir(self.tmp.name) if name.endswith('.prof')]), 1)
+
+    def test_disabled_by_default(self):
+        """Test nothing is installed without a sample rate or token"""
+        with mock.patch.object(profiling, 'PROFILE_TOKEN', None), \
+                mock.patch.object(profiling, 'PROFILE_SAMPLE_RATE', 0):
+            self.assertFalse(profiling.is_enabled())
+
+if __name__ == '__main__':
+    unittest.main()
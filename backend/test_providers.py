@@ -0,0 +1,81 @@
+import unittest
+import json
+import os
+import tempfile
+import time
+from providers import MarketDataProvider, ReplayProvider, get_provider, set_provider
+
+class TestReplayProvider(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Write a small replay file
+        cls.tmpdir = tempfile.TemporaryDirectory()
+        cls.path = os.path.join(cls.tmpdir.name, 'replay.json')
+        with open(cls.path, 'w') as f:
+            json.dump({
+                'quotes': {'AAPL': 190.5},
+                'history': {'AAPL': [185.0, 188.0, 190.5], 'MSFT': [410.0, 415.0]},
+                'info': {'AAPL': {'shortName': 'Apple Inc.', 'marketCap': 3000000000000}}
+            }, f)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmpdir.cleanup()
+
+    def setUp(self):
+        self.provider = ReplayProvider(self.path)
+
+    def test_get_price(self):
+        """Test quotes are replayed, falling back to the last close"""
+        self.assertEqual(self.provider.get_price('AAPL'), 190.5)
+        self.assertEqual(self.provider.get_price('MSFT'), 415.0)
+
+    def test_get_price_unknown_symbol(self):
+        """Test unknown symbols raise ValueError"""
+        with self.assertRaises(ValueError):
+            self.provider.get_price('INVALID')
+
+    def test_get_prices_omits_missing(self):
+        """Test batch pricing skips symbols with no data"""
+        prices = self.provider.get_prices(['AAPL', 'MSFT', 'INVALID'])
+        self.assertEqual(prices, {'AAPL': 190.5, 'MSFT': 415.0})
+
+    def test_get_history_period(self):
+        """Test history is trimmed to the requested number of days"""
+        self.assertEqual(self.provider.get_history('AAPL', period='2d'), [188.0, 190.5])
+        self.assertEqual(self.provider.get_history('AAPL', period='1d'), [190.5])
+
+    def test_get_info(self):
+        """Test company info is replayed"""
+        info = self.provider.get_info('AAPL')
+        self.assertEqual(info['shortName'], 'Apple Inc.')
+        with self.assertRaises(ValueError):
+            self.provider.get_info('MSFT')
+
+    def test_latency(self):
+        """Test configured latency is applied per call"""
+        provider = ReplayProvider(self.path, latency_ms=50)
+        start = time.perf_counter()
+        provider.get_prices(['AAPL', 'MSFT'])
+        self.assertGreaterEqual(time.perf_counter() - start, 0.05)
+
+    def test_set_provider(self):
+        """Test the process-wide provider can be replaced"""
+        set_provider(self.provider)
+        try:
+            self.assertIs(get_provider(), self.provider)
+        finally:
+            set_provider(None)
+
+class TestMarketDataProvider(unittest.TestCase):
+    def test_incomplete_provider_fails_on_creation(self):
+        """Test a provider missing a required method cannot be created"""
+        class PriceOnly(MarketDataProvider):
+            def get_price(self, symbol):
+                return 1.0
+
+        with self.assertRaises(TypeError):
+            PriceOnly()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import time
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+import mongomock
+import database
+from refresher import PriceRefresher
+
+class TestPriceRefresher(unittest.TestCase):
+    def setUp(self):
+        self.ages = {'AAPL': 1, 'MSFT': 28}
+        self.refreshed = []
+        self.refresher = PriceRefresher(
+            refresh=self.refreshed.append,
+            get_age=self.ages.get,
+            list_held=lambda: ['GOOGL'],
+            ttl=30,
+            lead_seconds=5
+        )
+
+    def test_refreshes_expiring_and_missing_symbols(self):
+        """Test only symbols near expiry or not cached are refreshed"""
+        self.refresher.track(['AAPL', 'MSFT'])
+        self.refresher.tick()
+        # MSFT is within 5s of expiry, GOOGL is held but not cached
+        self.assertEqual(self.refreshed, [['GOOGL', 'MSFT']])
+
+    def test_requested_symbols_refresh_immediately(self):
+        """Test symbols served stale are refreshed on the next tick"""
+        self.refresher.request(['AAPL'])
+        self.assertEqual(self.refresher.due_symbols(), ['AAPL'])
+
+    def test_idle_symbols_are_dropped(self):
+        """Test viewed symbols stop being tracked after the idle window"""
+        self.refresher.idle_seconds = 0
+        self.refresher.track(['AAPL'])
+        self.assertNotIn('AAPL', self.refresher.tracked_symbols())
+
+    def test_errors_are_counted(self):
+        """Test a failing refresh does not stop the refresher"""
+        def fail(symbols):
+            raise ValueError('provider unavailable')
+        self.refresher.refresh = fail
+        self.refresher.track(['MSFT'])
+        self.refresher.tick()
+        self.assertEqual(self.refresher.stats()['errors'], 1)
+
+    def test_unpriced_symbols_back_off(self):
+        """Test symbols the provider cannot price are not retried on every tick"""
+        calls = []
+        def refresh(symbols):
+            calls.append(symbols)
+            return {symbol: 1.0 for symbol in symbols if symbol != 'DELISTED'}
+        self.refresher.refresh = refresh
+        self.refresher.list_held = None
+        self.refresher.track(['MSFT', 'DELISTED'])
+        self.refresher.tick()
+        self.refresher.tick()
+        self.assertEqual(calls, [['DELISTED', 'MSFT'], ['MSFT']])
+        self.assertEqual(self.refresher.stats()['backing_off'], 1)
+
+        # The backoff doubles after each failure
+        self.refresher._failures['DELISTED'] = (1, 0)
+        self.refresher.tick()
+        self.assertEqual(self.refresher._failures['DELISTED'][0], 2)
+        self.assertGreater(self.refresher._failures['DELISTED'][1] - time.time(), 50)
+
+    def test_shared_prices_skip_the_provider(self):
+        """Test symbols another process refreshed are loaded instead of fetched"""
+        self.refresher.load_shared = lambda symbols, max_age: ['GOOGL']
+        self.refresher.track(['MSFT'])
+        self.refresher.tick()
+        self.assertEqual(self.refreshed, [['MSFT']])
+        self.assertEqual(self.refresher.stats()['loaded_symbols'], 1)
+
+class TestSharedPriceTier(unittest.TestCase):
+    def setUp(self):
+        database.set_client(mongomock.MongoClient())
+        self.addCleanup(database.close_client)
+        import trading
+        self.trading = trading
+        trading.price_cache.clear()
+        self.addCleanup(trading.price_cache.clear)
+        now = datetime.utcnow()
+        trading.stocks_collection.insert_many([
+            {'symbol': 'AAPL', 'price': 150.0, 'timestamp': now - timedelta(seconds=10)},
+            {'symbol': 'MSFT', 'price': 300.0, 'timestamp': now - timedelta(seconds=60)},
+            {'symbol': 'IBM', 'price': 120.0, 'timestamp': now - timedelta(seconds=trading.price_cache.stale_ttl + 60)}
+        ])
+
+    def test_load_shared_prices(self):
+        """Test only prices within max_age are copied into the memory tier"""
+        loaded = self.trading._load_shared_prices(['AAPL', 'MSFT', 'IBM'], 25)
+        self.assertEqual(loaded, ['AAPL'])
+        self.assertEqual(self.trading.price_cache.get('AAPL'), 150.0)
+        self.assertIsNone(self.trading.price_cache.get('MSFT'))
+
+    def test_stale_serving_is_capped(self):
+        """Test prices older than the stale TTL are refetched, not served stale"""
+        with mock.patch.object(self.trading.price_refresher, 'is_running', return_value=True), \
+                mock.patch.object(self.trading.price_refresher, 'request'), \
+                mock.patch.object(self.trading, '_fetch_prices', return_value={'IBM': 125.0}) as fetch:
+            quotes = self.trading.get_multiple_stock_prices(['MSFT', 'IBM'], allow_stale=True)
+        fetch.assert_called_once_with(['IBM'])
+        self.assertEqual(quotes['prices'], {'MSFT': 300.0, 'IBM': 125.0})
+        self.assertEqual(quotes['stale'], ['MSFT'])
+
+if __name__ == '__main__':
+    unittest.main()
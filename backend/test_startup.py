@@ -0,0 +1,25 @@
+import os
+import subprocess
+import sys
+import unittest
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+class TestStartup(unittest.TestCase):
+    def test_routes_import_without_heavy_dependencies(self):
+        """Test importing the app and routes loads no heavy libraries or database connection"""
+        code = (
+            "import sys, app, controllers.route, trading, database; "
+            "print(','.join(m for m in ('yfinance', 'pandas', 'bs4', 'requests') if m in sys.modules)); "
+            "print(database._client is None)"
+        )
+        env = dict(os.environ, DB_URI=os.getenv('DB_URI', 'mongodb://localhost:27017'))
+        output = subprocess.run(
+            [sys.executable, '-c', code], cwd=BACKEND_DIR, env=env,
+            capture_output=True, text=True, check=True
+        ).stdout.splitlines()
+        self.assertEqual(output[0], '')
+        self.assertEqual(output[1], 'True')
+
+if __name__ == '__main__':
+    unittest.main()
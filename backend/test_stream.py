@@ -0,0 +1,56 @@
+import threading
+import unittest
+from stream import PriceStream, sse_events
+
+class TestPriceStream(unittest.TestCase):
+    def setUp(self):
+        self.stream = PriceStream()
+
+    def test_snapshot_then_deltas(self):
+        """Test the first event is a snapshot and later events carry only changes"""
+        sub = self.stream.subscribe(['AAPL', 'MSFT'], prices={'AAPL': 200, 'MSFT': 400})
+        self.assertEqual(sub.next_event(0), {'prices': {'AAPL': 200, 'MSFT': 400}, 'snapshot': True})
+
+        self.stream.publish({'AAPL': 201, 'MSFT': 400, 'GOOGL': 150})
+        self.assertEqual(sub.next_event(0), {'prices': {'AAPL': 201}})
+        self.assertEqual(sub.next_event(0), {})
+
+    def test_slow_subscriber_gets_merged_delta(self):
+        """Test updates published between reads are coalesced"""
+        sub = self.stream.subscribe(['AAPL'])
+        sub.next_event(0)
+        for price in (201, 202, 203):
+            self.stream.publish({'AAPL': price})
+        self.assertEqual(sub.next_event(0), {'prices': {'AAPL': 203}})
+
+    def test_portfolio_values(self):
+        """Test portfolio subscriptions receive holding values and the total"""
+        sub = self.stream.subscribe(user_id=1, holdings={'AAPL': 2, 'MSFT': 1}, buying_power=100,
+                                    prices={'AAPL': 200})
+        event = sub.next_event(0)
+        self.assertNotIn('total_value', event)  # MSFT not priced yet
+
+        self.stream.publish({'MSFT': 400})
+        event = sub.next_event(0)
+        self.assertEqual(event['holdings'], {'MSFT': {'quantity': 1, 'current_price': 400, 'current_value': 400}})
+        self.assertEqual(event['total_value'], 100 + 400 + 400)
+
+        self.stream.update_portfolio(1, {'AAPL': 1}, 500)
+        event = sub.next_event(0)
+        self.assertTrue(event['snapshot'])
+        self.assertEqual(event['total_value'], 700)
+
+    def test_sse_format_and_close(self):
+        """Test events are framed as SSE and the generator ends on unsubscribe"""
+        sub = self.stream.subscribe(['AAPL'], prices={'AAPL': 200})
+        events = sse_events(sub, heartbeat=0.01)
+        self.assertTrue(next(events).startswith('event: prices\ndata: {'))
+        self.assertEqual(next(events), ': keep-alive\n\n')
+
+        threading.Timer(0.05, self.stream.unsubscribe, [sub]).start()
+        remaining = list(events)  # Returns once the subscription is closed
+        self.assertTrue(all(chunk == ': keep-alive\n\n' for chunk in remaining))
+        self.assertEqual(self.stream.stats()['subscribers'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
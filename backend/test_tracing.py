@@ -0,0 +1,112 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from unittest import mock
+from flask import Flask
+import aio
+import tracing
+from providers import ReplayProvider, call_provider, get_provider, set_provider
+
+@tracing.traced()
+def outer():
+    inner()
+    with tracing.span('block', 'detail'):
+        pass
+
+@tracing.traced()
+def inner():
+    pass
+
+def names(node):
+    return [node['name'], [names(child) for child in node.get('children', [])]]
+
+class TestTracing(unittest.TestCase):
+    def start(self, name='view', max_spans=tracing.TRACE_MAX_SPANS):
+        trace = tracing.Trace(name, max_spans=max_spans)
+        token = tracing._current_span.set(trace.root)
+        self.addCleanup(tracing._current_span.reset, token)
+        return trace
+
+    def test_span_tree(self):
+        """Test nested calls build a tree under the current span"""
+        trace = self.start()
+        outer()
+        trace.root.finish()
+        tree = trace.root.to_dict()
+        self.assertEqual(names(tree), ['view', [['outer', [['inner', []], ['block', []]]]]])
+        self.assertEqual(tree['children'][0]['children'][1]['detail'], 'detail')
+
+    def test_no_trace_is_a_noop(self):
+        """Test spans are not recorded outside a request"""
+        with tracing.span('orphan') as span:
+            self.assertIsNone(span)
+        outer()
+
+    def test_span_limit(self):
+        """Test spans beyond the limit are counted but not kept"""
+        trace = self.start(max_spans=3)
+        for _ in range(4):
+            inner()
+        self.assertEqual(len(trace.root.children), 2)
+        self.assertEqual(trace.dropped, 2)
+        self.assertIn('more;desc="2 more spans"', tracing.server_timing(trace))
+
+    def test_spans_follow_offloaded_work(self):
+        """Test aio.to_thread and bind() keep the request trace on other threads"""
+        trace = self.start()
+
+        async def view():
+            await asyncio.gather(aio.to_thread(inner), aio.to_thread(inner))
+        aio.run(view())
+        with ThreadPoolExecutor(2) as pool:
+            list(pool.map(tracing.bind(lambda _: inner()), range(2)))
+        self.assertEqual([child.name for child in trace.root.children], ['inner'] * 4)
+
+    def test_mongo_commands_become_spans(self):
+        """Test the command listener adds one span per MongoDB command"""
+        trace = self.start()
+        listener = tracing.MongoSpanListener()
+        listener.started(SimpleNamespace(connection_id=1, request_id=3, command_name='find', command={'find': 'users'}))
+        listener.succeeded(SimpleNamespace(connection_id=1, request_id=3, command_name='find', duration_micros=100))
+        [span] = trace.root.children
+        self.assertEqual((span.name, span.detail), ('mongo.find', 'users'))
+        self.assertIsNotNone(span.end)
+
+    def test_server_timing_and_log_line(self):
+        """Test requests with the trace token get a Server-Timing header, and a JSON trace"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'replay.json')
+            with open(path, 'w') as f:
+                json.dump({'quotes': {'AAPL': 100.0}}, f)
+            previous = get_provider()
+            set_provider(ReplayProvider(path))
+            try:
+                app = tracing.instrument_app(Flask(__name__))
+                app.add_url_rule('/price', 'price', lambda: str(call_provider('get_price', 'AAPL')))
+                with mock.patch.object(tracing, 'TRACE_TOKEN', 'secret'):
+                    response = app.test_client().get('/price', headers={'X-Trace': 'secret'})
+                    untraced = app.test_client().get('/price', headers={'X-Trace': 'guess'})
+            finally:
+                set_provider(previous)
+
+        self.assertNotIn('Server-Timing', untraced.headers)
+        self.assertNotIn('Timing-Allow-Origin', untraced.headers)
+
+        header = response.headers['Server-Timing']
+        self.assertTrue(header.startswith('total;dur='))
+        self.assertIn('provider.get_price;dur=', header)
+        self.assertIn('desc="provider.get_price replay AAPL"', header)
+        self.assertIsNone(tracing.current_span())
+
+        trace = tracing.Trace('price')
+        trace.root.finish()
+        record = json.loads(tracing.log_record(trace, status=200))
+        self.assertEqual(record['event'], 'request_trace')
+        self.assertEqual(record['spans']['name'], 'price')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -37,7 +37,7 @@ class TestTrading(unittest.TestCase):
         user = self.users_collection.find_one({'user_id': 1})
         self.assertIsNotNone(user)
         self.assertEqual(user['buying_power'], 10000)
-        self.assertEqual(len(user['portfolio']), 0)
+        self.assertEqual(len(user['holdings']), 0)
     
     def test_buy_stock_success(self):
         """Test buying stocks successfully with dollar amount"""
@@ -46,7 +46,7 @@ class TestTrading(unittest.TestCase):
         self.assertIn('shares_bought', result)
         
         user = self.users_collection.find_one({'user_id': 1})
-        self.assertEqual(len(user['portfolio']), 1)
+        self.assertEqual(len(user['holdings']), 1)
         self.assertAlmostEqual(user['buying_power'], 9000, delta=5)  # Allow $5 variance
     
     def test_buy_stock_insufficient_funds(self):
@@ -73,8 +73,8 @@ class TestTrading(unittest.TestCase):
         self.assertTrue(sell_result['success'])
         
         user = self.users_collection.find_one({'user_id': 1})
-        self.assertEqual(len(user['portfolio']), 1)
-        self.assertAlmostEqual(user['portfolio'][0]['quantity'], initial_shares / 2, places=2)
+        self.assertEqual(len(user['holdings']), 1)
+        self.assertAlmostEqual(user['holdings']['AAPL']['quantity'], initial_shares / 2, places=2)
     
     def test_sell_stock_insufficient_shares(self):
         """Test selling more shares than owned"""
@@ -110,8 +110,8 @@ class TestTrading(unittest.TestCase):
         second_shares = second_buy['shares_bought']
         
         user = self.users_collection.find_one({'user_id': 1})
-        self.assertEqual(len(user['portfolio']), 1)
-        self.assertAlmostEqual(user['portfolio'][0]['quantity'], first_shares + second_shares, places=2)
+        self.assertEqual(len(user['holdings']), 1)
+        self.assertAlmostEqual(user['holdings']['AAPL']['quantity'], first_shares + second_shares, places=2)
         self.assertAlmostEqual(user['buying_power'], 9000, delta=5)  # Allow $5 variance
     
     def test_get_stock_price_success(self):
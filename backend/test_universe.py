@@ -0,0 +1,73 @@
+import unittest
+from unittest import mock
+import mongomock
+import database
+import universe
+from universe import TickerUniverse
+
+class TestTickerUniverse(unittest.TestCase):
+    def setUp(self):
+        self.universe = TickerUniverse([
+            ('AAPL', 'Apple Inc.'),
+            ('AMAT', 'Applied Materials'),
+            ('A', 'Agilent Technologies'),
+            ('MSFT', 'Microsoft'),
+            ('MMM', None)
+        ])
+
+    def test_symbol_prefix(self):
+        """Test symbol prefix matches, exact match first"""
+        results = self.universe.search('a', limit=3)
+        self.assertEqual([r['symbol'] for r in results], ['A', 'AAPL', 'AMAT'])
+
+    def test_name_prefix(self):
+        """Test company-name word prefixes match"""
+        symbols = [r['symbol'] for r in self.universe.search('mat')]
+        self.assertEqual(symbols, ['AMAT'])
+        symbols = [r['symbol'] for r in self.universe.search('appl')]
+        self.assertEqual(symbols, ['AAPL', 'AMAT'])
+
+    def test_add_name(self):
+        """Test names learned later become searchable"""
+        self.assertEqual(self.universe.search('3m'), [])
+        self.universe.add_name('MMM', '3M Company')
+        self.assertEqual(self.universe.search('3m'), [{'symbol': 'MMM', 'name': '3M Company'}])
+
+    def test_add_name_replaces_previous_name(self):
+        """Test words of a replaced name no longer match"""
+        self.universe.add_name('AAPL', 'Banana Corp')
+        self.assertEqual(self.universe.search('apple'), [])
+        self.assertEqual(self.universe.search('banana'), [{'symbol': 'AAPL', 'name': 'Banana Corp'}])
+        self.assertEqual([r['symbol'] for r in self.universe.search('appl')], ['AMAT'])
+
+    def test_pagination(self):
+        """Test pages follow file order"""
+        self.assertEqual(self.universe.page(1, 2), ['AAPL', 'AMAT'])
+        self.assertEqual(self.universe.page(3, 2), ['MMM'])
+        self.assertEqual(self.universe.total_pages(2), 3)
+
+    def test_empty_query(self):
+        """Test an empty query returns nothing"""
+        self.assertEqual(self.universe.search('  '), [])
+
+class TestCachedNames(unittest.TestCase):
+    def setUp(self):
+        database.set_client(mongomock.MongoClient())
+        self.addCleanup(database.close_client)
+
+    def test_names_seeded_from_company_info(self):
+        """Test names stored in the company info cache become searchable at startup"""
+        from info_cache import info_collection, load_cached_names
+        info_collection.insert_many([
+            {'symbol': 'AAPL', 'static': {'Name': 'Apple Inc.'}},
+            {'symbol': 'MSFT', 'static': {'Name': None}},
+            {'symbol': 'NFLX', 'static': {'Name': 'Netflix'}}  # Not in the universe
+        ])
+        tickers = TickerUniverse([('AAPL', None), ('MSFT', None)])
+        with mock.patch.object(universe, '_universe', tickers):
+            self.assertEqual(load_cached_names(), 2)
+        self.assertEqual(tickers.search('apple'), [{'symbol': 'AAPL', 'name': 'Apple Inc.'}])
+        self.assertEqual(tickers.search('netflix'), [])
+
+if __name__ == '__main__':
+    unittest.main()
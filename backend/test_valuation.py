@@ -0,0 +1,61 @@
+import unittest
+from valuation import value_portfolio
+
+class TestValuation(unittest.TestCase):
+    def setUp(self):
+        self.user = {
+            'buying_power': 8000,
+            'holdings': {
+                'AAPL': {'symbol': 'AAPL', 'quantity': 5, 'average_price': 200},
+                'MSFT': {'symbol': 'MSFT', 'quantity': 2, 'average_price': 500}
+            }
+        }
+
+    def test_empty_portfolio(self):
+        """Test valuation of a cash-only portfolio"""
+        result = value_portfolio({'buying_power': 10000, 'holdings': {}}, {}, {})
+        self.assertEqual(result['total_value'], 10000)
+        self.assertEqual(result['daily_returns']['daily_return'], 0)
+        self.assertEqual(result['daily_returns']['portfolio_value_yesterday'], 10000)
+        self.assertEqual(result['all_time_returns']['total_return'], 0)
+        self.assertEqual(result['all_time_returns']['initial_investment'], 10000)
+
+    def test_values_and_returns(self):
+        """Test current value, daily and all-time returns in one pass"""
+        result = value_portfolio(
+            self.user,
+            prices={'AAPL': 210, 'MSFT': 450},
+            previous_closes={'AAPL': 200, 'MSFT': 500}
+        )
+        self.assertEqual(result['total_value'], 8000 + 1050 + 900)
+        self.assertEqual(result['portfolio'][0]['current_value'], 1050)
+
+        daily = result['daily_returns']
+        self.assertEqual(daily['daily_return'], 50 - 100)
+        self.assertEqual(daily['stock_returns'][0]['yesterday_price'], 200)
+        self.assertEqual(daily['stock_returns'][0]['today_price'], 210)
+
+        all_time = result['all_time_returns']
+        self.assertEqual(all_time['stock_performance'][0]['total_return'], 50)
+        self.assertEqual(all_time['stock_performance'][1]['return_percentage'], -10)
+
+    def test_missing_price(self):
+        """Test holdings without a price are reported as errors"""
+        result = value_portfolio(
+            self.user,
+            prices={'AAPL': 210},
+            previous_closes={'AAPL': 200},
+            price_errors={'MSFT': 'Error fetching price for MSFT'}
+        )
+        self.assertIsNone(result['portfolio'][1]['current_value'])
+        self.assertEqual(result['daily_returns']['stock_returns'][1]['error'], 'Error fetching price for MSFT')
+        self.assertEqual(result['all_time_returns']['stock_performance'][1]['error'], 'Error fetching price for MSFT')
+        self.assertEqual(result['total_value'], 8000 + 1050)
+
+    def test_does_not_mutate_user(self):
+        """Test the user document is left untouched"""
+        value_portfolio(self.user, {'AAPL': 210, 'MSFT': 450}, {})
+        self.assertNotIn('current_price', self.user['holdings']['AAPL'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,284 @@
+import contextvars
+import functools
+import inspect
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from pymongo import monitoring
+
+# Request tracing
+# Each request builds a tree of timed spans: the view at the root, then the
+# trading functions it calls (get_portfolio, get_stock_price, the
+# calculate_* functions, ...), and every MongoDB command and market data
+# call as leaves. Requests slower than TRACE_LOG_THRESHOLD_MS are logged as
+# one JSON line with each span's start offset (a waterfall). A request that
+# sends X-Trace: <TRACE_TOKEN> also gets the tree back in a Server-Timing
+# header (shown by browser devtools); timings are not exposed to anyone else.
+#
+# The current span lives in a context variable, so it follows the request
+# through asyncio tasks and aio.to_thread; other thread pools join the
+# trace through bind(). Outside a request the span helpers do nothing.
+
+TRACING_ENABLED = os.getenv('TRACING_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+TRACE_LOG_THRESHOLD_MS = float(os.getenv('TRACE_LOG_THRESHOLD_MS', '500'))
+TRACE_MAX_SPANS = int(os.getenv('TRACE_MAX_SPANS', '200'))  # Per request; further spans are counted, not kept
+TRACE_TOKEN = os.getenv('TRACE_TOKEN')
+SERVER_TIMING_MAX_SPANS = 30  # Keeps the header well under common proxy limits
+
+_current_span = contextvars.ContextVar('current_span', default=None)
+
+
+class Span:
+    """One timed operation in a request's trace."""
+
+    __slots__ = ('name', 'detail', 'trace', 'start', 'end', 'children')
+
+    def __init__(self, name, trace, detail=None):
+        self.name = name
+        self.detail = detail
+        self.trace = trace
+        self.start = time.perf_counter()
+        self.end = None
+        self.children = []
+
+    def finish(self):
+        self.end = time.perf_counter()
+
+    @property
+    def duration_ms(self):
+        end = self.end if self.end is not None else time.perf_counter()
+        return (end - self.start) * 1000
+
+    def walk(self, depth=0):
+        """Yield (depth, span) for this span and its descendants, depth first."""
+        yield depth, self
+        for child in list(self.children):
+            yield from child.walk(depth + 1)
+
+    def to_dict(self, origin=None):
+        """Serialize the subtree with start offsets (ms) relative to origin (default: this span)."""
+        origin = self.start if origin is None else origin
+        node = {
+            'name': self.name,
+            'start_ms': round((self.start - origin) * 1000, 3),
+            'duration_ms': round(self.duration_ms, 3),
+        }
+        if self.detail is not None:
+            node['detail'] = self.detail
+        if self.children:
+            node['children'] = [child.to_dict(origin) for child in list(self.children)]
+        return node
+
+
+class Trace:
+    """The spans of one request, rooted at the view."""
+
+    def __init__(self, name, max_spans=TRACE_MAX_SPANS):
+        self.root = Span(name, self)
+        self.max_spans = max_spans
+        self.spans = 1
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def child(self, parent, name, detail=None):
+        """Start a span under parent; returns None once the trace is full."""
+        with self._lock:
+            if self.spans >= self.max_spans:
+                self.dropped += 1
+                return None
+            self.spans += 1
+        span = Span(name, self, detail)
+        parent.children.append(span)
+        return span
+
+
+def current_span():
+    return _current_span.get()
+
+
+@contextmanager
+def span(name, detail=None):
+    """Time the with block as a child of the current span (no-op outside a trace)."""
+    parent = _current_span.get()
+    child = parent.trace.child(parent, name, detail) if parent is not None else None
+    if child is None:
+        yield None
+        return
+    token = _current_span.set(child)
+    try:
+        yield child
+    finally:
+        child.finish()
+        _current_span.reset(token)
+
+
+def traced(name=None):
+    """
+    Decorator recording each call of a function (sync or async) as a span.
+
+    With TRACING_ENABLED=false the function is returned unchanged.
+    """
+    def decorate(fn):
+        if not TRACING_ENABLED:
+            return fn
+        span_name = name or fn.__name__
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(span_name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _current_span.get() is None:
+                return fn(*args, **kwargs)
+            with span(span_name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def bind(fn):
+    """Wrap fn so that calls on other threads (e.g. an executor) record spans into the current trace."""
+    context = contextvars.copy_context()
+    # A context can only be entered by one thread at a time, so each call runs in a copy
+    return lambda *args, **kwargs: context.copy().run(fn, *args, **kwargs)
+
+
+# Output
+
+def should_expose(header_value):
+    """Decide whether a request gets its Server-Timing header, given its X-Trace header (or None)."""
+    return bool(TRACE_TOKEN) and header_value == TRACE_TOKEN
+
+
+def _token(name):
+    return re.sub(r"[^A-Za-z0-9!#$%&'*+.^_`|~-]", '_', name)
+
+
+def server_timing(trace, max_spans=SERVER_TIMING_MAX_SPANS):
+    """
+    Format a trace as a Server-Timing header value.
+
+    The root comes first as 'total', then the spans depth first. Beyond
+    max_spans the remaining spans are summarized in one 'more' entry.
+    """
+    entries = []
+    remaining = 0
+    for depth, item in trace.root.walk():
+        if depth == 0:
+            entries.append(f'total;dur={item.duration_ms:.1f};desc="{_quote(item.name)}"')
+        elif len(entries) <= max_spans:
+            desc = item.name if item.detail is None else f'{item.name} {item.detail}'
+            entries.append(f'{_token(item.name)};dur={item.duration_ms:.1f};desc="{_quote(desc)}"')
+        else:
+            remaining += 1
+    remaining += trace.dropped
+    if remaining:
+        entries.append(f'more;desc="{remaining} more spans"')
+    return ', '.join(entries)
+
+
+def _quote(text):
+    return str(text).replace('\\', '\\\\').replace('"', '\\"')
+
+
+def log_record(trace, **fields):
+    """One structured log line for a finished request trace."""
+    return json.dumps({
+        'event': 'request_trace',
+        **fields,
+        'duration_ms': round(trace.root.duration_ms, 3),
+        'dropped_spans': trace.dropped,
+        'spans': trace.root.to_dict(),
+    }, separators=(',', ':'), default=str)
+
+
+# Flask
+
+def instrument_app(app):
+    """Trace every request of app, log slow ones and answer X-Trace requests with Server-Timing."""
+    from flask import g, request
+
+    @app.before_request
+    def _start_trace():
+        trace = Trace(request.endpoint or 'request')
+        g.trace = trace
+        g.trace_token = _current_span.set(trace.root)
+
+    @app.after_request
+    def _finish_trace(response):
+        trace = g.get('trace')
+        if trace is None:
+            return response
+        trace.root.finish()
+        if should_expose(request.headers.get('X-Trace')):
+            response.headers['Server-Timing'] = server_timing(trace)
+            response.headers['Timing-Allow-Origin'] = '*'  # Let the (cross-origin) frontend read it
+        if trace.root.duration_ms >= TRACE_LOG_THRESHOLD_MS:
+            print(log_record(
+                trace,
+                method=request.method,
+                path=request.path,
+                route=request.url_rule.rule if request.url_rule else None,
+                status=response.status_code
+            ))
+        return response
+
+    @app.teardown_request
+    def _end_trace(error=None):
+        token = g.pop('trace_token', None)
+        g.pop('trace', None)
+        if token is not None:
+            _current_span.reset(token)
+
+    return app
+
+
+# MongoDB
+
+class MongoSpanListener(monitoring.CommandListener):
+    """
+    pymongo command listener adding a span per command to the current trace.
+
+    pymongo publishes command events on the thread running the command, so
+    the span is attached to whatever span is current there.
+    """
+
+    def __init__(self):
+        self._spans = {}  # (connection id, request id) -> span
+
+    def started(self, event):
+        parent = _current_span.get()
+        if parent is None:
+            return
+        target = event.command.get('collection' if event.command_name == 'getMore' else event.command_name)
+        child = parent.trace.child(
+            parent, f'mongo.{event.command_name}', target if isinstance(target, str) else None
+        )
+        if child is not None:
+            self._spans[(event.connection_id, event.request_id)] = child
+
+    def _finish(self, event):
+        child = self._spans.pop((event.connection_id, event.request_id), None)
+        if child is not None:
+            child.finish()
+        return child
+
+    def succeeded(self, event):
+        self._finish(event)
+
+    def failed(self, event):
+        child = self._finish(event)
+        if child is not None:
+            child.detail = f'{child.detail or ""} failed'.strip()
+
+
+def event_listeners():
+    """Listeners to pass to MongoClient (none when tracing is disabled)."""
+    return [MongoSpanListener()] if TRACING_ENABLED else []
@@ -1,20 +1,161 @@
-import yfinance as yf
-from pymongo import MongoClient
+from pymongo import UpdateOne
 import os
 from dotenv import load_dotenv
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta, timezone, time as dt_time
+from zoneinfo import ZoneInfo
+from functools import lru_cache
+from providers import call_provider
+from cache import TTLCache, SingleFlight
+from valuation import value_portfolio
+from refresher import PriceRefresher
+from stream import PriceStream
+from database import LazyCollection
+import asyncio
+import aio
+import metrics
+import tracing
 
 # Load environment variables from .env file
 # This allows us to keep sensitive information like database credentials secure
 load_dotenv()
 
-# Initialize MongoDB connection
-# We use MongoDB to store user portfolios and transaction history
-client = MongoClient(os.getenv('DB_URI'))  # Get MongoDB connection string from environment variables
-print(client)
-db = client['stock_trading']  # Select the stock_trading database
-users_collection = db['users']  # Collection for user data (portfolios, balances)
-stocks_collection = db['stocks']  # Collection for stock-related data (price cache)
+# MongoDB collections
+# We use MongoDB to store user portfolios and transaction history. The shared
+# client (see database.py) connects lazily on first use, once per process
+users_collection = LazyCollection('users')  # Collection for user data (holdings, balances)
+stocks_collection = LazyCollection('stocks')  # Collection for stock-related data (price cache)
+previous_closes_collection = LazyCollection('previous_closes')  # Previous close per symbol and trading date
+
+# In-process price cache (first tier) in front of stocks_collection (shared second tier)
+# Hot symbols are served from memory with no I/O at all
+price_cache = TTLCache(
+    maxsize=int(os.getenv('PRICE_CACHE_SIZE', '1024')),
+    ttl=float(os.getenv('PRICE_CACHE_TTL', '30')),
+    stale_ttl=float(os.getenv('PRICE_CACHE_STALE_TTL', '300'))
+)
+
+# Concurrent cache misses for the same symbol share one provider fetch
+price_flight = SingleFlight()
+
+# Previous closes cannot change during a trading day, so they are cached per
+# (symbol, trading date) in memory and in previous_closes_collection
+previous_close_cache = TTLCache(
+    maxsize=int(os.getenv('PRICE_CACHE_SIZE', '1024')),
+    ttl=24 * 60 * 60
+)
+previous_close_flight = SingleFlight()
+
+# Background stale-while-revalidate refresher (started by start_price_refresher
+# when PRICE_REFRESHER_ENABLED is set)
+# Keeps held and recently viewed symbols warm; while it runs, read paths serve
+# expired prices marked stale instead of blocking on the provider
+PRICE_REFRESHER_ENABLED = os.getenv('PRICE_REFRESHER_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+price_refresher = PriceRefresher(
+    refresh=lambda symbols: _fetch_prices(symbols),
+    get_age=price_cache.age,
+    load_shared=lambda symbols, max_age: _load_shared_prices(symbols, max_age),
+    list_held=lambda: list_held_symbols(),
+    on_tick=lambda: _refresh_previous_closes_daily(),
+    ttl=price_cache.ttl,
+    lead_seconds=float(os.getenv('PRICE_REFRESH_LEAD_SECONDS', '5')),
+    interval=float(os.getenv('PRICE_REFRESH_INTERVAL', '1'))
+)
+
+# Live price stream (see stream.py): every cache refresh is fanned out to
+# the subscribers watching those symbols
+price_stream = PriceStream()
+
+@metrics.collector
+def _collect_metrics():
+    """Report the in-memory cache tiers, fetch coalescing and stream state at scrape time."""
+    lookups = (
+        metrics.cache_stats_samples('price_memory', price_cache.stats())
+        + metrics.cache_stats_samples('previous_close_memory', previous_close_cache.stats())
+    )
+    return [
+        ('cache_lookups_total', 'counter', metrics.cache_lookups.documentation, lookups),
+        ('price_fetches_coalesced_total', 'counter', 'Price lookups that waited for a fetch already in flight.',
+         [({}, price_flight.stats()['coalesced'])]),
+        ('price_refresher_errors_total', 'counter', 'Failed background price refreshes.',
+         [({}, price_refresher.stats()['errors'])]),
+        ('price_stream_subscribers', 'gauge', 'Open live price and portfolio streams.',
+         [({}, price_stream.stats()['subscribers'])]),
+    ]
+
+# US equity market session
+MARKET_TIMEZONE = ZoneInfo('America/New_York')
+MARKET_OPEN = dt_time(9, 30)
+
+def _to_epoch(timestamp):
+    """Convert a naive UTC datetime (as stored in MongoDB) to epoch seconds."""
+    return timestamp.replace(tzinfo=timezone.utc).timestamp()
+
+def holding_key(symbol):
+    """
+    Field name of a symbol's position in the user's holdings map.
+
+    MongoDB field names cannot contain '.', so 'BRK.B' is stored as 'BRK_B'.
+    The position itself keeps the real symbol.
+    """
+    return symbol.replace('.', '_').replace('$', '_')
+
+def list_held_symbols():
+    """Return every symbol held by any user."""
+    return [doc['_id'] for doc in users_collection.aggregate([
+        {'$project': {'holding': {'$objectToArray': '$holdings'}}},
+        {'$unwind': '$holding'},
+        {'$group': {'_id': '$holding.v.symbol'}}
+    ])]
+
+def migrate_portfolios():
+    """
+    Convert users stored with a 'portfolio' array to the 'holdings' map.
+
+    Holdings are stored keyed by symbol (see holding_key) so positions are
+    read and updated by field path instead of scanning an array. Duplicate
+    positions for a symbol are merged. Derived fields that older versions
+    persisted on the user document (prices, values, returns) are dropped.
+    Safe to run repeatedly.
+
+    Returns:
+        int: Number of users migrated
+    """
+    migrated = 0
+    for user in users_collection.find({'portfolio': {'$exists': True}}, {'portfolio': 1, 'holdings': 1}):
+        holdings = dict(user.get('holdings') or {})
+        for stock in user['portfolio']:
+            key = holding_key(stock['symbol'])
+            quantity = stock['quantity']
+            average_price = stock['average_price']
+            if key in holdings:
+                existing = holdings[key]
+                total_shares = existing['quantity'] + quantity
+                if total_shares:
+                    average_price = (existing['average_price'] * existing['quantity'] + average_price * quantity) / total_shares
+                quantity = total_shares
+            holdings[key] = {
+                'symbol': stock['symbol'],
+                'quantity': quantity,
+                'average_price': average_price
+            }
+
+        result = users_collection.update_one(
+            {'_id': user['_id'], 'portfolio': {'$exists': True}},
+            {
+                '$set': {'holdings': holdings},
+                '$unset': {
+                    'portfolio': '',
+                    'total_value': '',
+                    'daily_returns': '',
+                    'all_time_returns': ''
+                }
+            }
+        )
+        migrated += result.modified_count
+
+    if migrated:
+        print(f"Migrated {migrated} users to symbol-keyed holdings")
+    return migrated
 
 def initialize_user(user_id=1):
     # Check if the user already exists
@@ -23,7 +164,7 @@ def initialize_user(user_id=1):
         # Insert the new user
         result = users_collection.insert_one({
             'user_id': user_id,
-            'portfolio': [],
+            'holdings': {},  # symbol -> position (see holding_key)
             'buying_power': 10000,  # Starting balance of $10,000
             'streak': 0,  # Initialize streak counter
             'last_login': current_time,  # Initialize last login date
@@ -146,7 +287,81 @@ def update_login_streak(user_id):
         'reward': 0
     }
 
-def get_stock_price(symbol, max_cache_age_seconds=30):
+def _fetch_price(symbol, max_cache_age_seconds):
+    """
+    Fetch a price from the market data provider and store it in both cache tiers.
+
+    Runs as the single-flight leader for the symbol. The in-process cache is
+    re-checked first in case a previous leader finished between the caller's
+    cache lookup and this call.
+    """
+    price = price_cache.get(symbol, max_age=max_cache_age_seconds)
+    if price is not None:
+        return price
+
+    current_time = datetime.utcnow()
+    price = call_provider('get_price', symbol)
+
+    # Update cache
+    stocks_collection.update_one(
+        {'symbol': symbol},
+        {
+            '$set': {
+                'price': price,
+                'timestamp': current_time
+            }
+        },
+        upsert=True
+    )
+    price_cache.set(symbol, price, _to_epoch(current_time))
+    price_stream.publish({symbol: price})
+
+    return price
+
+def _fetch_prices(symbols):
+    """
+    Fetch prices for several symbols in one provider request and store them
+    in both cache tiers (one bulk_write for MongoDB).
+
+    Returns:
+        dict: symbol -> price for every symbol the provider could price
+    """
+    current_time = datetime.utcnow()
+    prices = call_provider('get_prices', symbols)
+
+    # Update cache in a single round trip
+    if prices:
+        stocks_collection.bulk_write([
+            UpdateOne(
+                {'symbol': symbol},
+                {'$set': {'price': price, 'timestamp': current_time}},
+                upsert=True
+            )
+            for symbol, price in prices.items()
+        ], ordered=False)
+        for symbol, price in prices.items():
+            price_cache.set(symbol, price, _to_epoch(current_time))
+        price_stream.publish(prices)
+
+    return prices
+
+def _load_shared_prices(symbols, max_age):
+    """
+    Copy prices no older than max_age seconds from MongoDB into the
+    in-process cache (e.g. refreshed by another process).
+
+    Returns:
+        list: Symbols that were loaded
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=max_age)
+    loaded = []
+    for doc in stocks_collection.find({'symbol': {'$in': list(symbols)}, 'timestamp': {'$gt': cutoff}}):
+        price_cache.set(doc['symbol'], doc['price'], _to_epoch(doc['timestamp']))
+        loaded.append(doc['symbol'])
+    return loaded
+
+@tracing.traced()
+def get_stock_price(symbol, max_cache_age_seconds=30, allow_stale=False):
     """
     Fetch the current market price for a given stock symbol using Yahoo Finance API.
 
@@ -157,13 +372,19 @@ def get_stock_price(symbol, max_cache_age_seconds=30):
     - Maintain consistent prices during rapid transactions
 
     Cache System:
-    - Prices are stored in MongoDB with timestamps
+    - Recent prices are held in an in-process TTL/LRU cache (no I/O on a hit)
+    - Prices are stored in MongoDB with timestamps as a shared second tier
     - Cache expires after max_cache_age_seconds
-    - New prices are fetched only when cache expires
+    - New prices are fetched from the market data provider only when cache expires
+    - Concurrent misses on one symbol are coalesced into a single fetch
+    - With allow_stale and the background refresher running, an expired
+      price (up to price_cache.stale_ttl old) is returned immediately and
+      refreshed in the background
 
     Args:
         symbol (str): Stock symbol (e.g., 'AAPL' for Apple)
         max_cache_age_seconds (int): Maximum age of cached price in seconds
+        allow_stale (bool): Accept an expired cached price (read-only paths, not trades)
 
     Returns:
         float: Current stock price
@@ -172,82 +393,148 @@ def get_stock_price(symbol, max_cache_age_seconds=30):
         ValueError: If price cannot be fetched or symbol is invalid
     """
     try:
-        # Check cache first
+        serve_stale = allow_stale and price_refresher.is_running()
+        if price_refresher.is_running():
+            price_refresher.track([symbol])
+
+        # Check in-process cache first
+        price = price_cache.get(symbol, max_age=max_cache_age_seconds)
+        if price is not None:
+            return price
+        if serve_stale:
+            price = price_cache.get_stale(symbol)
+            if price is not None:
+                price_refresher.request([symbol])
+                return price
+
+        # Then the shared MongoDB cache
         cached_data = stocks_collection.find_one({'symbol': symbol})
         current_time = datetime.utcnow()
 
         if cached_data and 'price' in cached_data and 'timestamp' in cached_data:
             cache_age = (current_time - cached_data['timestamp']).total_seconds()
             if cache_age < max_cache_age_seconds:
+                metrics.cache_lookups.inc(cache='price_db', result='hit')
+                price_cache.set(symbol, cached_data['price'], _to_epoch(cached_data['timestamp']))
+                return cached_data['price']
+            if serve_stale and cache_age < price_cache.stale_ttl:
+                metrics.cache_lookups.inc(cache='price_db', result='stale')
+                price_refresher.request([symbol])
                 return cached_data['price']
+        metrics.cache_lookups.inc(cache='price_db', result='miss')
 
         # If not in cache or too old, fetch new price
-        stock = yf.Ticker(symbol)
-        hist = stock.history(period='1d')
-        if hist.empty:
-            raise ValueError(f"No price data available for {symbol}")
-
-        price = hist['Close'].iloc[-1]
-
-        # Update cache
-        stocks_collection.update_one(
-            {'symbol': symbol},
-            {
-                '$set': {
-                    'price': price,
-                    'timestamp': current_time
-                }
-            },
-            upsert=True
-        )
-
-        return price
+        # Concurrent misses on the same symbol wait for a single fetch
+        return price_flight.do(symbol, lambda: _fetch_price(symbol, max_cache_age_seconds))
     except Exception as e:
         raise ValueError(f"Error fetching price for {symbol}: {str(e)}")
 
-def get_multiple_stock_prices(symbols, max_cache_age_seconds=30):
+@tracing.traced()
+def get_multiple_stock_prices(symbols, max_cache_age_seconds=30, allow_stale=False):
     """
     Fetch current market prices for multiple stock symbols.
 
     Optimizes multiple price requests by:
-    - Utilizing the cache system
-    - Batching requests when possible
-    - Handling errors individually per symbol
+    - Serving hot symbols from the in-process cache
+    - Utilizing the MongoDB cache (one query for the remaining symbols)
+    - Fetching every cache miss in a single batched provider request, except
+      symbols another request is already fetching, which are awaited
+    - Writing fetched prices back to the cache with one bulk_write
+    - Reporting errors individually per symbol
+    - With allow_stale and the background refresher running, serving expired
+      prices up to price_cache.stale_ttl old (listed under 'stale') and
+      refreshing them in the background
 
     Args:
         symbols (list): List of stock symbols
         max_cache_age_seconds (int): Maximum age of cached prices in seconds
+        allow_stale (bool): Accept expired cached prices (read-only paths, not trades)
 
     Returns:
         dict: Dictionary containing:
             - prices: Dict of symbol -> price mappings
             - errors: Dict of symbol -> error message for failed requests
+            - stale: List of symbols whose price is past max_cache_age_seconds
     """
     prices = {}
     errors = {}
+    stale = []
     current_time = datetime.utcnow()
+    symbols = list(dict.fromkeys(symbols))  # De-duplicate, keep order
 
-    # Check cache first
-    cached_data = list(stocks_collection.find({
-        'symbol': {'$in': symbols},
-        'timestamp': {'$gt': current_time - timedelta(seconds=max_cache_age_seconds)}
-    }))
+    if not symbols:
+        return {'prices': prices, 'errors': errors, 'stale': stale}
 
-    # Create lookup of cached prices
-    cached_prices = {doc['symbol']: doc['price'] for doc in cached_data}
+    serve_stale = allow_stale and price_refresher.is_running()
+    if price_refresher.is_running():
+        price_refresher.track(symbols)
 
-    # Process each symbol
+    # Check in-process cache first
+    cached_prices = {}
+    stale_prices = {}
     for symbol in symbols:
-        try:
-            if symbol in cached_prices:
-                prices[symbol] = cached_prices[symbol]
+        price = price_cache.get(symbol, max_age=max_cache_age_seconds)
+        if price is not None:
+            cached_prices[symbol] = price
+        elif serve_stale:
+            price = price_cache.get_stale(symbol)
+            if price is not None:
+                stale_prices[symbol] = price
+    uncached = [symbol for symbol in symbols if symbol not in cached_prices and symbol not in stale_prices]
+
+    # Then the shared MongoDB cache
+    if uncached:
+        max_age = max(max_cache_age_seconds, price_cache.stale_ttl) if serve_stale else max_cache_age_seconds
+        query = {'symbol': {'$in': uncached}, 'timestamp': {'$gt': current_time - timedelta(seconds=max_age)}}
+        for doc in stocks_collection.find(query):
+            cache_age = (current_time - doc['timestamp']).total_seconds()
+            if cache_age < max_cache_age_seconds:
+                cached_prices[doc['symbol']] = doc['price']
+                price_cache.set(doc['symbol'], doc['price'], _to_epoch(doc['timestamp']))
             else:
-                prices[symbol] = get_stock_price(symbol, max_cache_age_seconds)
-        except ValueError as e:
-            errors[symbol] = str(e)
-
-    return {'prices': prices, 'errors': errors}
+                stale_prices[doc['symbol']] = doc['price']
+        fresh = sum(1 for symbol in uncached if symbol in cached_prices)
+        stale_found = sum(1 for symbol in uncached if symbol in stale_prices)
+        metrics.cache_lookups.inc(fresh, cache='price_db', result='hit')
+        metrics.cache_lookups.inc(stale_found, cache='price_db', result='stale')
+        metrics.cache_lookups.inc(len(uncached) - fresh - stale_found, cache='price_db', result='miss')
+
+    # Stale prices are served now and refreshed in the background
+    if stale_prices:
+        price_refresher.request(list(stale_prices))
+
+    missing = [symbol for symbol in symbols if symbol not in cached_prices and symbol not in stale_prices]
+
+    # Fetch all cache misses in one provider request
+    # Symbols another request (batch or single lookup) is already fetching
+    # are awaited rather than fetched again
+    fetched_prices = {}
+    if missing:
+        fetched_prices, fetch_errors = price_flight.do_many(
+            missing, _fetch_prices,
+            missing_error=lambda symbol: ValueError(f"No price data available for {symbol}")
+        )
+        for symbol, error in fetch_errors.items():
+            errors[symbol] = f"Error fetching price for {symbol}: {str(error)}"
 
+    # Process each symbol
+    for symbol in symbols:
+        if symbol in cached_prices:
+            prices[symbol] = cached_prices[symbol]
+        elif symbol in stale_prices:
+            prices[symbol] = stale_prices[symbol]
+            stale.append(symbol)
+        elif symbol in fetched_prices:
+            prices[symbol] = fetched_prices[symbol]
+        elif symbol not in errors:
+            errors[symbol] = f"Error fetching price for {symbol}: No price data available for {symbol}"
+
+    return {'prices': prices, 'errors': errors, 'stale': stale}
+
+# Attempts at an optimistic buy before giving up on a contended position
+ORDER_RETRIES = 3
+
+@tracing.traced()
 def buy_stock(user_id, symbol, amount):
     """
     Process a stock purchase order and update the user's portfolio.
@@ -258,6 +545,12 @@ def buy_stock(user_id, symbol, amount):
     - Buying power verification
     - Transaction tracking
 
+    The order is applied as one conditional atomic update: the new buying
+    power (rounded to cents) and the position in the symbol-keyed holdings
+    map (holdings.<symbol>) are set, guarded by the buying power and
+    quantity they were computed from, so concurrent orders cannot overwrite
+    each other; a conflicting order is retried with fresh data.
+
     Args:
         user_id (int): User's unique identifier
         symbol (str): Symbol of stock to buy (e.g., 'AAPL')
@@ -267,73 +560,79 @@ def buy_stock(user_id, symbol, amount):
         dict: Result of the transaction including:
             - success status
             - transaction details
-            - updated portfolio
             - error message (if any)
     """
     try:
-        # Get current portfolio and stock data
-        portfolio = get_portfolio(user_id)
+        if amount <= 0:
+            raise ValueError("Amount must be greater than 0")
+
         stock_price = get_stock_price(symbol)
 
         # Calculate shares based on amount
         shares = amount / stock_price
+        field = f'holdings.{holding_key(symbol)}'
 
-        # Validate buying power
-        if amount > portfolio['buying_power']:
-            raise ValueError("Insufficient buying power")
+        for _ in range(ORDER_RETRIES):
+            # Read only the buying power and the position being bought
+            user = users_collection.find_one({'user_id': user_id}, {'buying_power': 1, field: 1})
+            if not user:
+                raise ValueError("User not found")
 
-        # Update buying power
-        portfolio['buying_power'] -= amount
+            # Validate buying power
+            if amount > user['buying_power']:
+                raise ValueError("Insufficient buying power")
 
-        # Update or add stock to portfolio
-        stock_found = False
-        for holding in portfolio['portfolio']:
-            if holding['symbol'] == symbol:
-                # Update existing position
-                total_value = holding['current_value'] + amount
-                total_shares = holding['quantity'] + shares
-                holding.update({
-                    'quantity': total_shares,
-                    'current_value': total_value,
-                    'average_price': total_value / total_shares,
-                    'current_price': stock_price
-                })
-                stock_found = True
-                break
-
-        if not stock_found:
-            # Add new position
-            portfolio['portfolio'].append({
-                'symbol': symbol,
-                'quantity': shares,
-                'average_price': stock_price,
-                'current_price': stock_price,
-                'current_value': amount
-            })
-
-        # Update total portfolio value
-        portfolio['total_value'] = (
-            portfolio['buying_power'] +
-            sum(holding['current_value'] for holding in portfolio['portfolio'])
-        )
+            holding = user.get('holdings', {}).get(holding_key(symbol))
+            buying_power = round(user['buying_power'] - amount, 2)
 
-        # Save updated portfolio
-        users_collection.update_one(
-            {'user_id': user_id},
-            {'$set': portfolio}
-        )
+            if holding:
+                # Update existing position, guarded by the quantity we read
+                total_shares = holding['quantity'] + shares
+                average_price = (holding['average_price'] * holding['quantity'] + amount) / total_shares
+                result = users_collection.update_one(
+                    {
+                        'user_id': user_id,
+                        'buying_power': user['buying_power'],
+                        f'{field}.quantity': holding['quantity']
+                    },
+                    {'$set': {
+                        'buying_power': buying_power,
+                        f'{field}.quantity': total_shares,
+                        f'{field}.average_price': average_price
+                    }}
+                )
+            else:
+                # Add new position
+                result = users_collection.update_one(
+                    {
+                        'user_id': user_id,
+                        'buying_power': user['buying_power'],
+                        field: {'$exists': False}
+                    },
+                    {'$set': {
+                        'buying_power': buying_power,
+                        field: {
+                            'symbol': symbol,
+                            'quantity': shares,
+                            'average_price': stock_price
+                        }
+                    }}
+                )
+
+            if result.modified_count:
+                _publish_portfolio(user_id)
+                # Return transaction details
+                return {
+                    'success': True,
+                    'transaction': {
+                        'symbol': symbol,
+                        'shares_bought': shares,
+                        'price_per_share': stock_price,
+                        'total_amount': amount
+                    }
+                }
 
-        # Return transaction details and updated portfolio
-        return {
-            'success': True,
-            'transaction': {
-                'symbol': symbol,
-                'shares_bought': shares,
-                'price_per_share': stock_price,
-                'total_amount': amount
-            },
-            'portfolio': portfolio
-        }
+        raise ValueError("Portfolio changed while placing the order, please retry")
 
     except Exception as e:
         return {
@@ -341,6 +640,7 @@ def buy_stock(user_id, symbol, amount):
             'error': str(e)
         }
 
+@tracing.traced()
 def sell_stock(user_id, stock_symbol, quantity):
     """
     Process a stock sell order and update the user's portfolio.
@@ -354,8 +654,10 @@ def sell_stock(user_id, stock_symbol, quantity):
     Transaction Flow:
     1. Validate quantity
     2. Get current market price
-    3. Verify sufficient shares owned
-    4. Update portfolio and buying power
+    3. Verify sufficient shares are owned
+    4. Atomically set the new buying power and quantity (rounded to 2
+       decimals), or remove the position if less than 0.01 shares remain;
+       guarded by the values read, and retried if another order changed them
 
     Args:
         user_id (int): User's unique identifier
@@ -382,53 +684,193 @@ def sell_stock(user_id, stock_symbol, quantity):
         current_price = get_stock_price(stock_symbol)
         total_value = round(current_price * quantity, 2)
 
-        # Find user and verify stock ownership
-        user = users_collection.find_one({'user_id': user_id})
-        if not user:
-            return {'error': 'User not found'}
+        field = f'holdings.{holding_key(stock_symbol)}'
+
+        for _ in range(ORDER_RETRIES):
+            user = users_collection.find_one({'user_id': user_id}, {'buying_power': 1, field: 1})
+            if not user:
+                return {'error': 'User not found'}
+            holding = user.get('holdings', {}).get(holding_key(stock_symbol))
+            if not holding:
+                return {'error': 'Stock not found in portfolio'}
+            if holding['quantity'] < quantity:
+                return {'error': f'Insufficient shares. You own {holding["quantity"]} shares.'}
+
+            # Rounded here so the balances never drift; dust positions are removed
+            remaining = round(holding['quantity'] - quantity, 2)
+            update = {'$set': {'buying_power': round(user['buying_power'] + total_value, 2)}}
+            if remaining < 0.01:
+                update['$unset'] = {field: ''}
+            else:
+                update['$set'][f'{field}.quantity'] = remaining
 
-        portfolio = user['portfolio']
-        stock_found = False
+            result = users_collection.update_one(
+                {'user_id': user_id, 'buying_power': user['buying_power'], f'{field}.quantity': holding['quantity']},
+                update
+            )
+            if result.modified_count:
+                _publish_portfolio(user_id)
+                return {
+                    'success': True,
+                    'value': total_value,
+                    'price_per_share': current_price
+                }
 
-        # Find the stock in user's portfolio
-        for stock in portfolio:
-            if stock['symbol'] == stock_symbol:
-                # Verify sufficient shares
-                if stock['quantity'] < quantity:
-                    return {'error': f'Insufficient shares. You own {stock["quantity"]} shares.'}
+        return {'error': 'Portfolio changed while placing the order, please retry'}
+    except ValueError as e:
+        return {'error': str(e)}
 
-                # Update share quantity
-                stock['quantity'] = round(stock['quantity'] - quantity, 2)
-                stock_found = True
+MAX_BATCH_ORDERS = 50
+
+def _parse_order(order):
+    """Validate one batch order and return (side, symbol, amount, shares)."""
+    if not isinstance(order, dict):
+        raise ValueError("Each order must be an object")
+    side = order.get('side')
+    if side not in ('buy', 'sell'):
+        raise ValueError("Order side must be 'buy' or 'sell'")
+    symbol = order.get('symbol')
+    if not symbol:
+        raise ValueError("Missing symbol")
+    if ('amount' in order) == ('shares' in order):
+        raise ValueError(f"Order for {symbol} must provide either amount or shares")
+    amount = float(order['amount']) if 'amount' in order else None
+    shares = float(order['shares']) if 'shares' in order else None
+    if (amount if amount is not None else shares) <= 0:
+        raise ValueError(f"Order for {symbol} must be greater than 0")
+    return side, symbol, amount, shares
+
+@tracing.traced()
+def place_orders(user_id, orders):
+    """
+    Process a batch of buy and sell orders as one transaction.
 
-                # Remove stock from portfolio if no shares left (or less than 0.01)
-                if stock['quantity'] < 0.01:
-                    portfolio.remove(stock)
-                break
+    All symbols are priced with one get_multiple_stock_prices call, the
+    orders are applied in sequence to the positions read from the user
+    document, and the result is written with one conditional atomic update.
+    Sells fund buys: buying power is checked against the net cash of the
+    whole batch, not order by order. Either every order is applied or none.
 
-        if not stock_found:
-            return {'error': 'Stock not found in portfolio'}
+    Like buy_stock, the buying power (set rounded to cents) and each touched
+    position are guarded by the values they were computed from (or by not
+    existing yet), so a conflicting concurrent order makes the batch retry
+    with fresh data.
 
-        # Update user document with new portfolio and cash balance
-        new_buying_power = round(user['buying_power'] + total_value, 2)
-        users_collection.update_one(
-            {'user_id': user_id},
-            {
-                '$set': {
-                    'portfolio': portfolio,
-                    'buying_power': new_buying_power
+    Args:
+        user_id (int): User's unique identifier
+        orders (list): Orders, each a dict with:
+            - side: 'buy' or 'sell'
+            - symbol: Stock symbol
+            - amount (dollars) or shares
+
+    Returns:
+        dict: Result of the batch including:
+            - success status
+            - orders: per-order details (symbol, side, shares, price_per_share, total_amount)
+            - cash_change: net change in buying power
+            - error message (if any)
+    """
+    try:
+        if not orders:
+            raise ValueError("No orders provided")
+        if len(orders) > MAX_BATCH_ORDERS:
+            raise ValueError(f"At most {MAX_BATCH_ORDERS} orders per batch")
+        parsed = [_parse_order(order) for order in orders]
+
+        # Price every symbol in one batch
+        symbols = list(dict.fromkeys(symbol for _, symbol, _, _ in parsed))
+        quotes = get_multiple_stock_prices(symbols)
+        if quotes['errors']:
+            raise ValueError(next(iter(quotes['errors'].values())))
+        prices = quotes['prices']
+
+        keys = {symbol: holding_key(symbol) for symbol in symbols}
+        projection = {'buying_power': 1}
+        projection.update({f'holdings.{key}': 1 for key in keys.values()})
+
+        for _ in range(ORDER_RETRIES):
+            user = users_collection.find_one({'user_id': user_id}, projection)
+            if not user:
+                raise ValueError("User not found")
+
+            original = user.get('holdings', {})
+            positions = {key: dict(original[key]) for key in keys.values() if key in original}
+            cash_change = 0
+            transactions = []
+
+            for side, symbol, amount, shares in parsed:
+                price = prices[symbol]
+                key = keys[symbol]
+                position = positions.get(key)
+
+                if side == 'buy':
+                    if amount is None:
+                        amount = shares * price
+                    shares = amount / price
+                    if position:
+                        total_shares = position['quantity'] + shares
+                        position['average_price'] = (position['average_price'] * position['quantity'] + amount) / total_shares
+                        position['quantity'] = total_shares
+                    else:
+                        positions[key] = {'symbol': symbol, 'quantity': shares, 'average_price': price}
+                    cash_change -= amount
+                else:
+                    # Same rounding as sell_stock
+                    quantity = round(shares if shares is not None else amount / price, 2)
+                    if quantity <= 0:
+                        raise ValueError(f"Order for {symbol} must be greater than 0")
+                    if not position:
+                        raise ValueError(f"{symbol} not found in portfolio")
+                    if position['quantity'] < quantity:
+                        raise ValueError(f"Insufficient shares of {symbol}. You own {position['quantity']} shares.")
+                    amount = round(price * quantity, 2)
+                    shares = quantity
+                    position['quantity'] = round(position['quantity'] - quantity, 2)
+                    cash_change += amount
+
+                transactions.append({
+                    'symbol': symbol,
+                    'side': side,
+                    'shares': shares,
+                    'price_per_share': price,
+                    'total_amount': amount
+                })
+
+            if user['buying_power'] + cash_change < 0:
+                raise ValueError("Insufficient buying power")
+
+            # One conditional update for the whole batch
+            query = {'user_id': user_id, 'buying_power': user['buying_power']}
+            update = {'$set': {'buying_power': round(user['buying_power'] + cash_change, 2)}}
+            for key, position in positions.items():
+                field = f'holdings.{key}'
+                if key in original:
+                    query[f'{field}.quantity'] = original[key]['quantity']
+                else:
+                    query[field] = {'$exists': False}
+                if position['quantity'] < 0.01:
+                    update.setdefault('$unset', {})[field] = ''
+                else:
+                    update['$set'][field] = position
+
+            result = users_collection.update_one(query, update)
+            if result.modified_count:
+                _publish_portfolio(user_id)
+                return {
+                    'success': True,
+                    'orders': transactions,
+                    'cash_change': round(cash_change, 2)
                 }
-            }
-        )
 
+        raise ValueError("Portfolio changed while placing the orders, please retry")
+
+    except Exception as e:
         return {
-            'success': True,
-            'value': total_value,
-            'price_per_share': current_price
+            'success': False,
+            'error': str(e)
         }
-    except ValueError as e:
-        return {'error': str(e)}
 
+@tracing.traced()
 def calculate_daily_return(user_id):
     """
     Calculate today's return for the user's portfolio.
@@ -440,8 +882,8 @@ def calculate_daily_return(user_id):
     - Day-over-day value changes
 
     Uses:
-    - Yesterday's closing prices
-    - Current market prices
+    - Yesterday's closing prices (previous-close store, fetched once per trading day)
+    - Current market prices (one batched price request)
     - Position quantities
 
     Args:
@@ -458,58 +900,9 @@ def calculate_daily_return(user_id):
     if not user:
         return {'error': 'User not found'}
 
-    portfolio = user['portfolio']
-    daily_return = 0
-    daily_return_percentage = 0
-    stock_returns = []
-    portfolio_value_yesterday = user['buying_power']
-    portfolio_value_today = user['buying_power']
-
-    for stock in portfolio:
-        try:
-            # Get today's and yesterday's prices
-            ticker = yf.Ticker(stock['symbol'])
-            hist = ticker.history(period='2d')
-
-            if len(hist) >= 2:
-                yesterday_price = hist['Close'].iloc[-2]
-                today_price = hist['Close'].iloc[-1]
-                quantity = stock['quantity']
-
-                # Calculate returns for this stock
-                stock_daily_return = (today_price - yesterday_price) * quantity
-                stock_daily_return_percentage = ((today_price - yesterday_price) / yesterday_price) * 100
-
-                # Add to total returns
-                daily_return += stock_daily_return
-                portfolio_value_yesterday += yesterday_price * quantity
-                portfolio_value_today += today_price * quantity
-
-                stock_returns.append({
-                    'symbol': stock['symbol'],
-                    'daily_return': stock_daily_return,
-                    'daily_return_percentage': stock_daily_return_percentage,
-                    'yesterday_price': yesterday_price,
-                    'today_price': today_price
-                })
-        except Exception as e:
-            stock_returns.append({
-                'symbol': stock['symbol'],
-                'error': str(e)
-            })
-
-    # Calculate total portfolio return percentage
-    if portfolio_value_yesterday > 0:
-        daily_return_percentage = ((portfolio_value_today - portfolio_value_yesterday) / portfolio_value_yesterday) * 100
-
-    return {
-        'daily_return': daily_return,
-        'daily_return_percentage': daily_return_percentage,
-        'portfolio_value_yesterday': portfolio_value_yesterday,
-        'portfolio_value_today': portfolio_value_today,
-        'stock_returns': stock_returns
-    }
+    return _value_user(user)['daily_returns']
 
+@tracing.traced()
 def calculate_all_time_return(user_id):
     """
     Calculate all-time return for the user's portfolio.
@@ -540,87 +933,331 @@ def calculate_all_time_return(user_id):
     if not user:
         return {'error': 'User not found'}
 
-    portfolio = user['portfolio']
-    initial_investment = 10000  # Starting balance
-    current_value = user['buying_power']
-    stock_performance = []
+    return _value_user(user)['all_time_returns']
+
+def _nth_weekday(year, month, weekday, n):
+    """The n-th given weekday (0 = Monday) of a month; n=-1 for the last one."""
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+def _easter(year):
+    """Easter Sunday (Gregorian calendar, Meeus/Jones/Butcher algorithm)."""
+    a, b, c = year % 19, year // 100, year % 100
+    g = (b - (b + 8) // 25 + 1) // 3
+    h = (19 * a + b - b // 4 - g + 15) % 30
+    l = (32 + 2 * (b % 4) + 2 * (c // 4) - h - c % 4) % 7
+    n = h + l - 7 * ((a + 11 * h + 22 * l) // 451) + 114
+    return date(year, n // 31, n % 31 + 1)
+
+def _observed(holiday):
+    """Holidays on a Saturday are observed on Friday, on a Sunday on Monday."""
+    if holiday.weekday() == 5:
+        return holiday - timedelta(days=1)
+    if holiday.weekday() == 6:
+        return holiday + timedelta(days=1)
+    return holiday
+
+@lru_cache(maxsize=None)
+def market_holidays(year):
+    """
+    NYSE full-day holidays of a year, by the exchange's standing rules.
 
-    for stock in portfolio:
-        try:
-            # Get current price
-            current_price = get_stock_price(stock['symbol'])
-            quantity = stock['quantity']
-            avg_price = stock['average_price']
+    Unscheduled closures (e.g. national days of mourning) are not included.
 
-            # Calculate stock's return
-            stock_initial_value = avg_price * quantity
-            stock_current_value = current_price * quantity
-            stock_return = stock_current_value - stock_initial_value
-            stock_return_percentage = ((current_price - avg_price) / avg_price) * 100
+    Returns:
+        frozenset: Dates the market is closed on a weekday
+    """
+    holidays = {
+        _nth_weekday(year, 1, 0, 3),  # Martin Luther King Jr. Day
+        _nth_weekday(year, 2, 0, 3),  # Washington's Birthday
+        _easter(year) - timedelta(days=2),  # Good Friday
+        _nth_weekday(year, 5, 0, -1),  # Memorial Day
+        _observed(date(year, 7, 4)),  # Independence Day
+        _nth_weekday(year, 9, 0, 1),  # Labor Day
+        _nth_weekday(year, 11, 3, 4),  # Thanksgiving
+        _observed(date(year, 12, 25)),  # Christmas
+    }
+    # New Year's Day on a Saturday is not observed on the Friday before
+    new_year = date(year, 1, 1)
+    if new_year.weekday() != 5:
+        holidays.add(_observed(new_year))
+    if year >= 2022:
+        holidays.add(_observed(date(year, 6, 19)))  # Juneteenth
+    return frozenset(holidays)
+
+def current_trading_date(now=None):
+    """
+    Get the date of the most recent trading session that has opened.
 
-            # Add to total value
-            current_value += stock_current_value
-            initial_investment += stock_initial_value
+    Before the 9:30 ET open, and on weekends and NYSE holidays (see
+    market_holidays), this is the previous trading day.
 
-            stock_performance.append({
-                'symbol': stock['symbol'],
-                'total_return': stock_return,
-                'return_percentage': stock_return_percentage,
-                'initial_value': stock_initial_value,
-                'current_value': stock_current_value,
-                'quantity': quantity,
-                'average_price': avg_price,
-                'current_price': current_price
-            })
+    Args:
+        now (datetime): Timezone-aware time to evaluate (default: now)
+
+    Returns:
+        date: Trading session date
+    """
+    now = (now or datetime.now(timezone.utc)).astimezone(MARKET_TIMEZONE)
+    trading_date = now.date()
+    if now.time() < MARKET_OPEN:
+        trading_date -= timedelta(days=1)
+    while trading_date.weekday() >= 5 or trading_date in market_holidays(trading_date.year):
+        trading_date -= timedelta(days=1)
+    return trading_date
+
+def _fetch_previous_closes(symbols, trading_date):
+    """Fetch previous closes from the provider and store them in both cache tiers."""
+    key = trading_date.isoformat()
+    current_time = datetime.utcnow()
+    previous_closes = call_provider('get_previous_closes', symbols, trading_date)
+
+    if previous_closes:
+        previous_closes_collection.bulk_write([
+            UpdateOne(
+                {'symbol': symbol, 'trading_date': key},
+                {'$set': {'previous_close': close, 'timestamp': current_time}},
+                upsert=True
+            )
+            for symbol, close in previous_closes.items()
+        ], ordered=False)
+        for symbol, close in previous_closes.items():
+            previous_close_cache.set((symbol, key), close)
+
+    return previous_closes
+
+@tracing.traced()
+def get_previous_closes(symbols):
+    """
+    Get the previous trading day's closing price for each symbol.
+
+    Previous closes are looked up in a shared store keyed by symbol and
+    trading date:
+    - In-process cache first
+    - Then previous_closes_collection in MongoDB
+    - Remaining symbols are fetched from the provider in one batch, at most
+      once per trading date
+
+    Args:
+        symbols (list): List of stock symbols
+
+    Returns:
+        dict: symbol -> previous close. Symbols with no data are omitted.
+    """
+    symbols = list(dict.fromkeys(symbols))
+    if not symbols:
+        return {}
+
+    trading_date = current_trading_date()
+    key = trading_date.isoformat()
+
+    # Check in-process cache first
+    previous_closes = {}
+    for symbol in symbols:
+        close = previous_close_cache.get((symbol, key))
+        if close is not None:
+            previous_closes[symbol] = close
+    uncached = [symbol for symbol in symbols if symbol not in previous_closes]
+
+    # Then the shared MongoDB store
+    if uncached:
+        for doc in previous_closes_collection.find({'symbol': {'$in': uncached}, 'trading_date': key}):
+            previous_closes[doc['symbol']] = doc['previous_close']
+            previous_close_cache.set((doc['symbol'], key), doc['previous_close'])
+
+    # Fetch the rest (lazily, first use of the trading day)
+    missing = [symbol for symbol in symbols if symbol not in previous_closes]
+    if missing:
+        try:
+            previous_closes.update(previous_close_flight.do(
+                (key,) + tuple(sorted(missing)),
+                lambda: _fetch_previous_closes(missing, trading_date)
+            ))
         except Exception as e:
-            stock_performance.append({
-                'symbol': stock['symbol'],
-                'error': str(e)
-            })
+            # Holdings without a previous close are left out of daily returns
+            print(f"Error fetching previous closes for {missing}: {e}")
 
-    # Calculate total return
-    total_return = current_value - initial_investment
-    total_return_percentage = ((current_value - initial_investment) / initial_investment) * 100 if initial_investment > 0 else 0
+    return previous_closes
 
-    return {
-        'total_return': total_return,
-        'total_return_percentage': total_return_percentage,
-        'initial_investment': initial_investment,
-        'current_value': current_value,
-        'stock_performance': stock_performance
-    }
+def refresh_previous_closes(symbols=None):
+    """
+    Fill the previous-close store for the current trading date.
+
+    Intended to run once per session (e.g. at startup) so that portfolio
+    views never wait on history requests. Goes through get_previous_closes,
+    so closes another worker already stored are not downloaded again.
+
+    Args:
+        symbols (list): Symbols to refresh (default: every symbol held by any user)
+
+    Returns:
+        dict: symbol -> previous close for the symbols that are available
+    """
+    if symbols is None:
+        symbols = list_held_symbols()
+    return get_previous_closes(list(symbols))
+
+_previous_closes_refreshed_for = None
+
+def _refresh_previous_closes_daily():
+    """
+    Refresh the previous-close store once per trading date (refresher tick hook).
+
+    The date is marked before refreshing, so a failing provider or MongoDB
+    is not retried on every tick; closes that are still missing are fetched
+    on first use by get_previous_closes.
+    """
+    global _previous_closes_refreshed_for
+    trading_date = current_trading_date()
+    if trading_date != _previous_closes_refreshed_for:
+        _previous_closes_refreshed_for = trading_date
+        refresh_previous_closes()
+
+def start_price_refresher():
+    """
+    Start the background price refresher for this process.
 
+    Call after forking (once per worker); the refresher runs as a daemon thread.
+    """
+    price_refresher.start()
+
+def _holding_quantities(user):
+    return {holding['symbol']: holding['quantity'] for holding in user.get('holdings', {}).values()}
+
+def subscribe_prices(symbols):
+    """
+    Subscribe to live prices for a set of symbols.
+
+    The first event carries the currently cached prices; after that the
+    subscription receives deltas whenever the shared cache is refreshed
+    (by the background refresher if enabled, see refresh_subscription).
+
+    Returns:
+        Subscription: see stream.py; unsubscribe with price_stream.unsubscribe()
+    """
+    price_refresher.track(symbols)
+    quotes = get_multiple_stock_prices(symbols, allow_stale=True)
+    return price_stream.subscribe(symbols, prices=quotes['prices'])
+
+def subscribe_portfolio(user_id):
+    """
+    Subscribe to live prices and values of a user's holdings.
+
+    Events carry per-holding current_price/current_value and the total
+    value; trades placed by the user push a fresh snapshot.
+
+    Returns:
+        Subscription, or None if the user does not exist
+    """
+    user = users_collection.find_one({'user_id': user_id}, {'holdings': 1, 'buying_power': 1})
+    if not user:
+        return None
+    holdings = _holding_quantities(user)
+    price_refresher.track(holdings)
+    quotes = get_multiple_stock_prices(list(holdings), allow_stale=True)
+    return price_stream.subscribe(
+        (), user_id=user_id, holdings=holdings,
+        buying_power=user['buying_power'], prices=quotes['prices']
+    )
+
+def refresh_subscription(subscription):
+    """
+    Keep an open stream's prices moving (called on every stream heartbeat).
+
+    With the background refresher running the symbols are only marked as
+    viewed; otherwise their expired prices are fetched here, which
+    publishes the changes to every subscriber.
+    """
+    if price_refresher.is_running():
+        price_refresher.track(subscription.symbols)
+    elif subscription.symbols:
+        get_multiple_stock_prices(list(subscription.symbols))
+
+def _publish_portfolio(user_id):
+    """After a trade, push the user's new holdings to their live portfolio streams."""
+    if not price_stream.watches_user(user_id):
+        return
+    try:
+        user = users_collection.find_one({'user_id': user_id}, {'holdings': 1, 'buying_power': 1})
+        holdings = _holding_quantities(user)
+        price_refresher.track(holdings)
+        quotes = get_multiple_stock_prices(list(holdings), allow_stale=True)
+        price_stream.update_portfolio(user_id, holdings, user['buying_power'], quotes['prices'])
+    except Exception as e:
+        print(f"Error publishing portfolio for user {user_id}: {e}")
+
+def _value_user(user):
+    """
+    Run the valuation engine for an already-loaded user document.
+
+    All current prices are gathered in one batch (get_multiple_stock_prices)
+    and yesterday's closes come from the previous-close store, then current
+    value, daily return and all-time return are computed in a single pass.
+    """
+    symbols = [stock['symbol'] for stock in user['holdings'].values()]
+    quotes = get_multiple_stock_prices(symbols, allow_stale=True)
+    previous_closes = get_previous_closes(symbols)
+    return value_portfolio(user, quotes['prices'], previous_closes, quotes['errors'], quotes['stale'])
+
+@tracing.traced()
 def get_portfolio(user_id):
+    """
+    Get the user's portfolio with current values and returns.
+
+    Reads the user document once and values every holding in one pass
+    (see _value_user), instead of re-reading and re-pricing the portfolio
+    for each return calculation.
+
+    Args:
+        user_id (int): User's unique identifier
+
+    Returns:
+        dict: Portfolio information including:
+            - portfolio: holdings with current_price and current_value
+            - buying_power
+            - total_value
+            - daily_returns (see calculate_daily_return)
+            - all_time_returns (see calculate_all_time_return)
+    """
     user = users_collection.find_one({'user_id': user_id})
     if not user:
         return {'error': 'User not found'}
 
-    # Calculate current values of all positions
-    portfolio = user['portfolio']
-    total_value = user['buying_power']
+    return _value_user(user)
 
-    # Update each stock with current market value
-    for stock in portfolio:
-        try:
-            current_price = get_stock_price(stock['symbol'])
-            stock['current_price'] = current_price
-            stock['current_value'] = current_price * stock['quantity']
-            total_value += stock['current_value']
-        except ValueError:
-            stock['current_price'] = None
-            stock['current_value'] = None
-
-    # Get daily and all-time returns
-    daily_returns = calculate_daily_return(user_id)
-    all_time_returns = calculate_all_time_return(user_id)
+async def _value_user_async(user):
+    """
+    _value_user with the price and previous-close lookups awaited together.
 
-    return {
-        'portfolio': portfolio,
-        'buying_power': user['buying_power'],
-        'total_value': total_value,
-        'daily_returns': daily_returns,
-        'all_time_returns': all_time_returns
-    }
+    Both only need the holdings' symbols, so they run concurrently on the
+    I/O pool (see aio.py) and cost one round trip instead of two.
+    """
+    symbols = [stock['symbol'] for stock in user['holdings'].values()]
+    quotes, previous_closes = await asyncio.gather(
+        aio.to_thread(get_multiple_stock_prices, symbols, allow_stale=True),
+        aio.to_thread(get_previous_closes, symbols)
+    )
+    return value_portfolio(user, quotes['prices'], previous_closes, quotes['errors'], quotes['stale'])
+
+@tracing.traced()
+async def get_portfolio_async(user_id):
+    """
+    Asyncio version of get_portfolio (used when ASYNC_VIEWS is enabled).
+
+    Args:
+        user_id (int): User's unique identifier
+
+    Returns:
+        dict: Same as get_portfolio
+    """
+    user = await aio.to_thread(users_collection.find_one, {'user_id': user_id})
+    if not user:
+        return {'error': 'User not found'}
+
+    return await _value_user_async(user)
 
 def get_portfolio_with_streak(user_id):
     """
@@ -0,0 +1,156 @@
+import bisect
+import threading
+
+# Ticker universe
+# The S&P 500 symbol list is loaded once per process into sorted indexes so
+# pagination and typeahead search never touch the disk or the network.
+
+
+class TickerUniverse:
+    """
+    Indexed list of tradable symbols with optional company names.
+
+    - symbols: symbols in file order (used for pagination)
+    - Symbol prefix index: sorted symbols, searched with bisect
+    - Name prefix index: sorted (word, symbol) pairs for every word of
+      every company name, so 'app' matches 'Apple Inc.' and
+      'mat' matches 'Applied Materials'
+
+    Names can be added after loading (e.g. from fetched company info)
+    with add_name().
+    """
+
+    def __init__(self, entries):
+        """
+        Args:
+            entries (list): (symbol, name) pairs; name may be None
+        """
+        self._lock = threading.Lock()
+        self.symbols = []
+        self.names = {}
+        self._sorted_symbols = []
+        self._name_index = []  # sorted (word, symbol)
+
+        for symbol, name in entries:
+            if symbol in self.names:
+                continue
+            self.symbols.append(symbol)
+            self.names[symbol] = name
+
+        self._sorted_symbols = sorted(self.symbols)
+        self._name_index = sorted(
+            (word, symbol)
+            for symbol, name in self.names.items() if name
+            for word in self._words(name)
+        )
+
+    @staticmethod
+    def _words(name):
+        return {word for word in name.lower().replace(',', ' ').replace('.', ' ').split() if word}
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def __contains__(self, symbol):
+        return symbol in self.names
+
+    def page(self, page, per_page):
+        """Return the symbols on a 1-based page."""
+        start_idx = (page - 1) * per_page
+        return self.symbols[start_idx:start_idx + per_page]
+
+    def total_pages(self, per_page):
+        return (len(self.symbols) + per_page - 1) // per_page
+
+    def add_name(self, symbol, name):
+        """Record a company name for a known symbol and index its words, replacing any previous name."""
+        if not name or symbol not in self.names:
+            return
+        with self._lock:
+            previous = self.names[symbol]
+            if previous == name:
+                return
+            if previous:
+                for word in self._words(previous):
+                    i = bisect.bisect_left(self._name_index, (word, symbol))
+                    if i < len(self._name_index) and self._name_index[i] == (word, symbol):
+                        del self._name_index[i]
+            self.names[symbol] = name
+            for word in self._words(name):
+                bisect.insort(self._name_index, (word, symbol))
+
+    def search(self, query, limit=10):
+        """
+        Find symbols matching a query by symbol prefix or company-name word prefix.
+
+        Results are ordered exact symbol match first, then symbol prefix
+        matches, then company-name matches.
+
+        Args:
+            query (str): Search text
+            limit (int): Maximum number of results
+
+        Returns:
+            list: [{'symbol': ..., 'name': ...}, ...]
+        """
+        query = query.strip()
+        if not query or limit <= 0:
+            return []
+
+        matches = []
+        seen = set()
+
+        def add(symbol):
+            if symbol not in seen:
+                seen.add(symbol)
+                matches.append(symbol)
+
+        # Symbol prefix matches (exact match sorts first)
+        upper = query.upper()
+        start = bisect.bisect_left(self._sorted_symbols, upper)
+        for symbol in self._sorted_symbols[start:]:
+            if not symbol.startswith(upper) or len(matches) >= limit:
+                break
+            add(symbol)
+
+        # Company-name word prefix matches
+        lower = query.lower()
+        with self._lock:
+            start = bisect.bisect_left(self._name_index, (lower, ''))
+            for word, symbol in self._name_index[start:]:
+                if not word.startswith(lower) or len(matches) >= limit:
+                    break
+                add(symbol)
+
+        return [{'symbol': symbol, 'name': self.names.get(symbol)} for symbol in matches]
+
+
+def load_universe(filename='tickers.txt'):
+    """
+    Load a ticker universe from a file.
+
+    Each line is a symbol, optionally followed by a comma and the
+    company name (e.g. 'AAPL' or 'AAPL,Apple Inc.').
+    """
+    entries = []
+    with open(filename, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            symbol, _, name = line.partition(',')
+            entries.append((symbol.strip(), name.strip() or None))
+    return TickerUniverse(entries)
+
+
+_universe = None
+_universe_lock = threading.Lock()
+
+def get_universe():
+    """Return the process-wide ticker universe, loading tickers.txt on first use."""
+    global _universe
+    if _universe is None:
+        with _universe_lock:
+            if _universe is None:
+                _universe = load_universe()
+    return _universe
@@ -1,78 +1,183 @@
+import os
 import time
-import requests
-import bs4 as bs
-import yfinance as yf
+from concurrent.futures import ThreadPoolExecutor
+from cache import SingleFlight
+import metrics
+from universe import get_universe
+from info_cache import get_company_infos
+from page_cache import create_page_store
 
-_cache = {}
 CACHE_TTL = 300  # 5 minutes
 
+# Built pages live in a store shared by all workers (see page_cache.py); only
+# the worker holding a page's refresh lock rebuilds it, the others serve the
+# previous snapshot or wait up to PAGE_LOCK_SECONDS for the new one
+page_store = create_page_store()
+PAGE_LOCK_SECONDS = 30
+PAGE_LOCK_POLL_SECONDS = 0.2
+
+# Tickers on a page are fetched concurrently on a bounded pool, and
+# neighbouring pages are prefetched in the background
+FETCH_WORKERS = int(os.getenv('SP500_FETCH_WORKERS', '10'))
+PREFETCH_PREVIOUS = os.getenv('SP500_PREFETCH_PREVIOUS', 'false').lower() in ('1', 'true', 'yes')
+_fetch_pool = ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix='sp500-fetch')
+_prefetch_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix='sp500-prefetch')
+_page_flight = SingleFlight()  # A page being built (or prefetched) is built once
+
 def get_500():
-    print("Getting 500")
     """Web scrape top 500 and write to file (only needed if you want to auto-update that file)."""
+    # Only this maintenance helper needs the scraping libraries
+    import requests
+    import bs4 as bs
+
+    print("Getting 500")
     resp = requests.get('http://en.wikipedia.org/wiki/List_of_S%26P_500_companies')
     soup = bs.BeautifulSoup(resp.text, 'lxml')
     table = soup.find('table', {'id': 'constituents'})
     tickers = []
     for row in table.findAll('tr')[1:]:
-        ticker = row.findAll('td')[0].text
+        cells = row.findAll('td')
         # Clean up newlines
-        ticker = ticker.strip()
-        tickers.append(ticker)
+        ticker = cells[0].text.strip()
+        name = cells[1].text.strip().replace(',', '')
+        tickers.append((ticker, name))
 
-    # Write tickers to a file
+    # Write tickers (with company names for search) to a file
     with open('tickers.txt', 'w') as f:
-        for t in tickers:
-            f.write(f"{t}\n")
+        for t, name in tickers:
+            f.write(f"{t},{name}\n")
 
 
 def read_tickers_from_file(filename='tickers.txt'):
-    """Read tickers from file (existing code)."""
+    """Read tickers from file (lines are 'SYMBOL' or 'SYMBOL,Company Name')."""
     with open(filename, 'r') as f:
-        return [line.strip() for line in f.readlines()]
+        return [line.split(',')[0].strip() for line in f.readlines() if line.strip()]
 
-def fetch_sp500_data(page=1, per_page=10):
-    """Fetch data for a paginated chunk of S&P 500 stocks with caching."""
-    tickers = read_tickers_from_file()
-    total_pages = (503 + per_page - 1) // per_page
+def _page_key(page, per_page):
+    return f"{per_page}:{page}"
 
-    # Validate page number
-    if page < 1 or page > total_pages:
-        return {}, 0  # Return empty data and invalid total_pages
-
-    # Check cache for existing valid data
-    if page in _cache:
-        cached = _cache[page]
-        if time.time() - cached['timestamp'] < CACHE_TTL:
-            return cached['data'], total_pages
-
-    # Calculate tickers for the current page
-    start_idx = (page - 1) * per_page
-    end_idx = start_idx + per_page
-    current_tickers = tickers[start_idx:end_idx]
-
-    # Fetch data for current tickers
-    data = {}
-    for ticker in current_tickers:
-        try:
-            info = yf.Ticker(ticker).info
-            data[ticker] = {
-                'Name': info.get('shortName'),
-                'Bid': info.get('bid'),
-                'Ask': info.get('ask'),
-                'Open': info.get('regularMarketOpen'),
-                'High': info.get('regularMarketDayHigh'),
-                'Low': info.get('regularMarketDayLow'),
-                'Market Cap': info.get('marketCap'),
-                'P/E Ratio': info.get('trailingPE'),
-            }
-        except Exception as e:
-            print(f"Error fetching {ticker}: {e}")
-            data[ticker] = None
+def _is_fresh(entry):
+    return entry is not None and time.time() - entry['timestamp'] < CACHE_TTL
+
+def _get_cached_entry(page, per_page):
+    """Return the stored {'data', 'timestamp'} entry for a page, if still fresh."""
+    entry = page_store.get(_page_key(page, per_page))
+    return entry if _is_fresh(entry) else None
+
+def _build_page(page, per_page):
+    """Fetch every ticker on a page concurrently and store the result."""
+    # Tickers for the current page
+    current_tickers = get_universe().page(page, per_page)
+
+    # Read the shared company info cache; misses are fetched concurrently
+    infos = get_company_infos(current_tickers, executor=_fetch_pool)
+    data = {ticker: info['data'] if info else None for ticker, info in infos.items()}
 
     # Update cache
-    _cache[page] = {
+    entry = {
         'data': data,
         'timestamp': time.time()
     }
+    page_store.set(_page_key(page, per_page), entry['data'], entry['timestamp'])
+
+    return entry
+
+def _refresh_page(page, per_page):
+    """
+    Rebuild an expired page, unless another worker is already doing it.
+
+    Runs once per process per page (single-flight); across workers only the
+    holder of the store's refresh lock rebuilds. The others return the
+    previous snapshot if there is one, or wait for the new one.
+    """
+    key = _page_key(page, per_page)
+    # A queued prefetch may run after the page was already built
+    entry = page_store.get(key)
+    if _is_fresh(entry):
+        metrics.cache_lookups.inc(cache='sp500_page', result='hit')
+        return entry
+
+    token = page_store.acquire(key, PAGE_LOCK_SECONDS)
+    if token:
+        metrics.cache_lookups.inc(cache='sp500_page', result='miss')
+        try:
+            return _build_page(page, per_page)
+        finally:
+            page_store.release(key, token)
+
+    # Another worker is rebuilding the page
+    if entry is not None:
+        metrics.cache_lookups.inc(cache='sp500_page', result='stale')
+        return entry
+    metrics.cache_lookups.inc(cache='sp500_page', result='miss')
+    deadline = time.time() + PAGE_LOCK_SECONDS
+    while time.time() < deadline:
+        time.sleep(PAGE_LOCK_POLL_SECONDS)
+        entry = page_store.get(key)
+        if _is_fresh(entry):
+            return entry
+    # The lock holder never finished (its lock has expired by now)
+    return _build_page(page, per_page)
+
+def _load_page(page, per_page):
+    cached = _get_cached_entry(page, per_page)
+    if cached is not None:
+        metrics.cache_lookups.inc(cache='sp500_page', result='hit')
+        return cached
+    return _page_flight.do(_page_key(page, per_page), lambda: _refresh_page(page, per_page))
+
+def _prefetch_page(page, per_page, total_pages):
+    """Build a page in the background if it is valid and not already cached."""
+    if page < 1 or page > total_pages:
+        return
+    _prefetch_pool.submit(_prefetch, page, per_page)
+
+def _prefetch(page, per_page):
+    # Like _load_page, but a page that is already cached is not counted as a hit
+    if _get_cached_entry(page, per_page) is None:
+        _page_flight.do(_page_key(page, per_page), lambda: _refresh_page(page, per_page))
+
+def fetch_sp500_page(page=1, per_page=10, prefetch=True):
+    """
+    Fetch a paginated chunk of S&P 500 stocks along with its cache timestamp.
+
+    Tickers on the page are fetched concurrently (SP500_FETCH_WORKERS), and
+    the next page (plus the previous one with SP500_PREFETCH_PREVIOUS) is
+    prefetched in the background so paging forward is served from cache.
+
+    Returns:
+        dict: Page with:
+            - data: symbol -> display data
+            - total_pages
+            - timestamp: when the page was fetched (None for an invalid page)
+            - max_age: seconds until the cached page expires
+    """
+    total_pages = get_universe().total_pages(per_page)
+
+    # Validate page number
+    if page < 1 or page > total_pages:
+        return {'data': {}, 'total_pages': 0, 'timestamp': None, 'max_age': 0}
+
+    entry = _load_page(page, per_page)
+
+    if prefetch:
+        _prefetch_page(page + 1, per_page, total_pages)
+        if PREFETCH_PREVIOUS:
+            _prefetch_page(page - 1, per_page, total_pages)
+
+    return {
+        'data': entry['data'],
+        'total_pages': total_pages,
+        'timestamp': entry['timestamp'],
+        'max_age': max(0, CACHE_TTL - (time.time() - entry['timestamp']))
+    }
+
+def fetch_sp500_data(page=1, per_page=10, prefetch=True):
+    """
+    Fetch data for a paginated chunk of S&P 500 stocks with caching.
 
-    return data, total_pages
+    Returns:
+        tuple: (data, total_pages); see fetch_sp500_page
+    """
+    result = fetch_sp500_page(page, per_page, prefetch)
+    return result['data'], result['total_pages']
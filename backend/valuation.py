@@ -0,0 +1,126 @@
+INITIAL_BALANCE = 10000  # Starting balance of every user
+
+# Portfolio valuation engine
+# Pure computation: takes a user document plus already-fetched prices and
+# produces current values, daily returns and all-time returns in one pass
+# over the holdings. All I/O (MongoDB, market data) happens in the caller.
+
+
+def value_portfolio(user, prices, previous_closes, price_errors=None, stale_symbols=None):
+    """
+    Value a user's portfolio in a single pass over their holdings.
+
+    Args:
+        user (dict): User document (holdings map, buying_power)
+        prices (dict): symbol -> current price
+        previous_closes (dict): symbol -> previous trading day's closing price
+        price_errors (dict): symbol -> error message for symbols that could not be priced
+        stale_symbols (list): Symbols whose price was served stale from cache
+
+    Returns:
+        dict: Same shape as trading.get_portfolio:
+            - portfolio: holdings with current_price/current_value/price_stale
+            - buying_power
+            - total_value
+            - daily_returns: see trading.calculate_daily_return
+            - all_time_returns: see trading.calculate_all_time_return
+    """
+    price_errors = price_errors or {}
+    stale_symbols = set(stale_symbols or [])
+    buying_power = user['buying_power']
+
+    portfolio = []
+    total_value = buying_power
+
+    # Daily return accumulators
+    daily_return = 0
+    portfolio_value_yesterday = buying_power
+    portfolio_value_today = buying_power
+    stock_returns = []
+
+    # All-time return accumulators
+    initial_investment = INITIAL_BALANCE
+    current_value = buying_power
+    stock_performance = []
+
+    for holding in user['holdings'].values():
+        symbol = holding['symbol']
+        quantity = holding['quantity']
+        stock = dict(holding)
+        current_price = prices.get(symbol)
+
+        if current_price is None:
+            error = price_errors.get(symbol, f"No price data available for {symbol}")
+            stock['current_price'] = None
+            stock['current_value'] = None
+            stock['price_stale'] = False
+            portfolio.append(stock)
+            stock_returns.append({'symbol': symbol, 'error': error})
+            stock_performance.append({'symbol': symbol, 'error': error})
+            continue
+
+        # Current value
+        stock_current_value = current_price * quantity
+        stock['current_price'] = current_price
+        stock['current_value'] = stock_current_value
+        stock['price_stale'] = symbol in stale_symbols
+        total_value += stock_current_value
+        portfolio.append(stock)
+
+        # Daily return (only when yesterday's close is known)
+        yesterday_price = previous_closes.get(symbol)
+        if yesterday_price:
+            stock_daily_return = (current_price - yesterday_price) * quantity
+            daily_return += stock_daily_return
+            portfolio_value_yesterday += yesterday_price * quantity
+            portfolio_value_today += stock_current_value
+            stock_returns.append({
+                'symbol': symbol,
+                'daily_return': stock_daily_return,
+                'daily_return_percentage': ((current_price - yesterday_price) / yesterday_price) * 100,
+                'yesterday_price': yesterday_price,
+                'today_price': current_price
+            })
+
+        # All-time return
+        avg_price = holding['average_price']
+        stock_initial_value = avg_price * quantity
+        current_value += stock_current_value
+        initial_investment += stock_initial_value
+        stock_performance.append({
+            'symbol': symbol,
+            'total_return': stock_current_value - stock_initial_value,
+            'return_percentage': ((current_price - avg_price) / avg_price) * 100 if avg_price else 0,
+            'initial_value': stock_initial_value,
+            'current_value': stock_current_value,
+            'quantity': quantity,
+            'average_price': avg_price,
+            'current_price': current_price
+        })
+
+    daily_return_percentage = 0
+    if portfolio_value_yesterday > 0:
+        daily_return_percentage = ((portfolio_value_today - portfolio_value_yesterday) / portfolio_value_yesterday) * 100
+
+    total_return = current_value - initial_investment
+    total_return_percentage = (total_return / initial_investment) * 100 if initial_investment > 0 else 0
+
+    return {
+        'portfolio': portfolio,
+        'buying_power': buying_power,
+        'total_value': total_value,
+        'daily_returns': {
+            'daily_return': daily_return,
+            'daily_return_percentage': daily_return_percentage,
+            'portfolio_value_yesterday': portfolio_value_yesterday,
+            'portfolio_value_today': portfolio_value_today,
+            'stock_returns': stock_returns
+        },
+        'all_time_returns': {
+            'total_return': total_return,
+            'total_return_percentage': total_return_percentage,
+            'initial_investment': initial_investment,
+            'current_value': current_value,
+            'stock_performance': stock_performance
+        }
+    }
@@ -83,6 +83,39 @@ export default function Holdings() {
     return () => window.removeEventListener('portfolioUpdate', handlePortfolioUpdate);
   }, []);
 
+  // Apply live price/value deltas pushed by the backend instead of re-polling
+  useEffect(() => {
+    // The stream opens with a snapshot of what the mount fetch just loaded
+    let initialSnapshot = true;
+    const unsubscribe = api.subscribePortfolio((update) => {
+      if (update.snapshot) {
+        if (initialSnapshot) {
+          initialSnapshot = false;
+          return;
+        }
+        // Holdings changed (e.g. a trade); reload the full rows
+        fetchPortfolioData();
+        return;
+      }
+      const stocksValue = update.total_value !== undefined
+        ? update.total_value - (api.getCachedPortfolio()?.buying_power || 0)
+        : null;
+      if (stocksValue !== null) setTotalStockValue(stocksValue);
+      setStockList((stocks) => stocks.map((stock) => {
+        const holding = update.holdings?.[stock.symbol];
+        if (!holding) return stock;
+        return {
+          ...stock,
+          price: formatCurrency(holding.current_price),
+          currentValue: formatCurrency(holding.current_value),
+          portPercent: stocksValue ? ((holding.current_value / stocksValue) * 100).toFixed(0) : stock.portPercent
+        };
+      }));
+      setLastRefresh(new Date());
+    });
+    return unsubscribe;
+  }, []);
+
   // Handle opening sell modal for a stock
   const handleSellClick = (stock) => {
     setSelectedStock(stock);
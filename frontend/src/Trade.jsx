@@ -13,6 +13,7 @@ export default function Trade() {
   const [modalData, setModalData] = useState({});
   const [curTicker, setCurTicker] = useState("");
   const [amount, setAmount] = useState(0);
+  const [suggestions, setSuggestions] = useState([]);
 
   useEffect(() => {
     if (!isSearching) {
@@ -20,6 +21,25 @@ export default function Trade() {
     }
   }, [currentPage, isSearching]);
 
+  // Typeahead suggestions from the backend's in-memory ticker index
+  useEffect(() => {
+    const query = searchTerm.trim();
+    if (!query) {
+      setSuggestions([]);
+      return;
+    }
+
+    const controller = new AbortController();
+    axios
+      .get("http://localhost:8080/api/search", {
+        params: { q: query },
+        signal: controller.signal,
+      })
+      .then((response) => setSuggestions(response.data.results))
+      .catch(() => {});
+    return () => controller.abort();
+  }, [searchTerm]);
+
   const loadData = async (page) => {
     setIsLoading(true);
     try {
@@ -282,8 +302,16 @@ export default function Trade() {
             value={searchTerm}
             onChange={(e) => setSearchTerm(e.target.value)}
             placeholder="Search by ticker symbol (e.g., AAPL)"
+            list="ticker-suggestions"
             className="px-4 py-2 border border-gray-300 rounded-lg focus:outline-none focus:ring-2 focus:ring-blue-500"
           />
+          <datalist id="ticker-suggestions">
+            {suggestions.map(({ symbol, name }) => (
+              <option key={symbol} value={symbol}>
+                {name}
+              </option>
+            ))}
+          </datalist>
           <button
             onClick={handleSearch}
             disabled={isLoading}
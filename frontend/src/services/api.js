@@ -281,6 +281,23 @@ const api = {
     }
   },
 
+  /**
+   * Subscribe to live values of the user's holdings (Server-Sent Events)
+   * @param {Function} onUpdate - Called with each event: {prices, holdings, total_value, snapshot}
+   * @returns {Function} Call to close the stream
+   */
+  subscribePortfolio(onUpdate) {
+    const source = new EventSource(`${API_BASE_URL}/stream/portfolio`);
+    source.addEventListener("portfolio", (event) => {
+      onUpdate(JSON.parse(event.data));
+    });
+    source.onerror = (error) => {
+      // EventSource reconnects on its own
+      console.error("Portfolio stream error:", error);
+    };
+    return () => source.close();
+  },
+
   // API Documentation
   async getApiDocs() {
     try {